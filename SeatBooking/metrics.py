@@ -0,0 +1,295 @@
+# SeatBooking/metrics.py
+"""
+每個 view 的效能指標與預算。
+
+MetricsMiddleware 記錄每個請求的 SQL 查詢次數、DB 時間、模板渲染時間與總延遲，
+依 view 名稱 (resolver_match.view_name，例如 'seats:records') 累計在程序內的 registry，
+由 /metrics/ 以 Prometheus 文字格式輸出 (另附寄信佇列與 SQLite 寫入佇列的狀態)。
+
+- 查詢：所有資料庫連線都裝上 execute_wrapper，透過 contextvar 找到目前請求，
+  async view 裡以 sync_to_async 執行的查詢也算得到。
+- 模板：TEMPLATES 的 BACKEND 改成 TimedDjangoTemplates，只量最外層的 render
+  (include 的子模板已包含在內)；模板中才被求值的 queryset 同時算進 DB 與模板時間。
+- 預算：settings.VIEW_BUDGETS = {'seats:records': {'queries': 10, 'ms': 300}, ...}，
+  超過時計入 budget_exceeded 並印出警告；METRICS_ENFORCE_BUDGETS = True (測試用) 時
+  查詢次數超過預算會直接丟出 BudgetExceeded，讓 N+1 在 CI 失敗。時間預算只記錄不丟錯，避免測試機器快慢造成誤判。
+
+registry 是每個程序各自一份，多 worker 部署時請讓 Prometheus 分別抓取每個 worker。
+"""
+import contextvars
+import logging
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.backends.django import DjangoTemplates
+from django.utils.crypto import constant_time_compare
+
+# 請求延遲的 histogram 邊界 (秒)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNRESOLVED = '<unresolved>'
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('seatbooking_request_stats', default=None)
+
+
+class BudgetExceeded(AssertionError):
+    pass
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_seconds', 'template_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+
+
+# --- 查詢計時 ---
+
+def _track_queries(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+def _install(connection):
+    if _track_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_track_queries)
+
+
+@receiver(connection_created)
+def install_query_tracker(sender, connection, **kwargs):
+    # 新執行緒 (例如 sync_to_async 的 executor) 建立的連線
+    _install(connection)
+
+
+# --- 模板計時 ---
+
+class _TimedTemplate:
+
+    def __init__(self, template):
+        self._template = template
+
+    def __getattr__(self, name):
+        return getattr(self._template, name)
+
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return self._template.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self._template.render(context, request)
+        finally:
+            stats.template_seconds += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates，另外把 render 時間記到目前請求的 RequestStats。"""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+# --- registry ---
+
+class ViewMetrics:
+    __slots__ = ('requests', 'statuses', 'seconds', 'db_seconds', 'template_seconds',
+                 'queries', 'buckets', 'over_budget')
+
+    def __init__(self):
+        self.requests = 0
+        self.statuses = {}
+        self.seconds = 0.0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.queries = 0
+        self.buckets = [0] * len(BUCKETS)
+        self.over_budget = 0
+
+
+class Registry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, status, seconds, stats, over_budget=False):
+        with self._lock:
+            metrics = self._views.get(view)
+            if metrics is None:
+                metrics = self._views[view] = ViewMetrics()
+            metrics.requests += 1
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            metrics.seconds += seconds
+            metrics.db_seconds += stats.db_seconds
+            metrics.template_seconds += stats.template_seconds
+            metrics.queries += stats.queries
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    metrics.buckets[i] += 1
+            if over_budget:
+                metrics.over_budget += 1
+
+    def get(self, view):
+        with self._lock:
+            return self._views.get(view)
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def render(self):
+        """Prometheus text exposition format。"""
+        with self._lock:
+            views = sorted(self._views.items())
+            lines = []
+
+            def family(name, kind, help_text):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+            family('seatbooking_requests_total', 'counter', "Requests by view and status code.")
+            for view, m in views:
+                for status, count in sorted(m.statuses.items()):
+                    lines.append(f'seatbooking_requests_total{{view="{view}",status="{status}"}} {count}')
+
+            family('seatbooking_request_duration_seconds', 'histogram', "Total request latency by view.")
+            for view, m in views:
+                for bound, count in zip(BUCKETS, m.buckets):
+                    lines.append(f'seatbooking_request_duration_seconds_bucket{{view="{view}",le="{bound}"}} {count}')
+                lines.append(f'seatbooking_request_duration_seconds_bucket{{view="{view}",le="+Inf"}} {m.requests}')
+                lines.append(f'seatbooking_request_duration_seconds_sum{{view="{view}"}} {m.seconds:.6f}')
+                lines.append(f'seatbooking_request_duration_seconds_count{{view="{view}"}} {m.requests}')
+
+            for name, attr, help_text in (
+                ('seatbooking_db_queries_total', 'queries', "SQL queries executed by view."),
+                ('seatbooking_db_duration_seconds_total', 'db_seconds', "Time spent in SQL by view."),
+                ('seatbooking_template_duration_seconds_total', 'template_seconds', "Template render time by view."),
+                ('seatbooking_budget_exceeded_total', 'over_budget', "Requests over the view's VIEW_BUDGETS."),
+            ):
+                family(name, 'counter', help_text)
+                for view, m in views:
+                    value = getattr(m, attr)
+                    value = f"{value:.6f}" if isinstance(value, float) else value
+                    lines.append(f'{name}{{view="{view}"}} {value}')
+        return lines
+
+
+registry = Registry()
+
+
+# --- middleware ---
+
+class MetricsMiddleware:
+    """放在 MIDDLEWARE 最前面，其他 middleware (session、auth) 的查詢也會算進去。"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        for connection in connections.all():
+            _install(connection)
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, stats, time.perf_counter() - started)
+        return response
+
+    def _finish(self, request, response, stats, seconds):
+        if response.streaming:
+            # SSE 等串流回應的時間花在送出內容的過程中，這裡量不到，不計入
+            return
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else UNRESOLVED
+        budget = getattr(settings, 'VIEW_BUDGETS', {}).get(view, {})
+        over_queries = 'queries' in budget and stats.queries > budget['queries']
+        over_time = 'ms' in budget and seconds * 1000 > budget['ms']
+        registry.record(view, response.status_code, seconds, stats, over_budget=over_queries or over_time)
+        if over_queries or over_time:
+            message = (
+                f"{view}: {stats.queries} queries (budget {budget.get('queries', '-')}), "
+                f"{seconds * 1000:.1f}ms (budget {budget.get('ms', '-')}ms), "
+                f"db {stats.db_seconds * 1000:.1f}ms, template {stats.template_seconds * 1000:.1f}ms"
+            )
+            if over_queries and getattr(settings, 'METRICS_ENFORCE_BUDGETS', False):
+                raise BudgetExceeded(message)
+            logger.warning("View budget exceeded: %s", message)
+
+
+# --- /metrics/ ---
+
+def _outbox_lines():
+    from mail import outbox
+
+    lines = []
+    for name, value in outbox.stats().items():
+        metric = f"seatbooking_mail_outbox_{name}"
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {value}")
+    return lines
+
+
+def _write_queue_lines():
+    from seats import writes
+
+    stats = writes.queue.stats()
+    return [
+        "# TYPE seatbooking_write_queue_waiting gauge",
+        f"seatbooking_write_queue_waiting {stats['waiting']}",
+        "# TYPE seatbooking_write_queue_writes_total counter",
+        f"seatbooking_write_queue_writes_total {stats['writes']}",
+        "# TYPE seatbooking_write_queue_wait_seconds_total counter",
+        f"seatbooking_write_queue_wait_seconds_total {stats['wait_seconds']}",
+    ]
+
+
+def metrics_view(request):
+    """Prometheus 抓取端點：staff 登入，或帶 Authorization: Bearer <METRICS_TOKEN>。"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorized = request.user.is_authenticated and request.user.is_staff
+    if token and constant_time_compare(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        authorized = True
+    if not authorized:
+        return HttpResponseForbidden()
+    lines = registry.render() + _outbox_lines() + _write_queue_lines()
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'SeatBooking.metrics.MetricsMiddleware',  # 放最前面：每個 view 的查詢次數/延遲 (見 SeatBooking/metrics.py)
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,15 +55,22 @@ ROOT_URLCONF = 'SeatBooking.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'SeatBooking.metrics.TimedDjangoTemplates',  # DjangoTemplates + 渲染計時
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # 模板只編譯一次、留在程序記憶體裡 (開發時 runserver 偵測到模板變更會自動清掉)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'seats.context_processors.fragment_cache',
             ],
         },
     },
@@ -74,12 +82,116 @@ WSGI_APPLICATION = 'SeatBooking.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# SQLite 正式環境設定：每條新連線先執行以下 PRAGMA
+# - WAL：讀取不會被寫入擋住，寫入也不必等讀取結束
+# - synchronous=NORMAL：WAL 下只在 checkpoint 時 fsync，斷電最多遺失最後幾筆交易，不會損毀
+# - busy_timeout：拿不到寫鎖時最多等 5 秒，而不是立刻丟出 "database is locked"
+# - mmap_size / cache_size：讀取走記憶體映射，每條連線 64MB page cache
+SQLITE_INIT_COMMAND = ';'.join([
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA cache_size=-65536',
+    'PRAGMA temp_store=MEMORY',
+])
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # 連線保留重用，PRAGMA 與 page cache 不必每個請求重來
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': SQLITE_INIT_COMMAND,
+            # 交易一開始就取得寫鎖：避免交易中途從讀鎖升級成寫鎖時，WAL 直接回 SQLITE_BUSY 而不等待 busy_timeout
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+}
+
+# Cache
+# 座位佔用點陣等程序內快取以 cache 中的版本號同步 (見 seats/versions.py)。
+# 多個 worker 部署時請改成共享後端，例如 django.core.cache.backends.redis.RedisCache。
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+# 側邊選單與 faq / rules 靜態內容的 {% cache %} 片段存活秒數 (seats/context_processors.py) (改了內容要等過期或清 cache)
+TEMPLATE_FRAGMENT_CACHE_SECONDS = 3600
+
+
+# Mail outbox (mail/outbox.py)
+# 郵件先寫入佇列，由 `python manage.py send_queued_mail` 背景寄送
+MAIL_OUTBOX_BATCH_SIZE = 50
+MAIL_OUTBOX_MAX_ATTEMPTS = 5
+MAIL_OUTBOX_RETRY_BASE_SECONDS = 30
+# 認領一批郵件後多久沒寫回結果 (寄送程序中途結束) 就讓其他程序重新認領
+MAIL_OUTBOX_CLAIM_SECONDS = 600
+
+
+# Per-view metrics (SeatBooking/metrics.py)
+# /metrics/ 以 Prometheus 格式輸出每個 view 的查詢次數、DB/模板時間與延遲；staff 或帶 Bearer token 才能讀取
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# 測試中設為 True：查詢次數超過預算直接丟出 BudgetExceeded (見 seats/tests.py ViewBudgetTests)
+METRICS_ENFORCE_BUDGETS = False
+# 每個 view 的預算 (查詢次數包含 session 與 user 兩次)，超過時計入 seatbooking_budget_exceeded_total
+VIEW_BUDGETS = {
+    'seats:welcome': {'queries': 5, 'ms': 200},
+    'seats:dashboard': {'queries': 3, 'ms': 100},
+    'seats:seat_map': {'queries': 5, 'ms': 200},  # 含當天佔用點陣第一次建立
+    'seats:res_time': {'queries': 6, 'ms': 200},  # 座位配置第一次載入為 2 次 (座位 + 閱覽室)
+    'seats:make_reservation': {'queries': 5, 'ms': 300},
+    'seats:group_booking': {'queries': 16, 'ms': 300},  # 成員查詢 + 交易內 2 次檢查 + 每人一筆 INSERT
+    'seats:records': {'queries': 16, 'ms': 300},  # 3 個列表 + 封存表 + 候補 + 團體預約 (3)；跳頁時多 2 次定位查詢
+    'seats:join_waitlist': {'queries': 8, 'ms': 300},
+    'seats:leave_waitlist': {'queries': 6, 'ms': 300},
+    'seats:reminds': {'queries': 12, 'ms': 300},
+    'seats:availability_api': {'queries': 5, 'ms': 100},  # 同上，含座位配置第一次載入
+    'seats:recommend_api': {'queries': 5, 'ms': 100},
+    'seats:usage_dashboard': {'queries': 4, 'ms': 300},  # 只讀彙總表：時段表 + 每座位彙總
+    'seats:usage_csv': {'queries': 4, 'ms': 300},
+    'login': {'queries': 8, 'ms': 1000},  # 密碼雜湊本身就要數百 ms
+    'password_reset': {'queries': 8, 'ms': 300},
+}
+
+
+# Reservation sweeper (seats/lifecycle.py)
+# `python manage.py complete_reservations` 把已結束的預約轉成 completed
+RESERVATION_SWEEP_BATCH_SIZE = 500
+
+# Reservation archive (seats/archive.py)
+# `python manage.py archive_reservations` 把結束超過 N 天的預約搬到封存表
+RESERVATION_ARCHIVE_DAYS = 180
+RESERVATION_ARCHIVE_BATCH_SIZE = 500
+
+# Slot calendar (seats/slots.py)
+# 開館時間：key 為 weekday() (0=週一)，沒列出的用 'default'；None 表示整天休館。'24:00' 代表午夜閉館
+BOOKING_HOURS = {
+    'default': ('08:00', '24:00'),
+}
+# 國定假日等臨時休館日 (ISO 日期字串)
+BOOKING_CLOSED_DATES = []
+# 預約的最小單位 (分鐘)，必須整除一天；所有預約的起訖都要落在這個格線上
+BOOKING_SLOT_MINUTES = 60
+# 日期選單顯示幾天 (含今天，休館日不列)
+BOOKING_DAYS_AHEAD = 7
+# 預約頁的結束時間選單最多到開始後幾分鐘
+BOOKING_MAX_MINUTES = 180
+
+# Group booking (seats/spatial.py)：座位中心距離在 N px 內算相鄰；一次最多幾人
+GROUP_BOOKING_ADJACENT_PX = 60
+GROUP_BOOKING_MAX_SIZE = 8
+# 團體預約要所有受邀成員確認 (seats/groups.py)：每人同時最多發起幾筆等待確認的團體預約
+GROUP_BOOKING_MAX_PENDING = 3
+# 推薦替代座位 (/api/recommend/) 一次最多回傳幾個
+SEAT_RECOMMEND_MAX = 10
+
+# Waitlist (seats/waitlist.py)：每人同時最多幾筆候補；每次有預約取消時最多檢查幾筆候補
+WAITLIST_MAX_PER_USER = 3
+WAITLIST_MATCH_LIMIT = 50
 
 
 # Password validation
@@ -126,6 +238,20 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
+# `python manage.py build_assets` 收集到這裡。檔名帶內容 hash，web server 對 /static/ 可設
+# Cache-Control: public, max-age=31536000, immutable，並開啟 gzip_static / brotli_static 送出預先壓縮的檔案
+STATIC_ROOT = BASE_DIR / "staticfiles"
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "SeatBooking.storage.ForgivingManifestStaticFilesStorage"},
+}
+# build_assets 產生的縮圖 (static/variants/)：widths 是模板實際顯示的寬度 (1x, 2x)，icons 是 favicon 的 PNG 尺寸
+IMAGE_VARIANT_FORMATS = ['avif', 'webp']
+IMAGE_VARIANTS = {
+    'S__25559045.png': {'widths': [100, 200], 'icons': [32]},  # 登入/註冊頁 logo 顯示 100px
+    'S__25559043.png': {'icons': [32]},
+    '20250531RR.png': {'widths': [400, 747]},  # dashboard 卡片圖，原圖寬 747
+}
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
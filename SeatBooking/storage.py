@@ -0,0 +1,19 @@
+# SeatBooking/storage.py
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+
+class ForgivingManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    collectstatic 時檔名加上內容 hash (styles.css -> styles.1a2b3c.css)，CSS 裡的 url() 一併改寫，
+    /static/ 因此可以設成一年的 immutable 快取。
+
+    還沒跑過 collectstatic (測試、DEBUG=False 的本機) 或 manifest 裡沒有的檔案，
+    不丟 ValueError，退回原本的檔名。
+    """
+    manifest_strict = False
+
+    def hashed_name(self, name, content=None, filename=None):
+        try:
+            return super().hashed_name(name, content, filename)
+        except ValueError:
+            return name
@@ -20,11 +20,13 @@ from userauth.views import login_view, register_view, logout_view
 from django.conf import settings
 from userauth.views import login_view, register_view, logout_view
 from django.views.generic import RedirectView
+from SeatBooking.metrics import metrics_view
 
 path('reservation/', include('seats.urls')),
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics/', metrics_view, name='metrics'),  # Prometheus 指標
     path('login/', login_view, name="login"),
     path('logout/', logout_view, name="logout"),
     path('register/', register_view, name="register"),
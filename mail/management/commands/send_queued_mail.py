@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from mail import outbox
+
+
+class Command(BaseCommand):
+    help = "寄出 OutgoingEmail 佇列中的郵件 (背景 worker)。"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="寄完目前到期的郵件後結束")
+        parser.add_argument('--interval', type=float, default=1.0, help="佇列為空時的輪詢間隔 (秒)")
+        parser.add_argument('--batch-size', type=int, default=None, help="每批寄送數量 (預設 MAIL_OUTBOX_BATCH_SIZE)")
+        parser.add_argument('--stats', action='store_true', help="只輸出佇列狀態")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for name, value in outbox.stats().items():
+                self.stdout.write(f"{name} {value}")
+            return
+        outbox.run_worker(
+            interval=options['interval'],
+            batch_size=options['batch_size'],
+            once=options['once'],
+            log=self.stdout.write,
+        )
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:37
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutgoingEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255, verbose_name='主旨')),
+                ('body', models.TextField(verbose_name='內容')),
+                ('from_email', models.CharField(blank=True, max_length=254, verbose_name='寄件者')),
+                ('recipients', models.TextField(verbose_name='收件者')),
+                ('status', models.CharField(choices=[('pending', '待寄送'), ('sent', '已寄出'), ('failed', '寄送失敗')], default='pending', max_length=10, verbose_name='狀態')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='嘗試次數')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='下次嘗試時間')),
+                ('last_error', models.TextField(blank=True, verbose_name='最後錯誤')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='建立時間')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='寄出時間')),
+            ],
+            options={
+                'verbose_name': '待寄郵件',
+                'verbose_name_plural': '待寄郵件',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='mail_outbox_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mail', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outgoingemail',
+            name='status',
+            field=models.CharField(choices=[('pending', '待寄送'), ('sending', '寄送中'), ('sent', '已寄出'), ('failed', '寄送失敗')], default='pending', max_length=10, verbose_name='狀態'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import models
+from django.utils import timezone
+
+
+class OutgoingEmail(models.Model):
+    STATUS_CHOICES = [
+        ('pending', '待寄送'),
+        ('sending', '寄送中'),
+        ('sent', '已寄出'),
+        ('failed', '寄送失敗'),
+    ]
+
+    subject = models.CharField(max_length=255, verbose_name="主旨")
+    body = models.TextField(verbose_name="內容")
+    from_email = models.CharField(max_length=254, blank=True, verbose_name="寄件者")  # 空白表示 DEFAULT_FROM_EMAIL
+    recipients = models.TextField(verbose_name="收件者")  # 一行一個
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name="狀態")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="嘗試次數")
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="下次嘗試時間")
+    last_error = models.TextField(blank=True, verbose_name="最後錯誤")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="建立時間")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="寄出時間")
+
+    class Meta:
+        verbose_name = "待寄郵件"
+        verbose_name_plural = "待寄郵件"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='mail_outbox_due_idx'),
+        ]
+
+    def recipient_list(self):
+        return [r for r in self.recipients.splitlines() if r]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipient_list())} ({self.get_status_display()})"
@@ -0,0 +1,126 @@
+# mail/outbox.py
+"""
+寄信佇列。
+
+view 只呼叫 enqueue() 把郵件寫進 OutgoingEmail 資料表就回應使用者，
+真正的 SMTP 寄送由 `python manage.py send_queued_mail` 背景程序批次處理：
+同一批郵件共用一條 SMTP 連線，失敗的郵件以指數退避重試，
+超過 MAIL_OUTBOX_MAX_ATTEMPTS 次標記為 failed。SMTP 卡住只會拖慢佇列，不會卡住 request。
+
+同時跑多個 send_queued_mail (或背景程序加上手動執行) 時，每批郵件先以條件式 UPDATE
+認領 (pending -> sending)，只寄自己認領到的，同一封信不會被寄兩次。
+認領後 MAIL_OUTBOX_CLAIM_SECONDS 內沒有寫回結果 (程序中途結束) 的郵件會被重新認領。
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Avg, F, Min, Q
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue(subject, message, recipient_list, from_email=None):
+    """把郵件放進佇列，參數與 django.core.mail.send_mail 相同。"""
+    return OutgoingEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or '',
+        recipients='\n'.join(recipient_list),
+    )
+
+
+def _backoff(attempts):
+    base = _setting('MAIL_OUTBOX_RETRY_BASE_SECONDS', 30)
+    return timedelta(seconds=min(base * (2 ** (attempts - 1)), 3600))
+
+
+def drain(batch_size=None, connection=None):
+    """
+    寄出一批到期的郵件，回傳 (寄出數, 失敗數)。
+    整批共用一條 SMTP 連線；單封失敗不影響其他郵件，連線斷掉時重新連線。
+    """
+    batch_size = batch_size or _setting('MAIL_OUTBOX_BATCH_SIZE', 50)
+    max_attempts = _setting('MAIL_OUTBOX_MAX_ATTEMPTS', 5)
+    now = timezone.now()
+    # 到期的待寄郵件，加上認領後逾時沒寫回結果的 (sending 的 next_attempt_at 是認領期限)
+    due = OutgoingEmail.objects.filter(Q(status='pending') | Q(status='sending'), next_attempt_at__lte=now)
+    ids = list(due.order_by('next_attempt_at', 'id').values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return 0, 0
+    # 條件式 UPDATE 認領：同時間其他程序已認領的列不會再被更新；認領期限同時當作這批的識別
+    lease = now + timedelta(seconds=_setting('MAIL_OUTBOX_CLAIM_SECONDS', 600))
+    if not due.filter(pk__in=ids).update(status='sending', next_attempt_at=lease):
+        return 0, 0
+    batch = list(OutgoingEmail.objects.filter(pk__in=ids, status='sending', next_attempt_at=lease).order_by('id'))
+
+    connection = connection or get_connection(fail_silently=False)
+    sent = failed = 0
+    try:
+        for email in batch:
+            message = EmailMessage(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email or None,
+                to=email.recipient_list(),
+                connection=connection,
+            )
+            email.attempts += 1
+            try:
+                # 先自行開啟連線，backend 就不會在每封信寄完後關閉它
+                connection.open()
+                message.send()
+            except Exception as e:
+                failed += 1
+                email.last_error = f"{type(e).__name__}: {e}"
+                if email.attempts >= max_attempts:
+                    email.status = 'failed'
+                else:
+                    email.status = 'pending'
+                    email.next_attempt_at = timezone.now() + _backoff(email.attempts)
+                # 連線可能已經壞掉，關掉讓下一封重新連線
+                connection.close()
+            else:
+                sent += 1
+                email.status = 'sent'
+                email.sent_at = timezone.now()
+                email.last_error = ''
+            email.save(update_fields=['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'])
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def stats(window=timedelta(hours=1)):
+    """佇列狀態：待寄數量、最舊待寄郵件的等待秒數、失敗數，以及最近 window 內的平均寄送延遲。"""
+    now = timezone.now()
+    pending = OutgoingEmail.objects.filter(status__in=['pending', 'sending'])
+    oldest = pending.aggregate(oldest=Min('created_at'))['oldest']
+    recent = OutgoingEmail.objects.filter(status='sent', sent_at__gte=now - window)
+    latency = recent.aggregate(latency=Avg(F('sent_at') - F('created_at')))['latency']
+    return {
+        'queue_depth': pending.count(),
+        'oldest_pending_seconds': (now - oldest).total_seconds() if oldest else 0.0,
+        'failed': OutgoingEmail.objects.filter(status='failed').count(),
+        'sent_recently': recent.count(),
+        'avg_send_latency_seconds': latency.total_seconds() if latency else 0.0,
+    }
+
+
+def run_worker(interval=1.0, batch_size=None, once=False, log=None):
+    """持續寄送佇列；once=True 時清空目前到期的郵件後結束。"""
+    while True:
+        started = time.monotonic()
+        sent, failed = drain(batch_size=batch_size)
+        if log and (sent or failed):
+            log(f"sent={sent} failed={failed} elapsed={time.monotonic() - started:.2f}s")
+        if once and not (sent or failed):
+            return
+        if not (sent or failed):
+            time.sleep(interval)
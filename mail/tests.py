@@ -0,0 +1,157 @@
+import socketserver
+import threading
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import outbox
+from .models import OutgoingEmail
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """最小的 SMTP 對話，只夠 smtplib / Django 的 SMTP backend 使用。"""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 localhost test SMTP')
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode().strip()
+            command = line.upper()
+            if not line or command == 'QUIT':
+                self.reply('221 bye')
+                return
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250 localhost')
+            elif command.startswith('MAIL FROM'):
+                recipients = []
+                self.reply('250 OK')
+            elif command.startswith('RCPT TO'):
+                if 'bounce' in line:
+                    self.reply('550 no such user')
+                else:
+                    recipients.append(line.split(':', 1)[1].strip('<> '))
+                    self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 end with .')
+                body = []
+                while (data := self.rfile.readline()) not in (b'.\r\n', b''):
+                    body.append(data.decode())
+                self.server.messages.append((recipients, ''.join(body)))
+                self.reply('250 queued')
+            else:  # RSET / NOOP
+                self.reply('250 OK')
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _SMTPHandler)
+        self.connections = 0
+        self.messages = []
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+class OutboxTests(TestCase):
+
+    def setUp(self):
+        self.smtp = LocalSMTPServer().__enter__()
+        self.addCleanup(self.smtp.__exit__)
+        settings_override = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.smtp.server_address[1],
+            EMAIL_USE_TLS=False,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_batch_reuses_one_connection(self):
+        for i in range(5):
+            outbox.enqueue(f"主旨 {i}", "內容", [f"user{i}@example.com"])
+        self.assertEqual(outbox.stats()['queue_depth'], 5)
+
+        self.assertEqual(outbox.drain(), (5, 0))
+        self.assertEqual(len(self.smtp.messages), 5)
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(OutgoingEmail.objects.filter(status='sent').count(), 5)
+        stats = outbox.stats()
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertEqual(stats['sent_recently'], 5)
+        self.assertGreaterEqual(stats['avg_send_latency_seconds'], 0)
+
+    def test_failure_backs_off_then_gives_up(self):
+        bad = outbox.enqueue("退信", "內容", ["bounce@example.com"])
+        good = outbox.enqueue("正常", "內容", ["ok@example.com"])
+
+        self.assertEqual(outbox.drain(), (1, 1))
+        bad.refresh_from_db()
+        self.assertEqual(bad.status, 'pending')
+        self.assertEqual(bad.attempts, 1)
+        self.assertGreater(bad.next_attempt_at, timezone.now())
+        self.assertIn('SMTPRecipientsRefused', bad.last_error)
+        good.refresh_from_db()
+        self.assertEqual(good.status, 'sent')
+
+        # 尚未到重試時間
+        self.assertEqual(outbox.drain(), (0, 0))
+        with self.settings(MAIL_OUTBOX_MAX_ATTEMPTS=2):
+            OutgoingEmail.objects.filter(pk=bad.pk).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+            self.assertEqual(outbox.drain(), (0, 1))
+        bad.refresh_from_db()
+        self.assertEqual(bad.status, 'failed')
+        self.assertEqual(outbox.stats()['failed'], 1)
+
+    def test_claimed_batch_is_not_sent_twice(self):
+        first = outbox.enqueue("主旨", "內容", ["a@example.com"])
+        second = outbox.enqueue("主旨", "內容", ["b@example.com"])
+        # 模擬另一個程序已認領 first：這次只寄 second
+        lease = timezone.now() + timedelta(minutes=10)
+        OutgoingEmail.objects.filter(pk=first.pk).update(status='sending', next_attempt_at=lease)
+        self.assertEqual(outbox.drain(), (1, 0))
+        self.assertEqual([recipients for recipients, _ in self.smtp.messages], [['b@example.com']])
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts), ('sending', 0))
+
+        # 認領逾時 (寄送程序中途結束) 後重新認領寄出
+        OutgoingEmail.objects.filter(pk=first.pk).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(outbox.drain(), (1, 0))
+        self.assertEqual(len(self.smtp.messages), 2)
+        self.assertEqual(outbox.drain(), (0, 0))
+
+    def test_worker_once_drains_queue(self):
+        for i in range(7):
+            outbox.enqueue("主旨", "內容", [f"u{i}@example.com"])
+        outbox.run_worker(batch_size=3, once=True)
+        self.assertEqual(len(self.smtp.messages), 7)
+        self.assertEqual(self.smtp.connections, 3)
+
+
+class PasswordResetQueuesMailTests(TestCase):
+
+    def test_verification_code_is_queued_not_sent(self):
+        User.objects.create_user(username="forgetful", email="forgetful@example.com", password="pw-12345678")
+        response = self.client.post(reverse('password_reset'), {
+            'action': 'send_code', 'email': 'forgetful@example.com',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mail.outbox, [])
+        queued = OutgoingEmail.objects.get()
+        self.assertEqual(queued.recipient_list(), ['forgetful@example.com'])
+        self.assertIn(self.client.session['verification_code'], queued.body)
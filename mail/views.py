@@ -1,6 +1,6 @@
 # mail/views.py
 from django.shortcuts import render, redirect
-from django.core.mail import send_mail
+from . import outbox
 from django.contrib import messages
 from .forms import PasswordResetForm
 from django.contrib.auth.models import User
@@ -30,12 +30,12 @@ def password_reset_view(request):
                     request.session['reset_stage'] = 'verification'
 
                     try:
-                        send_mail(
+                        # 寫入寄信佇列，由 send_queued_mail 背景寄送
+                        outbox.enqueue(
                             subject='您的 驗證碼',
                             message=f'您好，您的驗證碼是：{code}',
-                            from_email=None,  # 如果 settings 裡有 DEFAULT_FROM_EMAIL，可以設 None
                             recipient_list=[email],
-                            fail_silently=False,
+                            from_email=None,  # None 表示使用 DEFAULT_FROM_EMAIL
                         )
                         # 成功寄出郵件的泡泡提示
                         messages.success(request, '驗證碼已寄出，請至信箱查看。')
@@ -1,7 +1,202 @@
-from django.contrib import admin
-from .models import Seat, Reservation, Report 
+from django.contrib import admin, messages
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+
+from . import exports, floorplan
+from .forms import FloorPlanImportForm
+from .models import (
+    ArchivedReservation, Branch, GroupBooking, GroupBookingMember, Room, Seat, Reservation, Report, WaitlistEntry,
+)
 
-admin.site.register(Seat)
-admin.site.register(Reservation)
 # Register your models here.
-admin.site.register(Report)
+
+
+@admin.register(Branch)
+class BranchAdmin(admin.ModelAdmin):
+    list_display = ('name', 'sort_order')
+    ordering = ('sort_order', 'id')
+
+
+@admin.register(Room)
+class RoomAdmin(admin.ModelAdmin):
+    list_display = ('name', 'branch', 'slug', 'sort_order')
+    list_filter = ('branch',)
+    list_select_related = ('branch',)
+    prepopulated_fields = {'slug': ('name',)}
+
+
+@admin.register(Seat)
+class SeatAdmin(admin.ModelAdmin):
+    list_display = ('name', 'room', 'x', 'y')
+    list_filter = ('room',)
+    list_select_related = ('room__branch',)
+    search_fields = ('name',)
+    ordering = ('room', 'name')
+    change_list_template = 'admin/seats/seat/change_list.html'
+    actions = ['export_floorplan']
+
+    @admin.action(description="匯出選取的座位 (平面圖 CSV，可編輯後再匯入)")
+    def export_floorplan(self, request, queryset):
+        return exports.streaming_response(floorplan.export_rows(queryset), exports.export_filename('floorplan'))
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='seats_seat_import'),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        """上傳平面圖 -> 預覽差異 (不寫入) -> 確認匯入。"""
+        if not (self.has_add_permission(request) and self.has_change_permission(request)):
+            messages.error(request, "沒有匯入座位的權限。")
+            return redirect('admin:seats_seat_changelist')
+        result, data = None, ''
+        form = FloorPlanImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            confirmed = not upload  # 預覽頁送回來的是隱藏欄位 data
+            try:
+                raw = upload.read() if upload else form.cleaned_data['data']
+                rows = floorplan.read(raw, filename=upload.name if upload else None)
+            except floorplan.FloorPlanError as e:
+                messages.error(request, str(e))
+            else:
+                data = raw.decode('utf-8-sig') if isinstance(raw, bytes) else raw
+                result = floorplan.import_rows(
+                    rows, delete_missing=form.cleaned_data['delete_missing'], dry_run=not confirmed,
+                    room=form.cleaned_data['room'],
+                )
+                if result.applied:
+                    messages.success(request, f"已匯入 {result.room} 的平面圖：{result.summary()}。")
+                    return redirect('admin:seats_seat_changelist')
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "匯入座位平面圖",
+            'form': form,
+            'result': result,
+            'data': data,
+            'delete_missing': form.cleaned_data.get('delete_missing') if form.is_bound and form.is_valid() else False,
+        }
+        return TemplateResponse(request, 'admin/seats/seat/import_floorplan.html', context)
+
+
+@admin.action(description="匯出選取的預約 (CSV)")
+def export_reservations_csv(modeladmin, request, queryset):
+    # 勾「全選」時 queryset 就是目前的篩選結果 (狀態/日期)，逐批串流輸出
+    return exports.streaming_response(
+        exports.reservation_rows(queryset=queryset), exports.export_filename('reservations'),
+    )
+
+
+@admin.register(Reservation)
+class ReservationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'seat', 'user', 'start_time', 'end_time', 'status', 'created_at')
+    list_filter = ('status',)
+    list_select_related = ('seat', 'user')
+    search_fields = ('user__username', 'seat__name')
+    date_hierarchy = 'start_time'
+    actions = [export_reservations_csv]
+    change_list_template = 'admin/seats/reservation/change_list.html'
+
+    # 結束超過 RESERVATION_ARCHIVE_DAYS 的預約已搬到封存表 (seats/archive.py)：
+    # 列表頁附上同樣篩選條件的歷史預約筆數與連結，依 id 開啟已封存的預約時轉到封存表
+    def changelist_view(self, request, extra_context=None):
+        archived_admin = self.admin_site._registry.get(ArchivedReservation)
+        if archived_admin is not None and archived_admin.has_view_permission(request):
+            try:
+                # 兩邊的篩選、搜尋與日期欄位相同，同一份查詢參數直接套用到封存表
+                archived = archived_admin.get_changelist_instance(request)
+            except IncorrectLookupParameters:
+                archived = None
+            if archived is not None:
+                params = request.GET.copy()
+                for key in ('p', 'o'):  # 頁碼與排序各自獨立
+                    params.pop(key, None)
+                url = reverse('admin:seats_archivedreservation_changelist')
+                extra_context = {
+                    **(extra_context or {}),
+                    'archive_url': f"{url}?{params.urlencode()}" if params else url,
+                    'archived_count': archived.result_count,
+                }
+        return super().changelist_view(request, extra_context)
+
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        if (object_id.isdigit() and not Reservation.objects.filter(pk=object_id).exists()
+                and ArchivedReservation.objects.filter(pk=object_id).exists()):
+            return redirect('admin:seats_archivedreservation_change', object_id)
+        return super().change_view(request, object_id, form_url, extra_context)
+
+
+@admin.register(Report)
+class ReportAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'reservation_record')
+    list_select_related = (
+        'seat', 'reported_user',
+        'reported_reservation__seat', 'reported_reservation__user',
+        'reported_archived_reservation__seat', 'reported_archived_reservation__user',
+    )
+    list_filter = ('status',)
+    date_hierarchy = 'submitted_at'
+    readonly_fields = ('reservation_record',)
+    actions = ['export_csv']
+
+    @admin.action(description="匯出選取的檢舉 (CSV)")
+    def export_csv(self, request, queryset):
+        return exports.streaming_response(exports.report_rows(queryset=queryset), exports.export_filename('reports'))
+
+    @admin.display(description="被檢舉的預約 (含封存)")
+    def reservation_record(self, obj):
+        return obj.reservation_record or "-"
+
+
+@admin.register(ArchivedReservation)
+class ArchivedReservationAdmin(admin.ModelAdmin):
+    """封存的歷史預約 (seats/archive.py)，只能查看。"""
+    list_display = ('id', 'seat', 'user', 'start_time', 'end_time', 'status', 'archived_at')
+    list_filter = ('status',)
+    list_select_related = ('seat', 'user')
+    search_fields = ('user__username', 'seat__name')
+    date_hierarchy = 'start_time'
+    actions = ['export_csv']
+
+    @admin.action(description="匯出選取的封存預約 (CSV)")
+    def export_csv(self, request, queryset):
+        # 封存表欄位與 Reservation 相同，共用同一份格式 (最後一欄標示已封存)
+        rows = exports.reservation_rows(queryset=Reservation.objects.none(), archived_queryset=queryset)
+        return exports.streaming_response(rows, exports.export_filename('archived-reservations'))
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    """候補名單 (seats/waitlist.py)。"""
+    list_display = ('id', 'user', 'room', 'seat', 'start_time', 'end_time', 'status', 'reservation', 'created_at')
+    list_filter = ('status', 'room')
+    list_select_related = ('user', 'room', 'seat', 'reservation__seat', 'reservation__user')
+    search_fields = ('user__username', 'seat__name')
+    date_hierarchy = 'start_time'
+    raw_id_fields = ('reservation',)
+
+
+class GroupBookingMemberInline(admin.TabularInline):
+    model = GroupBookingMember
+    extra = 0
+    raw_id_fields = ('user',)
+
+
+@admin.register(GroupBooking)
+class GroupBookingAdmin(admin.ModelAdmin):
+    """團體預約邀請 (seats/groups.py)。"""
+    list_display = ('id', 'leader', 'room', 'start_time', 'end_time', 'status', 'created_at')
+    list_filter = ('status', 'room')
+    list_select_related = ('leader', 'room')
+    search_fields = ('leader__username', 'members__username')
+    date_hierarchy = 'start_time'
+    inlines = [GroupBookingMemberInline]
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SeatsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'seats'
+
+    def ready(self):
+        from . import signals  # noqa: F401  註冊 signal receivers
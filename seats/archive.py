@@ -0,0 +1,64 @@
+# seats/archive.py
+"""
+歷史預約封存。
+
+結束超過 RESERVATION_ARCHIVE_DAYS 天的預約 (不論狀態) 搬到 ArchivedReservation，
+連同 Report.reported_reservation 一起改指向封存表 (候補到的預約 WaitlistEntry.reservation 清空)，
+線上的 Reservation 表只留近期資料，
+它的索引才小得能留在快取裡。個人紀錄頁與後台會把兩張表合併讀取 (見 views.records)。
+
+跟 lifecycle.sweep_completed 一樣分批、每批一個短交易。
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ArchivedReservation, Report, Reservation, WaitlistEntry
+
+
+def archive_cutoff(now=None, days=None):
+    if days is None:
+        days = getattr(settings, 'RESERVATION_ARCHIVE_DAYS', 180)
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def archive_reservations(before=None, batch_size=None, pause=0.0):
+    """把 end_time < before (預設 archive_cutoff()) 的預約搬到封存表，回傳搬移筆數。"""
+    before = before or archive_cutoff()
+    batch_size = batch_size or getattr(settings, 'RESERVATION_ARCHIVE_BATCH_SIZE', 500)
+    old = Reservation.objects.filter(end_time__lt=before).order_by('pk')
+    total = 0
+    while True:
+        with transaction.atomic():
+            rows = list(old[:batch_size])
+            if not rows:
+                return total
+            ids = [res.pk for res in rows]
+            ArchivedReservation.objects.bulk_create([
+                ArchivedReservation(
+                    id=res.pk, seat_id=res.seat_id, user_id=res.user_id,
+                    start_time=res.start_time, end_time=res.end_time,
+                    # 還沒被 complete_reservations 處理過的也早就結束了
+                    status='completed' if res.status == 'reserved' else res.status,
+                    created_at=res.created_at,
+                )
+                for res in rows
+            ])
+            Report.objects.filter(reported_reservation_id__in=ids).update(
+                reported_archived_reservation_id=F('reported_reservation_id'),
+                reported_reservation=None,
+            )
+            # 外鍵是 SET_NULL，但 _raw_delete 不處理 on_delete，要自己清空
+            WaitlistEntry.objects.filter(reservation_id__in=ids).update(reservation=None)
+            # 檢舉已經改指向封存表、候補不再指向這些預約，直接 DELETE 不走 Collector：
+            # 這些預約早已結束，不需要觸發 occupancy / live 的 signals
+            Reservation.objects.filter(pk__in=ids)._raw_delete(Reservation.objects.db)
+            total += len(ids)
+        if len(ids) < batch_size:
+            return total
+        if pause:
+            time.sleep(pause)
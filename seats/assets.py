@@ -0,0 +1,167 @@
+# seats/assets.py
+"""
+靜態資源的前置處理 (由 `python manage.py build_assets` 呼叫)。
+
+- 圖片：依 settings.IMAGE_VARIANTS 把原圖縮成模板實際顯示的寬度，輸出 AVIF/WebP
+  (以及 favicon 用的小 PNG) 到 static/variants/。{% picture %} 只會列出真的存在的格式，
+  沒跑過 build_assets 的開發環境直接用原圖。
+- CSS/JS：collectstatic 之後在 STATIC_ROOT 旁放一份 .gz (與 .br，需安裝 brotli)，
+  讓 nginx 的 gzip_static / brotli_static 直接送出，不用每次請求即時壓縮。
+
+檔名的 hash 由 STORAGES 的 ManifestStaticFilesStorage 產生 (見 SeatBooking/storage.py)，
+內容一變 URL 就變，所以 /static/ 可以設一年的 Cache-Control: immutable。
+
+    IMAGE_VARIANTS = {
+        'S__25559045.png': {'widths': [100, 200], 'icons': [32]},
+    }
+"""
+import gzip
+import os
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillow 是選用套件，沒裝就只做壓縮
+    Image = features = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+VARIANT_DIR = 'variants'
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'png': 'image/png'}
+# 各格式的編碼參數：AVIF/WebP 的 quality 是肉眼看不出差異的最低值附近
+SAVE_OPTIONS = {
+    'avif': {'quality': 55},
+    'webp': {'quality': 80, 'method': 6},
+    'png': {'optimize': True},
+}
+COMPRESS_EXTENSIONS = ('.css', '.js', '.svg')
+
+
+def variant_formats():
+    return list(getattr(settings, 'IMAGE_VARIANT_FORMATS', ['avif', 'webp']))
+
+
+def variant_root():
+    return Path(getattr(settings, 'IMAGE_VARIANT_ROOT', settings.BASE_DIR / 'static' / VARIANT_DIR))
+
+
+def variant_name(name, width, fmt):
+    """static 路徑：'20250531RR.png', 400, 'webp' -> 'variants/20250531RR-400.webp'。"""
+    stem = name.rsplit('.', 1)[0]
+    return f"{VARIANT_DIR}/{stem}-{width}.{fmt}"
+
+
+def variant_spec(name):
+    return getattr(settings, 'IMAGE_VARIANTS', {}).get(name, {})
+
+
+def supported(fmt):
+    if Image is None:
+        return False
+    if fmt in ('avif', 'webp'):
+        return bool(features.check(fmt))
+    return True
+
+
+def build_variants(formats=None, log=None):
+    """產生所有設定中的縮圖，回傳 (新產生的數量, 已是最新而略過的數量)。"""
+    log = log or (lambda message: None)
+    if Image is None:
+        log("Pillow 未安裝，略過圖片縮圖。")
+        return 0, 0
+    formats = formats or variant_formats()
+    for fmt in formats:
+        if not supported(fmt):
+            log(f"此 Pillow 不支援 {fmt}，略過。")
+    formats = [fmt for fmt in formats if supported(fmt)]
+
+    root = variant_root()
+    written = skipped = 0
+    for name, spec in getattr(settings, 'IMAGE_VARIANTS', {}).items():
+        source = finders.find(name)
+        if source is None:
+            log(f"找不到 {name}，略過。")
+            continue
+        jobs = [(width, fmt) for width in spec.get('widths', []) for fmt in formats]
+        jobs += [(size, 'png') for size in spec.get('icons', [])]
+        with Image.open(source) as image:
+            image.load()
+            for width, fmt in jobs:
+                target = root / variant_name(name, width, fmt).split('/', 1)[1]
+                if target.exists() and target.stat().st_mtime >= os.stat(source).st_mtime:
+                    skipped += 1
+                    continue
+                target.parent.mkdir(parents=True, exist_ok=True)
+                _resize(image, width).save(target, format=fmt.upper(), **SAVE_OPTIONS[fmt])
+                written += 1
+                log(f"  {target.name} ({target.stat().st_size // 1024} KB)")
+    return written, skipped
+
+
+def _resize(image, width):
+    # 不放大：要求的寬度比原圖大時直接重新編碼原尺寸
+    if image.width <= width:
+        return image
+    height = round(image.height * width / image.width)
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def compress_static(root=None, log=None):
+    """對 root (預設 STATIC_ROOT) 底下的 CSS/JS/SVG 預先壓縮，回傳產生的檔案數。"""
+    log = log or (lambda message: None)
+    root = Path(root or settings.STATIC_ROOT)
+    encoders = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        encoders.append(('.br', lambda data: brotli.compress(data, quality=11)))
+    else:
+        log("brotli 未安裝，只產生 .gz。")
+
+    count = 0
+    for path in root.rglob('*'):
+        if path.suffix not in COMPRESS_EXTENSIONS or not path.is_file():
+            continue
+        data = None
+        for suffix, encode in encoders:
+            target = path.with_name(path.name + suffix)
+            if target.exists() and target.stat().st_mtime >= path.stat().st_mtime:
+                continue
+            if data is None:
+                data = path.read_bytes()
+            target.write_bytes(encode(data))
+            count += 1
+    return count
+
+
+# --- 模板用 ---
+
+@lru_cache(maxsize=None)
+def exists(path):
+    """collectstatic 過 (有 manifest) 就查 manifest，否則找 STATICFILES_DIRS。結果在程序內快取。"""
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', None)
+    if hashed_files:
+        return staticfiles_storage.hash_key(path) in hashed_files
+    return finders.find(path) is not None
+
+
+def available_variants(name):
+    """[(格式, [(static 路徑, 寬度), ...]), ...]，依 IMAGE_VARIANT_FORMATS 的偏好順序，只含實際存在的檔案。"""
+    widths = variant_spec(name).get('widths', [])
+    result = []
+    for fmt in variant_formats():
+        entries = [(variant_name(name, width, fmt), width) for width in widths]
+        entries = [(path, width) for path, width in entries if exists(path)]
+        if entries:
+            result.append((fmt, entries))
+    return result
+
+
+def reset():
+    exists.cache_clear()
@@ -0,0 +1,177 @@
+# seats/booking.py
+"""
+預約寫入路徑。
+
+原本 make_reservation 先查座位衝突、再查使用者衝突、最後 create，三次來回且沒有鎖，
+搶位高峰會重複預約。這裡把「兩個衝突檢查 + 新增」合成一個原子操作：
+
+- SQLite：單一條 INSERT ... SELECT ... WHERE NOT EXISTS (...) AND NOT EXISTS (...)。
+  一條陳述式本身就是一個交易，寫鎖與讀取快照由 SQLite 保證，不會有兩筆同時成立；
+  同一程序內的寫入經 writes.serialized() 排隊；其他程序佔著寫鎖 ("database is locked") 時以指數退避重試。
+- 其他資料庫：在交易內依固定順序 select_for_update 鎖住座位與使用者，再檢查與新增。
+
+團體預約 (book_group) 一次寫入多筆，全部成立或全部不成立：SQLite 的交易以 BEGIN IMMEDIATE
+開始 (settings 的 transaction_mode)，檢查與新增期間其他程序無法寫入；其他資料庫同樣先鎖住所有座位與使用者。
+"""
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection, transaction
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from . import writes
+from .models import Reservation, Seat
+
+BOOKED = 'booked'
+SEAT_TAKEN = 'seat_taken'  # 座位在該時段已被預約
+USER_BUSY = 'user_busy'  # 使用者在該時段已有其他預約
+
+MAX_RETRIES = 8
+RETRY_BASE_DELAY = 0.005
+
+
+class BookingResult:
+    def __init__(self, status, reservation=None, reservations=None, conflicts=()):
+        self.status = status
+        self.reservation = reservation
+        self.reservations = reservations or ([reservation] if reservation else [])
+        self.conflicts = list(conflicts)  # 團體預約：衝突的座位或使用者
+
+    @property
+    def ok(self):
+        return self.status == BOOKED
+
+    def __repr__(self):
+        return f"<BookingResult {self.status}>"
+
+
+def _is_lock_error(exc):
+    return 'locked' in str(exc)
+
+
+def book_seat(user, seat, start_dt, end_dt, retries=MAX_RETRIES):
+    """在 [start_dt, end_dt) 為 user 預約 seat，回傳 BookingResult。"""
+    for attempt in range(retries + 1):
+        try:
+            # 同一程序內的寫入先排隊 (seats/writes.py)，退避等待時不佔著佇列
+            with writes.serialized():
+                if connection.vendor == 'sqlite':
+                    return _book_conditional_insert(user, seat, start_dt, end_dt)
+                return _book_select_for_update(user, seat, start_dt, end_dt)
+        except OperationalError as e:
+            if not _is_lock_error(e) or attempt == retries:
+                raise
+            time.sleep(RETRY_BASE_DELAY * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+
+def book_group(assignments, start_dt, end_dt, retries=MAX_RETRIES):
+    """
+    團體預約：assignments 為 [(user, seat), ...]，在 [start_dt, end_dt) 一次全部預約。
+    有任何座位被佔用回傳 SEAT_TAKEN、任何成員已有預約回傳 USER_BUSY (conflicts 列出是哪些)，
+    這時一筆都不會寫入。
+    """
+    for attempt in range(retries + 1):
+        try:
+            with writes.serialized():
+                return _book_group_atomic(assignments, start_dt, end_dt)
+        except OperationalError as e:
+            if not _is_lock_error(e) or attempt == retries:
+                raise
+            time.sleep(RETRY_BASE_DELAY * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+
+def _book_group_atomic(assignments, start_dt, end_dt):
+    seat_ids = sorted(seat.pk for _, seat in assignments)
+    user_ids = sorted(user.pk for user, _ in assignments)
+    with transaction.atomic():
+        if connection.vendor != 'sqlite':
+            list(Seat.objects.select_for_update().filter(pk__in=seat_ids).order_by('pk').values_list('pk', flat=True))
+            list(User.objects.select_for_update().filter(pk__in=user_ids).order_by('pk').values_list('pk', flat=True))
+        active = Reservation.objects.filter(status='reserved', start_time__lt=end_dt, end_time__gt=start_dt)
+        taken = set(active.filter(seat_id__in=seat_ids).values_list('seat_id', flat=True))
+        if taken:
+            return BookingResult(SEAT_TAKEN, conflicts=[seat for _, seat in assignments if seat.pk in taken])
+        busy = set(active.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+        if busy:
+            return BookingResult(USER_BUSY, conflicts=[user for user, _ in assignments if user.pk in busy])
+        # 逐筆 create (人數不多)，post_save 照常送出，佔用點陣在 commit 後更新
+        reservations = [
+            Reservation.objects.create(seat=seat, user=user, start_time=start_dt, end_time=end_dt, status='reserved')
+            for user, seat in assignments
+        ]
+    return BookingResult(BOOKED, reservations[0], reservations)
+
+
+def _conflict_status(user, seat, start_dt, end_dt):
+    active = Reservation.objects.filter(status='reserved', start_time__lt=end_dt, end_time__gt=start_dt)
+    if active.filter(seat=seat).exists():
+        return SEAT_TAKEN
+    return USER_BUSY
+
+
+def _book_conditional_insert(user, seat, start_dt, end_dt):
+    opts = Reservation._meta
+    qn = connection.ops.quote_name
+    col = {name: qn(opts.get_field(name).column) for name in
+           ('seat', 'user', 'start_time', 'end_time', 'status', 'created_at')}
+
+    def prep(name, value):
+        return opts.get_field(name).get_db_prep_value(value, connection)
+
+    start = prep('start_time', start_dt)
+    end = prep('end_time', end_dt)
+    created_at = timezone.now()
+    overlap = (
+        f"SELECT 1 FROM {qn(opts.db_table)} WHERE {{}} = %s AND {col['status']} = %s "
+        f"AND {col['start_time']} < %s AND {col['end_time']} > %s"
+    )
+    sql = (
+        f"INSERT INTO {qn(opts.db_table)} "
+        f"({col['seat']}, {col['user']}, {col['start_time']}, {col['end_time']}, {col['status']}, {col['created_at']}) "
+        f"SELECT %s, %s, %s, %s, %s, %s "
+        f"WHERE NOT EXISTS ({overlap.format(col['seat'])}) AND NOT EXISTS ({overlap.format(col['user'])})"
+    )
+    params = [
+        seat.pk, user.pk, start, end, 'reserved', prep('created_at', created_at),
+        seat.pk, 'reserved', end, start,
+        user.pk, 'reserved', end, start,
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        inserted = cursor.rowcount == 1
+        reservation_id = cursor.lastrowid
+
+    if not inserted:
+        return BookingResult(_conflict_status(user, seat, start_dt, end_dt))
+
+    reservation = Reservation(
+        id=reservation_id, seat=seat, user=user, start_time=start_dt, end_time=end_dt,
+        status='reserved', created_at=created_at,
+    )
+    # 已寫入資料庫：標記為已存檔，之後的 save() / 外鍵指派才不會把它當成新物件
+    reservation._state.adding = False
+    reservation._state.db = connection.alias
+    # 沒有經過 Model.save()，手動送出 post_save 讓佔用點陣等 receiver 照常更新
+    post_save.send(
+        sender=Reservation, instance=reservation, created=True,
+        update_fields=None, raw=False, using=connection.alias,
+    )
+    return BookingResult(BOOKED, reservation)
+
+
+def _book_select_for_update(user, seat, start_dt, end_dt):
+    with transaction.atomic():
+        # 固定先鎖座位再鎖使用者，避免互相等待
+        list(Seat.objects.select_for_update().filter(pk=seat.pk).values_list('pk', flat=True))
+        list(User.objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True))
+        active = Reservation.objects.filter(status='reserved', start_time__lt=end_dt, end_time__gt=start_dt)
+        if active.filter(seat=seat).exists():
+            return BookingResult(SEAT_TAKEN)
+        if active.filter(user=user).exists():
+            return BookingResult(USER_BUSY)
+        reservation = Reservation.objects.create(
+            seat=seat, user=user, start_time=start_dt, end_time=end_dt, status='reserved',
+        )
+    return BookingResult(BOOKED, reservation)
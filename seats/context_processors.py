@@ -0,0 +1,7 @@
+# seats/context_processors.py
+from django.conf import settings
+
+
+def fragment_cache(request):
+    """{% cache %} 片段的存活秒數 (base.html 的側邊選單、faq / rules 的靜態內容)。"""
+    return {'fragment_cache_seconds': settings.TEMPLATE_FRAGMENT_CACHE_SECONDS}
@@ -0,0 +1,298 @@
+# seats/floorplan.py
+"""
+座位配置 (樓層平面圖) 整批匯入。
+
+原本座位只能在後台一個一個新增，重新規劃一層幾百個座位不可行。這裡讀入 CSV / JSON：
+
+    name,x,y          (CSV 標題列；可多一欄 id，有 id 的列依 id 對應，可以順便改名)
+    [{"name": "A1", "x": 120, "y": 40}, ...]   (JSON，或 {"seats": [...]})
+
+- plan()：一次走完所有列，檢查欄位、重複的名稱/id、座位按鈕互相重疊 (網格分桶，只比對鄰近的格子)，
+  再和資料庫比對出新增 / 修改 / 不變 / 移除，不寫入任何東西 (--dry-run 與後台預覽只做這步)。
+- apply()：同一個交易內 bulk_create / bulk_update (不送 signals)；移除的座位照一般刪除流程
+  (預約 CASCADE)。整批包在 layout.bulk_edit() 裡，commit 後 SEAT_LAYOUT 只 bump 一次。
+
+檔案裡沒有的座位預設保留；delete_missing 時移除，但還有未結束預約的座位不能移除。
+一個檔案對應一間閱覽室 (room，預設為主閱覽室 DEFAULT_ROOM_SLUG，沒有就用第一間)：只和該閱覽室的座位比對，
+新增的座位也放進該閱覽室，其他閱覽室的座位不受影響 (座位名稱只在閱覽室內唯一)。
+`python manage.py import_floorplan plan.csv --room main --dry-run`，後台「座位」列表頁也有匯入按鈕。
+"""
+import csv
+import io
+import json
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from . import layout, seatmap, writes
+from .models import DEFAULT_ROOM_SLUG, Reservation, Seat
+
+NAME_MAX_LENGTH = Seat._meta.get_field('name').max_length
+
+# line：檔案中的第幾列 (錯誤訊息用)
+SeatRow = namedtuple('SeatRow', 'line id name x y')
+
+
+class FloorPlanError(ValueError):
+    """檔案格式錯誤，整個檔案無法讀取。"""
+
+
+class ImportPlan:
+    def __init__(self, room=None):
+        self.room = room
+        self.errors = []
+        self.created = []  # 未存檔的 Seat
+        self.updated = []  # (Seat (已套用新值、未存檔), 舊名稱, 舊 x, 舊 y)
+        self.unchanged = []
+        self.removed = []  # Seat
+        self.applied = False
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    @property
+    def changed(self):
+        return bool(self.created or self.updated or self.removed)
+
+    def summary(self):
+        return (
+            f"新增 {len(self.created)}、修改 {len(self.updated)}、"
+            f"移除 {len(self.removed)}、不變 {len(self.unchanged)}"
+        )
+
+    def report(self):
+        """差異報告，一行一筆。"""
+        lines = [f"+ {seat.name} ({seat.x}, {seat.y})" for seat in self.created]
+        for seat, old_name, old_x, old_y in self.updated:
+            name = seat.name if seat.name == old_name else f"{old_name} -> {seat.name}"
+            position = f"({seat.x}, {seat.y})"
+            if (seat.x, seat.y) != (old_x, old_y):
+                position = f"({old_x}, {old_y}) -> {position}"
+            lines.append(f"~ {name} {position}")
+        lines.extend(f"- {seat.name} ({seat.x}, {seat.y})" for seat in self.removed)
+        return lines
+
+    def __repr__(self):
+        return f"<ImportPlan {self.summary()}{' errors' if self.errors else ''}>"
+
+
+def read(data, fmt=None, filename=None):
+    """
+    讀入平面圖，回傳 [{'line', 'id', 'name', 'x', 'y'}, ...] (值還沒檢查)。
+    data 為 str 或 bytes；fmt 為 'csv' / 'json'，沒給就看副檔名，再不行就看內容第一個字元。
+    """
+    if isinstance(data, bytes):
+        try:
+            data = data.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise FloorPlanError("檔案必須是 UTF-8 編碼。")
+    data = data.lstrip('\ufeff')
+    if fmt is None and filename:
+        fmt = filename.rsplit('.', 1)[-1].lower() if '.' in filename else None
+    if fmt not in ('csv', 'json'):
+        fmt = 'json' if data.lstrip()[:1] in ('[', '{') else 'csv'
+
+    if fmt == 'json':
+        try:
+            items = json.loads(data)
+        except ValueError as e:
+            raise FloorPlanError(f"JSON 格式錯誤：{e}")
+        if isinstance(items, dict):
+            items = items.get('seats')
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            raise FloorPlanError("JSON 必須是座位物件的陣列，或 {\"seats\": [...]}。")
+        return [{'line': i, **item} for i, item in enumerate(items, start=1)]
+
+    reader = csv.DictReader(io.StringIO(data))
+    columns = {(name or '').strip().lower() for name in reader.fieldnames or ()}
+    if not {'name', 'x', 'y'} <= columns:
+        raise FloorPlanError("CSV 標題列必須包含 name, x, y。")
+    rows = []
+    for row in reader:
+        row = {(key or '').strip().lower(): value for key, value in row.items()}
+        if not any((value or '').strip() for key, value in row.items() if key and isinstance(value, str)):
+            continue  # 空白列
+        rows.append({**row, 'line': reader.line_num})
+    return rows
+
+
+def _int(value):
+    if isinstance(value, bool):
+        raise ValueError
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError
+    return int(value.strip() if isinstance(value, str) else value)
+
+
+def _clean(raw, errors):
+    line = raw.get('line')
+    name = str(raw.get('name') or '').strip()
+    if not name:
+        errors.append(f"第 {line} 列：缺少座位名稱。")
+        return None
+    if len(name) > NAME_MAX_LENGTH:
+        errors.append(f"第 {line} 列：座位名稱 {name} 超過 {NAME_MAX_LENGTH} 個字。")
+        return None
+    try:
+        x, y = _int(raw.get('x')), _int(raw.get('y'))
+    except (TypeError, ValueError):
+        errors.append(f"第 {line} 列：座位 {name} 的座標必須是整數。")
+        return None
+    if x < 0 or y < 0:
+        errors.append(f"第 {line} 列：座位 {name} 的座標不能是負數。")
+        return None
+    seat_id = raw.get('id')
+    if seat_id in (None, ''):
+        seat_id = None
+    else:
+        try:
+            seat_id = _int(seat_id)
+        except (TypeError, ValueError):
+            errors.append(f"第 {line} 列：id 必須是整數。")
+            return None
+    return SeatRow(line, seat_id, name, x, y)
+
+
+def _box(name, x, y):
+    width, height = seatmap.SEAT_SIZE[seatmap.orientation(name)]
+    return x, y, x + width, y + height
+
+
+def _overlaps(boxes, errors):
+    """
+    boxes: [(名稱, 位置說明, (x0, y0, x1, y1)), ...]，檔案的列在前、保留的現有座位在後。
+    以按鈕最長邊當格子大小，每個按鈕最多佔 2×2 格，只需和同格的按鈕比對。
+    """
+    cell = max(max(size) for size in seatmap.SEAT_SIZE.values())
+    grid = {}
+    reported = set()
+    for name, where, box in boxes:
+        x0, y0, x1, y1 = box
+        others = set()
+        for gx in range(x0 // cell, (x1 - 1) // cell + 1):
+            for gy in range(y0 // cell, (y1 - 1) // cell + 1):
+                bucket = grid.setdefault((gx, gy), [])
+                others.update(bucket)
+                bucket.append((name, where, box))
+        for other_name, other_where, (ox0, oy0, ox1, oy1) in sorted(others):
+            # 兩個都是保留的現有座位就不是這次匯入造成的，不報
+            if where is None and other_where is None:
+                continue
+            if x0 < ox1 and ox0 < x1 and y0 < oy1 and oy0 < y1 and (name, other_name) not in reported:
+                reported.add((name, other_name))
+                errors.append(
+                    f"{where or '現有座位'}：座位 {name} 與{other_where or '現有'}的座位 {other_name} 重疊。"
+                )
+
+
+def plan(rows, delete_missing=False, now=None, room=None):
+    """比對 read() 的結果與 room 目前的座位，回傳 ImportPlan (不寫入)。"""
+    room = room or layout.room_or_default(DEFAULT_ROOM_SLUG)
+    result = ImportPlan(room)
+    errors = result.errors
+    if room is None:
+        errors.append("尚未建立任何閱覽室，請先到後台新增。")
+        return result
+    existing = {seat.id: seat for seat in Seat.objects.filter(room=room).order_by('id')}
+    by_name = {seat.name: seat for seat in existing.values()}
+
+    seen_names, seen_ids, matched = {}, {}, {}
+    cleaned = []
+    for raw in rows:
+        row = _clean(raw, errors)
+        if row is None:
+            continue
+        if row.name in seen_names:
+            errors.append(f"第 {row.line} 列：座位名稱 {row.name} 與第 {seen_names[row.name]} 列重複。")
+            continue
+        seen_names[row.name] = row.line
+        if row.id is not None:
+            if row.id in seen_ids:
+                errors.append(f"第 {row.line} 列：id {row.id} 與第 {seen_ids[row.id]} 列重複。")
+                continue
+            seen_ids[row.id] = row.line
+            seat = existing.get(row.id)
+            if seat is None:
+                errors.append(f"第 {row.line} 列：{room} 沒有 id {row.id} 的座位。")
+                continue
+        else:
+            seat = by_name.get(row.name)
+        if seat is not None:
+            if seat.id in matched:
+                errors.append(f"第 {row.line} 列：與第 {matched[seat.id].line} 列對應到同一個座位 {seat.name}。")
+                continue
+            matched[seat.id] = row
+        cleaned.append((row, seat))
+
+    # 檔案裡沒有的座位：保留的要一起檢查名稱與重疊，移除的不能還有未結束的預約
+    missing = [seat for seat_id, seat in existing.items() if seat_id not in matched]
+    kept = [] if delete_missing else missing
+    for seat in kept:
+        if seat.name in seen_names:
+            errors.append(f"第 {seen_names[seat.name]} 列：座位名稱 {seat.name} 已被另一個座位 (id {seat.id}) 使用。")
+    boxes = [(row.name, f"第 {row.line} 列", _box(row.name, row.x, row.y)) for row, _ in cleaned]
+    boxes.extend((seat.name, None, _box(seat.name, seat.x, seat.y)) for seat in kept)
+    _overlaps(boxes, errors)
+    if delete_missing and missing:
+        busy = (
+            Reservation.objects.filter(
+                seat_id__in=[seat.id for seat in missing], status='reserved', end_time__gt=now or timezone.now(),
+            ).values_list('seat_id').annotate(count=Count('id')).order_by()
+        )
+        for seat_id, count in busy:
+            errors.append(f"座位 {existing[seat_id].name} 還有 {count} 筆未結束的預約，不能移除。")
+    if errors:
+        return result
+
+    for row, seat in cleaned:
+        if seat is None:
+            result.created.append(Seat(room=room, name=row.name, x=row.x, y=row.y))
+        elif (seat.name, seat.x, seat.y) == (row.name, row.x, row.y):
+            result.unchanged.append(seat)
+        else:
+            result.updated.append((seat, seat.name, seat.x, seat.y))
+            seat.name, seat.x, seat.y = row.name, row.x, row.y
+    if delete_missing:
+        result.removed = missing
+    return result
+
+
+def apply(result, batch_size=500):
+    """寫入 plan() 的結果 (呼叫端負責交易)；有錯誤時不做任何事。"""
+    if not result.ok or result.applied:
+        return result
+    with layout.bulk_edit():
+        if result.removed:
+            Seat.objects.filter(pk__in=[seat.pk for seat in result.removed]).delete()
+        seats = [seat for seat, *_ in result.updated]
+        if seats:
+            # 互換名稱時 (A -> B、B -> A) 先改成暫時的名稱，避免違反 unique
+            current = {old_name for _, old_name, _, _ in result.updated}
+            if any(seat.name in current and seat.name != old_name for seat, old_name, _, _ in result.updated):
+                Seat.objects.bulk_update(
+                    [Seat(pk=seat.pk, name=f"~{seat.pk}") for seat in seats], ['name'], batch_size=batch_size,
+                )
+            Seat.objects.bulk_update(seats, ['name', 'x', 'y'], batch_size=batch_size)
+        if result.created:
+            Seat.objects.bulk_create(result.created, batch_size=batch_size)
+    result.applied = True
+    return result
+
+
+def import_rows(rows, delete_missing=False, dry_run=False, room=None):
+    """plan + apply，比對與寫入在同一個交易內 (期間不會有其他人改座位)。"""
+    with writes.serialized(), transaction.atomic():
+        result = plan(rows, delete_missing=delete_missing, room=room)
+        if not dry_run:
+            apply(result)
+    return result
+
+
+def export_rows(queryset=None):
+    """目前的座位，格式與匯入相同 (id, name, x, y)，可以匯出 -> 編輯 -> 匯入。"""
+    queryset = queryset if queryset is not None else Seat.objects.all()
+    yield ['id', 'name', 'x', 'y']
+    yield from queryset.order_by('id').values_list('id', 'name', 'x', 'y')
@@ -39,7 +39,8 @@ class ReportForm(forms.ModelForm):
 
 # seats/forms.py
 from django import forms
-from .models import Report, Seat # 確保導入 Seat
+from .models import Report, Room, Seat # 確保導入 Seat
+from .layout import seat_choices
 # from django.contrib.auth.models import User # 不再需要直接在此處導入 User
 
 class ReportForm(forms.ModelForm):
@@ -61,5 +62,27 @@ class ReportForm(forms.ModelForm):
             'reported_time': '事件發生時間',
             'reason': '檢舉原因',
         }
-    
-    # 移除 clean 方法，因為不再需要驗證 reported_user_username
\ No newline at end of file
+
+    def __init__(self, *args, room=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # 下拉選單直接用快取的座位配置，不必每次渲染都查詢 Seat (送出時的驗證仍以資料庫為準)
+        # room：只列出這間閱覽室的座位
+        seat_field = self.fields['seat']
+        seat_field.choices = [('', seat_field.empty_label)] + seat_choices(room)
+
+    # 移除 clean 方法，因為不再需要驗證 reported_user_username
+
+class FloorPlanImportForm(forms.Form):
+    """後台匯入平面圖 (seats/floorplan.py)：先上傳預覽差異，確認後以隱藏欄位 data 送出同一份內容。"""
+    file = forms.FileField(label="平面圖檔案 (CSV / JSON)", required=False)
+    data = forms.CharField(widget=forms.HiddenInput, required=False)
+    room = forms.ModelChoiceField(
+        queryset=Room.objects.all(), label="閱覽室", required=False, empty_label="主閱覽室 (預設)",
+    )
+    delete_missing = forms.BooleanField(label="移除檔案裡沒有的座位 (預約一併刪除)", required=False)
+
+    def clean(self):
+        cleaned = super().clean()
+        if not cleaned.get('file') and not cleaned.get('data'):
+            raise forms.ValidationError("請選擇檔案。")
+        return cleaned
@@ -0,0 +1,171 @@
+# seats/groups.py
+"""
+團體預約。
+
+原本發起人輸入同行成員的帳號就直接替他們建立預約，任何人都能佔用別人的時段，
+錯誤訊息還會透露哪些帳號存在、誰在什麼時段已有預約。現在改成邀請制：
+
+- 發起人送出的成員一律建立成邀請 (GroupBookingMember)，帳號存不存在回應都一樣；
+  不存在的帳號 user 為空，邀請會一直停在待確認，發起人可以自行取消。
+- 成員在個人紀錄頁同意或拒絕；任何人拒絕，整筆團體預約取消。
+- 最後一位成員同意時 (同一個 request 內) 才找相鄰空位並經 booking.book_group 一次全部預約。
+  先以條件更新 pending → booking 取得這筆團體預約，兩個成員同時按同意也只會預約一次。
+- 預約失敗時只回報「無法完成」，不說是哪位成員在該時段已有預約。
+- 邀請與結果通知只寫進寄信佇列 (mail.outbox)。
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from mail import outbox
+
+from . import booking, layout, occupancy, spatial
+from .models import GroupBooking, GroupBookingMember, Reservation
+
+FAILED_MESSAGE = "無法完成團體預約：此時段已沒有足夠的相鄰空位，或有成員在此時段已有其他預約。"
+
+
+def max_pending():
+    return settings.GROUP_BOOKING_MAX_PENDING
+
+
+def pending_invitations(user, now=None):
+    """使用者尚未回覆、仍在等待確認的團體預約邀請。"""
+    return GroupBookingMember.objects.filter(
+        user=user, status='invited', group__status='pending', group__start_time__gt=now or timezone.now(),
+    ).select_related('group__leader', 'group__room').order_by('group__start_time', 'id')
+
+
+def led_groups(user, now=None):
+    """使用者發起、尚未開始的團體預約 (含成員)。"""
+    return GroupBooking.objects.filter(
+        leader=user, start_time__gt=now or timezone.now(),
+    ).select_related('room').prefetch_related('members').order_by('start_time', 'id')
+
+
+def invite(leader, names, room, start_dt, end_dt):
+    """
+    發起團體預約，回傳 (group, 錯誤訊息)。names 為同行成員帳號 (不含發起人)；
+    錯誤訊息只與人數或發起人自己的狀態有關，不會透露任何成員的資訊。
+    """
+    names = [name for name in dict.fromkeys(names) if name and name != leader.username]
+    if not names:
+        return None, "請至少輸入一位同行成員的帳號。"
+    if len(names) + 1 > spatial.max_group_size():
+        return None, f"團體預約最多 {spatial.max_group_size()} 人。"
+    open_groups = GroupBooking.objects.filter(leader=leader, status='pending', start_time__gt=timezone.now())
+    if open_groups.count() >= max_pending():
+        return None, f"等待成員確認的團體預約最多同時 {max_pending()} 筆。"
+
+    found = {user.username: user for user in User.objects.filter(username__in=names)}
+    group = GroupBooking.objects.create(leader=leader, room=room, start_time=start_dt, end_time=end_dt)
+    members = GroupBookingMember.objects.bulk_create(
+        GroupBookingMember(group=group, username=name, user=found.get(name)) for name in names
+    )
+    for member in members:
+        _notify_invited(group, member)
+    return group, None
+
+
+def respond(member, accept):
+    """
+    成員回覆邀請，回傳更新後的 GroupBooking。
+    拒絕就取消整筆團體預約；最後一位成員同意時立即嘗試預約。
+    """
+    status = 'accepted' if accept else 'declined'
+    updated = GroupBookingMember.objects.filter(pk=member.pk, status='invited', group__status='pending').update(
+        status=status, responded_at=timezone.now(),
+    )
+    group = member.group
+    if not updated:
+        group.refresh_from_db()
+        return group
+    if not accept:
+        if GroupBooking.objects.filter(pk=group.pk, status='pending').update(status='cancelled'):
+            group.status = 'cancelled'
+            _notify_result(group, f"{member.username} 拒絕了邀請，團體預約已取消。")
+        return group
+    if not group.members.exclude(status='accepted').exists():
+        _finalize(group)
+    return group
+
+
+def cancel(group):
+    """發起人取消還在等待確認的團體預約；已經預約的座位請逐筆到個人紀錄頁取消。"""
+    return GroupBooking.objects.filter(pk=group.pk, status='pending').update(status='cancelled') > 0
+
+
+def _available_seat_ids(room, start_dt, end_dt):
+    seat_ids = [seat.id for seat in layout.get_seats(room)]
+    reserved = occupancy.reserved_seat_ids(start_dt, end_dt, room=room)
+    if reserved is None:
+        reserved = set(Reservation.objects.filter(
+            seat_id__in=seat_ids, status='reserved', start_time__lt=end_dt, end_time__gt=start_dt,
+        ).values_list('seat_id', flat=True))
+    return set(seat_ids) - reserved
+
+
+def _book(users, room, start_dt, end_dt):
+    result = None
+    for _ in range(2):  # 找到的座位在寫入前剛好被搶走，就用最新狀態再找一次
+        seats = spatial.find_cluster(len(users), _available_seat_ids(room, start_dt, end_dt), room)
+        if not seats:
+            return None
+        result = booking.book_group(list(zip(users, seats)), start_dt, end_dt)
+        if result.status != booking.SEAT_TAKEN:
+            break
+    return result
+
+
+def _finalize(group):
+    """所有成員都同意後預約；條件更新只讓一個 request 做這件事。"""
+    if not GroupBooking.objects.filter(pk=group.pk, status='pending').update(status='booking'):
+        group.refresh_from_db()
+        return group
+    members = list(group.members.select_related('user').order_by('id'))
+    users = [group.leader] + [member.user for member in members]
+    result = None
+    if group.start_time > timezone.now():
+        try:
+            result = _book(users, group.room, group.start_time, group.end_time)
+        except Exception as e:
+            print(f"Error booking group {group.pk}: {e}")
+    group.status = 'booked' if result is not None and result.ok else 'failed'
+    GroupBooking.objects.filter(pk=group.pk).update(status=group.status)
+    if group.status == 'booked':
+        seat_names = '、'.join(f"{r.seat.name} ({r.user.username})" for r in result.reservations)
+        _notify_result(group, f"所有成員都已同意，座位已預約：{seat_names}。")
+    else:
+        _notify_result(group, FAILED_MESSAGE)
+    return group
+
+
+def _window_text(group):
+    start = timezone.localtime(group.start_time)
+    end = timezone.localtime(group.end_time)
+    return f"{start:%Y-%m-%d %H:%M} ~ {end:%H:%M}"
+
+
+def _notify_invited(group, member):
+    if member.user is None or not member.user.email:
+        return
+    outbox.enqueue(
+        f"團體預約邀請：{group.leader.username} 邀請您一起預約座位",
+        f"{member.user.username} 您好：\n\n"
+        f"{group.leader.username} 邀請您在 {_window_text(group)} 一起預約 {group.room.name} 的相鄰座位。\n"
+        f"請到個人紀錄頁同意或拒絕；所有成員都同意後系統才會預約。",
+        [member.user.email],
+    )
+
+
+def _notify_result(group, text):
+    # 每人各寄一封，收件人彼此看不到對方的信箱
+    recipients = [group.leader] + [m.user for m in group.members.select_related('user') if m.user is not None]
+    for user in recipients:
+        if not user.email:
+            continue
+        outbox.enqueue(
+            f"團體預約結果 ({_window_text(group)})",
+            f"{user.username} 您好：\n\n{group.leader.username} 發起的團體預約 ({group.room.name}，{_window_text(group)})：{text}",
+            [user.email],
+        )
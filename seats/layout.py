@@ -0,0 +1,137 @@
+# seats/layout.py
+"""
+座位配置快取。
+
+座位名稱與座標一學期才改一兩次，卻是每個座位圖頁面與檢舉表單都要用的資料。
+這裡在每個程序內保留一份 Seat / Room 物件，用共享的 SEAT_LAYOUT 版本號 (見 versions.py)
+判斷是否過期；Seat / Room / Branch 的 post_save / post_delete 會 bump 版本，所有 worker 一起失效。
+大量修改座位 (floorplan.py 匯入) 時包在 bulk_edit() 裡，整批 commit 後只 bump 一次。
+
+座位依閱覽室分組：get_seats(room) 只回傳該閱覽室的座位 (版本不變時是同一個 tuple)，
+seatmap / spatial / occupancy 都以這個 tuple 為單位快取，查一間閱覽室不會碰到其他閱覽室的資料。
+"""
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from . import versions
+from .models import Room, Seat
+
+_lock = threading.Lock()
+_cached = None  # Layout
+_bulk = threading.local()
+
+Layout = namedtuple('Layout', 'version seats seats_by_id rooms rooms_by_id rooms_by_slug seats_by_room')
+
+
+def _load():
+    global _cached
+    # 先讀版本再查資料庫：查詢期間有人修改座位的話，版本已前進，下次會再重建
+    version = versions.get_version(versions.SEAT_LAYOUT)
+    cached = _cached
+    if cached is not None and cached.version == version:
+        return cached
+    # 先查座位再查閱覽室：閱覽室有座位時不能刪 (PROTECT)，座位參照的閱覽室一定查得到
+    seats = tuple(Seat.objects.order_by('id'))
+    rooms = tuple(Room.objects.select_related('branch'))
+    rooms_by_id = {room.id: room for room in rooms}
+    grouped = {room.id: [] for room in rooms}
+    for seat in seats:
+        seat.room = rooms_by_id[seat.room_id]  # 共用同一個 Room 物件，讀 seat.room 不必再查
+        grouped[seat.room_id].append(seat)
+    cached = Layout(
+        version, seats, {seat.id: seat for seat in seats},
+        rooms, rooms_by_id, {room.slug: room for room in rooms},
+        {room_id: tuple(room_seats) for room_id, room_seats in grouped.items()},
+    )
+    with _lock:
+        _cached = cached
+    return cached
+
+
+def _room_id(room):
+    return room if room is None or isinstance(room, int) else room.pk
+
+
+def get_seats(room=None):
+    """座位 (依 id 排序)，room (Room 或 id) 為 None 時回傳所有閱覽室的座位。請當成唯讀資料使用。"""
+    cached = _load()
+    if room is None:
+        return cached.seats
+    return cached.seats_by_room.get(_room_id(room), ())
+
+
+def get_seat(seat_id):
+    """依 id 取得座位，找不到或格式不對回傳 None。"""
+    try:
+        return _load().seats_by_id.get(int(seat_id))
+    except (TypeError, ValueError):
+        return None
+
+
+def get_rooms():
+    """所有閱覽室 (依 sort_order)。"""
+    return _load().rooms
+
+
+def get_room(value):
+    """依 slug 或 id 取得閱覽室，找不到回傳 None。"""
+    cached = _load()
+    if not value:
+        return None
+    room = cached.rooms_by_slug.get(str(value))
+    if room is None and str(value).isdigit():
+        room = cached.rooms_by_id.get(int(value))
+    return room
+
+
+def room_or_default(value):
+    """?room= 指定的閱覽室；沒指定或找不到就用第一間 (沒有任何閱覽室時回傳 None)。"""
+    room = get_room(value)
+    if room is None:
+        rooms = get_rooms()
+        room = rooms[0] if rooms else None
+    return room
+
+
+def seat_label(seat):
+    """顯示用的座位名稱：有多間閱覽室時加上閱覽室名稱 (座位名稱只在閱覽室內唯一)。"""
+    if len(get_rooms()) > 1:
+        return f"{seat.room} {seat.name}"
+    return seat.name
+
+
+def seat_choices(room=None):
+    return [(seat.id, seat_label(seat)) for seat in get_seats(room)]
+
+
+def bump():
+    """座位配置已變更：commit 後前進 SEAT_LAYOUT 版本 (bulk_edit() 區塊內延到區塊結束)。"""
+    if not in_bulk_edit():
+        transaction.on_commit(lambda: versions.bump_version(versions.SEAT_LAYOUT))
+
+
+def in_bulk_edit():
+    return getattr(_bulk, 'depth', 0) > 0
+
+
+@contextmanager
+def bulk_edit():
+    """區塊內的 Seat 異動不各自 bump 版本，區塊正常結束時 (commit 後) 只 bump 一次；請在交易內使用。"""
+    depth = getattr(_bulk, 'depth', 0)
+    _bulk.depth = depth + 1
+    try:
+        yield
+    finally:
+        _bulk.depth = depth
+    if depth == 0:
+        bump()
+
+
+def reset():
+    """清空程序內快取 (測試用)。"""
+    global _cached
+    with _lock:
+        _cached = None
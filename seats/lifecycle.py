@@ -0,0 +1,58 @@
+# seats/lifecycle.py
+"""
+預約生命週期：把已結束的預約從 reserved 轉成 completed。
+
+可用性/預約查詢都只看 status='reserved'，Reservation 的時段索引也只收 reserved 的列
+(partial index)，所以歷史預約轉成 completed 後就離開熱資料，查詢只會碰到目前與未來的預約。
+
+每批只更新 batch_size 筆、各自一個短交易，批與批之間可暫停一下，
+SQLite 的寫入鎖不會被長時間佔住，線上的預約寫入可以插隊。
+只處理「今天以前」(本地日期) 結束的預約：今天稍早結束的預約還在今天的佔用點陣裡
+(occupancy 只算 reserved、更新不送 signals)，若在今天就轉成 completed，
+點陣重建前後對今天過去時段的答案會不一樣。前幾天的點陣不會再被查詢，轉換後不需要前進任何快取版本。
+"""
+import time
+from datetime import datetime, time as dt_time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Reservation
+
+
+def _today_start(now):
+    if settings.USE_TZ:
+        return timezone.make_aware(datetime.combine(timezone.localtime(now).date(), dt_time()))
+    return datetime.combine(now.date(), dt_time())
+
+
+def sweep_completed(now=None, batch_size=None, pause=0.0):
+    """把 now 當天 (本地日期) 以前就結束的 reserved 預約分批改成 completed，回傳更新筆數。"""
+    now = now or timezone.now()
+    batch_size = batch_size or getattr(settings, 'RESERVATION_SWEEP_BATCH_SIZE', 500)
+    finished = Reservation.objects.filter(status='reserved', end_time__lte=_today_start(now))
+    total = 0
+    while True:
+        with transaction.atomic():
+            ids = list(finished.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return total
+            # 再帶一次 status 條件：選出之後剛好被取消的預約不會被改回 completed
+            total += Reservation.objects.filter(pk__in=ids, status='reserved').update(status='completed')
+        if len(ids) < batch_size:
+            return total
+        if pause:
+            time.sleep(pause)
+
+
+def run_sweeper(interval=300.0, batch_size=None, pause=0.05, once=False, log=None):
+    """定期執行 sweep_completed；once=True 時只跑一輪。"""
+    while True:
+        started = time.monotonic()
+        count = sweep_completed(batch_size=batch_size, pause=pause)
+        if log and count:
+            log(f"completed={count} elapsed={time.monotonic() - started:.2f}s")
+        if once:
+            return count
+        time.sleep(interval)
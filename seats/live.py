@@ -0,0 +1,120 @@
+# seats/live.py
+"""
+即時座位圖推播 (Server-Sent Events，需在 ASGI 下執行)。
+
+每個程序只有一個 SeatFeed：它持有「目前使用中的座位」集合，只在
+預約建立/取消 (signals) 或預約開始/結束的時間點重新計算一次，
+再把差異廣播給所有連線中的瀏覽器。上千個閒置的連線只是上千個 asyncio.Queue，
+不會變成上千次資料庫查詢。
+
+事件格式：
+    event: snapshot   data: {"occupied": [座位 id, ...]}          連線時/追不上進度時
+    event: delta      data: {"occupied": [...], "freed": [...]}    狀態有變化時
+"""
+import asyncio
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from . import occupancy
+
+MAX_TICK_SECONDS = 60  # 不在格線上的時段 (例如深夜) 最長多久重新檢查一次
+HEARTBEAT_SECONDS = 15  # 避免反向代理把閒置連線切斷
+QUEUE_SIZE = 32
+
+
+def _seconds_until_next_change():
+    now = timezone.now()
+    delay = (occupancy.next_boundary(now) - now).total_seconds()
+    return min(max(delay, 0) + 0.05, MAX_TICK_SECONDS)
+
+
+class SeatFeed:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._subscribers = set()
+        self._occupied = None
+        self._ticker = None
+        self._refresh_task = None
+
+    # --- 訂閱端 (在 event loop 中) ---
+
+    async def subscribe(self):
+        """非同步產生事件 (event, data)；沒有事件時每 HEARTBEAT_SECONDS 產生一次 (None, None)。"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = loop
+                self._occupied = None
+            elif self._loop is not loop:
+                raise RuntimeError("SeatFeed 只能在單一 event loop (ASGI server) 中使用。")
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._subscribers.add(queue)
+        try:
+            if self._occupied is None:
+                await self._refresh()
+            if self._ticker is None or self._ticker.done():
+                self._ticker = loop.create_task(self._tick())
+            yield 'snapshot', {'occupied': sorted(self._occupied)}
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield None, None
+        finally:
+            self._subscribers.discard(queue)
+            if not self._subscribers and self._ticker is not None:
+                self._ticker.cancel()
+                self._ticker = None
+
+    async def _tick(self):
+        while self._subscribers:
+            await asyncio.sleep(await sync_to_async(_seconds_until_next_change)())
+            await self._refresh()
+
+    async def _refresh(self):
+        occupied = await sync_to_async(occupancy.occupied_now)()
+        previous, self._occupied = self._occupied, occupied
+        if previous is None or previous == occupied:
+            return
+        self._publish('delta', {
+            'occupied': sorted(occupied - previous),
+            'freed': sorted(previous - occupied),
+        })
+
+    def _publish(self, event, data):
+        for queue in list(self._subscribers):
+            if queue.full():
+                # 消費太慢：丟掉累積的差異，改送一次完整快照
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(('snapshot', {'occupied': sorted(self._occupied)}))
+            else:
+                queue.put_nowait((event, data))
+
+    def _schedule_refresh(self):
+        # 短時間內多次變更只重算一次
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._refresh())
+
+    # --- 發布端 (任何執行緒) ---
+
+    def notify_changed(self):
+        """預約狀態影響到「現在」時呼叫；沒有訂閱者時什麼都不做。"""
+        loop = self._loop
+        if loop is None or loop.is_closed() or not self._subscribers:
+            return
+        loop.call_soon_threadsafe(self._schedule_refresh)
+
+
+feed = SeatFeed()
+
+
+def format_event(event, data):
+    if event is None:
+        return ': keepalive\n\n'
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,286 @@
+# seats/loadtest.py
+"""
+尖峰時段壓力測試 (由 `python manage.py loadtest` 呼叫)。
+
+seed() 建立接近正式環境規模的資料 (數百座位、數萬使用者、上百萬筆歷史預約)；
+run() 以多個執行緒同時模擬使用者走完
+    登入 → dashboard → res_time → make_reservation → records
+請求直接在程序內送進 Django 的 request handler (django.test.Client)，不經過網路，
+量到的就是 middleware + view + template + 資料庫的時間。每個步驟記錄延遲、查詢次數與狀態碼。
+
+summarize() 整理成每個步驟的吞吐量與 p50/p95/p99，compare() 與先前存下的 baseline 比較。
+"""
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from . import layout, occupancy, snapshot
+from .models import Reservation, Room, Seat
+
+STEPS = ['login', 'dashboard', 'res_time', 'make_reservation', 'records']
+USER_PREFIX = 'load'
+SEAT_PREFIX = 'L'
+ROOM_SLUG = 'load'
+PASSWORD = 'load-test-pw-2468'
+# 尖峰：大多數人搶明天下午與晚上的時段
+RUSH_HOURS = [9, 10, 13, 14, 15, 19, 20]
+
+
+def seed(seats=300, users=20000, reservations=1000000, days=365, seed=42, batch_size=5000, log=None):
+    """
+    建立壓測資料：座位排成每列 30 個的格子，所有使用者共用密碼 PASSWORD (只雜湊一次)，
+    過去 days 天的歷史預約 (已完成/已取消)，以及未來 7 天約三成的座位時段已被預約。
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+
+    # 座位放進第一間閱覽室 (選位頁預設顯示的那間)；還沒有任何閱覽室就建立一間壓測用的
+    room = Room.objects.first() or Room.objects.create(slug=ROOM_SLUG, name="壓測閱覽室")
+    seat_objs = Seat.objects.bulk_create(
+        [Seat(room=room, name=f"{SEAT_PREFIX}{i:04}", x=(i % 30) * 40, y=(i // 30) * 40) for i in range(seats)],
+        batch_size=batch_size,
+    )
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(
+        [User(username=f"{USER_PREFIX}{i:06}", email=f"{USER_PREFIX}{i:06}@example.com", password=password)
+         for i in range(users)],
+        batch_size=batch_size,
+    )
+    seat_ids = [seat.pk for seat in seat_objs]
+    user_ids = list(User.objects.filter(username__startswith=USER_PREFIX).values_list('pk', flat=True))
+    log(f"seeded {len(seat_ids)} seats, {len(user_ids)} users")
+
+    today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    created = 0
+    batch = []
+
+    def flush():
+        nonlocal created, batch
+        Reservation.objects.bulk_create(batch, batch_size=batch_size)
+        created += len(batch)
+        batch = []
+
+    for i in range(reservations):
+        start = today - timedelta(days=rng.randrange(1, days + 1)) + timedelta(hours=rng.randrange(8, 22))
+        batch.append(Reservation(
+            seat_id=rng.choice(seat_ids), user_id=rng.choice(user_ids),
+            start_time=start, end_time=start + timedelta(hours=rng.randrange(1, 4)),
+            status='cancelled' if rng.random() < 0.15 else 'completed',
+        ))
+        if len(batch) >= batch_size:
+            flush()
+            if created % 100000 == 0:
+                log(f"  {created} historical reservations")
+
+    # 未來 7 天：同一個時段每位使用者最多一筆，座位也不重疊
+    for day in range(7):
+        window = occupancy.day_window((today + timedelta(days=day)).date())
+        if window is None:  # 休館日
+            continue
+        open_dt, close_dt = window
+        for hour in range((close_dt - open_dt) // timedelta(hours=1)):
+            start = open_dt + timedelta(hours=hour)
+            takers = iter(rng.sample(user_ids, min(len(user_ids), len(seat_ids))))
+            for seat_id in seat_ids:
+                taker = next(takers, None)
+                if taker and rng.random() < 0.3:
+                    batch.append(Reservation(
+                        seat_id=seat_id, user_id=taker,
+                        start_time=start, end_time=start + timedelta(hours=1),
+                    ))
+            if len(batch) >= batch_size:
+                flush()
+    flush()
+    log(f"seeded {created} reservations")
+
+    if connection.vendor in ('sqlite', 'postgresql'):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+
+class Recorder:
+    """各執行緒共用的量測結果：step -> [(秒數, 查詢次數, 狀態碼)]。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(list)
+        self.outcomes = defaultdict(int)
+
+    def add(self, step, seconds, queries, status):
+        with self._lock:
+            self.samples[step].append((seconds, queries, status))
+
+    def error(self, step, exc):
+        with self._lock:
+            self.errors[step].append(f"{type(exc).__name__}: {exc}")
+
+    def outcome(self, name):
+        with self._lock:
+            self.outcomes[name] += 1
+
+
+def _request(client, recorder, step, method, url, data=None):
+    queries = 0
+
+    def count(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        with connection.execute_wrapper(count):
+            response = getattr(client, method)(url, data or {})
+    except Exception as e:
+        recorder.error(step, e)
+        return None
+    recorder.add(step, time.perf_counter() - started, queries, response.status_code)
+    return response
+
+
+def _flow(rng, recorder, username, seat_ids):
+    client = Client(raise_request_exception=False)
+    day = timezone.localdate() + timedelta(days=1 if rng.random() < 0.7 else rng.randrange(2, 7))
+    hour = rng.choice(RUSH_HOURS)
+    slot = {
+        'date': day.isoformat(),
+        'start_time': f"{hour:02}:00",
+        'end_time': f"{hour + rng.choice([1, 2]):02}:00",
+    }
+    response = _request(client, recorder, 'login', 'post', reverse('login'), {
+        'username': username, 'password': PASSWORD,
+    })
+    if response is None or response.status_code != 302:
+        recorder.outcome('login_failed')
+        return
+    _request(client, recorder, 'dashboard', 'get', reverse('seats:dashboard'))
+    _request(client, recorder, 'res_time', 'get', reverse('seats:res_time'), slot)
+    response = _request(client, recorder, 'make_reservation', 'post', reverse('seats:make_reservation'), {
+        **slot, 'seat_id': rng.choice(seat_ids),
+    })
+    if response is not None and response.status_code == 302:
+        # 成功導向個人紀錄頁；座位被搶走或自己已有預約則導回選位頁
+        recorder.outcome('booked' if response.url == reverse('seats:records') else 'rejected')
+    _request(client, recorder, 'records', 'get', reverse('seats:records'))
+
+
+def run(flows=500, concurrency=16, seed=42):
+    """以 concurrency 個執行緒跑 flows 次完整流程，回傳 (Recorder, 經過秒數)。"""
+    occupancy.reset()
+    layout.reset()
+    snapshot.reset()
+    usernames = list(User.objects.filter(username__startswith=USER_PREFIX).values_list('username', flat=True))
+    seat_ids = [seat.pk for seat in layout.get_seats()]
+    if not usernames or not seat_ids:
+        raise ValueError("沒有壓測資料，請先執行 seed()。")
+    rng = random.Random(seed)
+    picks = [rng.choice(usernames) for _ in range(flows)]
+    recorder = Recorder()
+    lock = threading.Lock()
+    remaining = iter(enumerate(picks))
+
+    def worker():
+        try:
+            while True:
+                with lock:
+                    item = next(remaining, None)
+                if item is None:
+                    return
+                index, username = item
+                _flow(random.Random(seed * 100003 + index), recorder, username, seat_ids)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.perf_counter() - started
+
+
+def _percentile(values, percent):
+    # nearest-rank，values 需已排序
+    if not values:
+        return 0.0
+    return values[max(math.ceil(percent / 100 * len(values)) - 1, 0)]
+
+
+def summarize(recorder, elapsed, flows=None, concurrency=None):
+    steps = {}
+    total = 0
+    for step in STEPS:
+        samples = recorder.samples.get(step, [])
+        latencies = sorted(seconds * 1000 for seconds, _, _ in samples)
+        queries = [count for _, count, _ in samples]
+        total += len(samples)
+        steps[step] = {
+            'requests': len(samples),
+            'throughput': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+            'p50_ms': round(_percentile(latencies, 50), 2),
+            'p95_ms': round(_percentile(latencies, 95), 2),
+            'p99_ms': round(_percentile(latencies, 99), 2),
+            'mean_queries': round(sum(queries) / len(queries), 2) if queries else 0.0,
+            'max_queries': max(queries, default=0),
+            'errors': len(recorder.errors.get(step, [])) + sum(1 for _, _, status in samples if status >= 500),
+        }
+    return {
+        'flows': flows,
+        'concurrency': concurrency,
+        'elapsed_seconds': round(elapsed, 3),
+        'requests_per_second': round(total / elapsed, 2) if elapsed else 0.0,
+        'outcomes': dict(recorder.outcomes),
+        'steps': steps,
+    }
+
+
+def format_report(summary):
+    lines = [
+        f"{summary['flows']} flows × {summary['concurrency']} threads in {summary['elapsed_seconds']}s "
+        f"({summary['requests_per_second']} req/s)  outcomes: {summary['outcomes']}",
+        f"{'step':<18}{'req':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'max q':>7}{'err':>5}",
+    ]
+    for step, row in summary['steps'].items():
+        lines.append(
+            f"{step:<18}{row['requests']:>6}{row['throughput']:>9}{row['p50_ms']:>9}{row['p95_ms']:>9}"
+            f"{row['p99_ms']:>9}{row['mean_queries']:>9}{row['max_queries']:>7}{row['errors']:>5}"
+        )
+    return lines
+
+
+def compare(summary, baseline, max_regression=20.0):
+    """
+    與 baseline 比較，回傳 (報告行, 退步清單)。
+    p95 變慢超過 max_regression %、單一請求最多查詢次數增加或錯誤變多都算退步
+    (平均查詢次數會隨成功/失敗的比例浮動，只列出不判定)。
+    """
+    lines = [f"{'step':<18}{'p95 base':>10}{'p95 now':>10}{'change':>9}{'q base':>8}{'q now':>8}{'max q':>10}"]
+    regressions = []
+    for step, row in summary['steps'].items():
+        base = baseline.get('steps', {}).get(step)
+        if not base:
+            continue
+        change = (row['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100 if base['p95_ms'] else 0.0
+        lines.append(
+            f"{step:<18}{base['p95_ms']:>10}{row['p95_ms']:>10}{change:>+8.1f}%"
+            f"{base['mean_queries']:>8}{row['mean_queries']:>8}{base['max_queries']:>5}→{row['max_queries']:<4}"
+        )
+        if change > max_regression:
+            regressions.append(f"{step}: p95 {base['p95_ms']}ms → {row['p95_ms']}ms ({change:+.1f}%)")
+        if row['max_queries'] > base['max_queries']:
+            regressions.append(f"{step}: max queries {base['max_queries']} → {row['max_queries']}")
+        if row['errors'] > base['errors']:
+            regressions.append(f"{step}: errors {base['errors']} → {row['errors']}")
+    return lines, regressions
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from seats import archive
+
+
+class Command(BaseCommand):
+    help = "把結束超過 RESERVATION_ARCHIVE_DAYS 天的預約搬到封存表 (建議每天執行一次)。"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help="封存幾天以前的預約 (預設 RESERVATION_ARCHIVE_DAYS)")
+        parser.add_argument('--batch-size', type=int, default=None, help="每批搬移數量 (預設 RESERVATION_ARCHIVE_BATCH_SIZE)")
+        parser.add_argument('--pause', type=float, default=0.05, help="批與批之間暫停的秒數，讓出寫入鎖")
+
+    def handle(self, *args, **options):
+        before = archive.archive_cutoff(days=options['days'])
+        count = archive.archive_reservations(before=before, batch_size=options['batch_size'], pause=options['pause'])
+        self.stdout.write(f"archived {count}")
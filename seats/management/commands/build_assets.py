@@ -0,0 +1,28 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from seats import assets
+
+
+class Command(BaseCommand):
+    help = (
+        "部署前執行：依 IMAGE_VARIANTS 產生 AVIF/WebP 縮圖，collectstatic (檔名加 hash)，"
+        "再把 CSS/JS 預先壓縮成 .gz/.br。"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formats', default=None, help="逗號分隔，預設 IMAGE_VARIANT_FORMATS (avif,webp)")
+        parser.add_argument('--skip-images', action='store_true', help="不產生縮圖")
+        parser.add_argument('--no-collect', action='store_true', help="不執行 collectstatic 與壓縮")
+
+    def handle(self, *args, **options):
+        if not options['skip_images']:
+            formats = options['formats'].split(',') if options['formats'] else None
+            written, skipped = assets.build_variants(formats=formats, log=self.stdout.write)
+            self.stdout.write(f"image variants: {written} written, {skipped} up to date")
+        if options['no_collect']:
+            return
+        call_command('collectstatic', interactive=False, verbosity=options['verbosity'])
+        count = assets.compress_static(log=self.stdout.write)
+        self.stdout.write(f"precompressed {count} files")
+        assets.reset()
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from seats import lifecycle
+
+
+class Command(BaseCommand):
+    help = "把今天以前結束的預約標記為 completed (可單次執行或當作背景 worker)。"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="處理完目前已結束的預約後結束")
+        parser.add_argument('--interval', type=float, default=300.0, help="兩輪之間的間隔 (秒)")
+        parser.add_argument('--batch-size', type=int, default=None, help="每批更新數量 (預設 RESERVATION_SWEEP_BATCH_SIZE)")
+        parser.add_argument('--pause', type=float, default=0.05, help="批與批之間暫停的秒數，讓出寫入鎖")
+
+    def handle(self, *args, **options):
+        count = lifecycle.run_sweeper(
+            interval=options['interval'],
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            once=options['once'],
+            log=self.stdout.write,
+        )
+        if options['once']:
+            self.stdout.write(f"completed {count}")
@@ -0,0 +1,165 @@
+import copy
+import random
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from seats import booking, loadtest, writes
+from seats.models import Reservation, Seat
+
+# 對照組：SQLite 預設的 rollback journal、DEFERRED 交易
+PROFILES = {
+    'default': {'init_command': 'PRAGMA journal_mode=DELETE'},
+    'production': None,  # settings.DATABASES['default']['OPTIONS']
+}
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    return loadtest._percentile(values, percent) * 1000 if values else 0.0
+
+
+class Command(BaseCommand):
+    help = (
+        "SQLite 讀寫並行測試：分別以預設設定與正式環境設定 (WAL 等 PRAGMA、IMMEDIATE 交易、寫入佇列) "
+        "建立測試資料庫，量測只有讀取時與同時有預約/取消寫入時的讀取吞吐量。"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', default='default,production', help="逗號分隔：default, production")
+        parser.add_argument('--readers', type=int, default=8, help="讀取執行緒數")
+        parser.add_argument('--writers', type=int, default=4, help="寫入 (預約/取消) 執行緒數")
+        parser.add_argument('--duration', type=float, default=5.0, help="每個階段的秒數")
+        parser.add_argument('--seats', type=int, default=200)
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--reservations', type=int, default=200000, help="歷史預約筆數")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("dbbench 只適用於 SQLite。")
+        profiles = [name.strip() for name in options['profiles'].split(',') if name.strip()]
+        unknown = set(profiles) - set(PROFILES)
+        if unknown:
+            raise CommandError(f"未知的 profile：{', '.join(sorted(unknown))}")
+
+        rows = []
+        with tempfile.TemporaryDirectory() as tmp, override_settings(
+            DEBUG=False,
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                'LOCATION': 'seats-dbbench'}},
+        ):
+            for name in profiles:
+                self.stdout.write(f"[{name}] seeding…")
+                rows.append((name, self._bench_profile(name, Path(tmp) / f"dbbench-{name}.sqlite3", options)))
+
+        self.stdout.write(
+            f"{'profile':<12}{'journal':>9}{'reads/s idle':>14}{'reads/s +writes':>17}"
+            f"{'read p95 ms':>13}{'writes/s':>10}{'write p95 ms':>14}{'locked':>8}"
+        )
+        for name, r in rows:
+            self.stdout.write(
+                f"{name:<12}{r['journal']:>9}{r['idle_reads']:>14.0f}{r['busy_reads']:>17.0f}"
+                f"{r['read_p95']:>13.2f}{r['writes']:>10.1f}{r['write_p95']:>14.2f}{r['locked']:>8}"
+            )
+
+    def _bench_profile(self, name, path, options):
+        settings_dict = connection.settings_dict
+        saved = copy.deepcopy({key: settings_dict.get(key) for key in ('OPTIONS', 'TEST')})
+        if PROFILES[name] is not None:
+            settings_dict['OPTIONS'] = dict(PROFILES[name])
+        settings_dict['TEST'] = {**(settings_dict.get('TEST') or {}), 'NAME': str(path)}
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            loadtest.seed(seats=options['seats'], users=options['users'],
+                          reservations=options['reservations'], days=365)
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode")
+                journal = cursor.fetchone()[0]
+            idle = self._measure(options['readers'], 0, options['duration'])
+            busy = self._measure(options['readers'], options['writers'], options['duration'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            settings_dict.update(saved)
+        return {
+            'journal': journal,
+            'idle_reads': idle['reads'] / options['duration'],
+            'busy_reads': busy['reads'] / options['duration'],
+            'read_p95': _percentile(busy['read_latencies'], 95),
+            'writes': busy['writes'] / options['duration'],
+            'write_p95': _percentile(busy['write_latencies'], 95),
+            'locked': busy['locked'],
+        }
+
+    def _measure(self, readers, writers, duration):
+        seat_ids = list(Seat.objects.values_list('pk', flat=True))
+        user_ids = list(User.objects.values_list('pk', flat=True))
+        today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        stop = threading.Event()
+        lock = threading.Lock()
+        result = {'reads': 0, 'writes': 0, 'locked': 0, 'read_latencies': [], 'write_latencies': []}
+
+        def slot(rng):
+            start = today + timedelta(days=rng.randrange(1, 7), hours=rng.choice(loadtest.RUSH_HOURS))
+            return start, start + timedelta(hours=rng.choice([1, 2]))
+
+        def reader(seed):
+            rng = random.Random(seed)
+            latencies = []
+            try:
+                while not stop.is_set():
+                    start, end = slot(rng)
+                    started = time.perf_counter()
+                    # res_time / seat_map 的可用性查詢 (不經過程序內快取，直接量資料庫)
+                    list(Reservation.objects.filter(
+                        status='reserved', start_time__lt=end, end_time__gt=start,
+                    ).values_list('seat_id', flat=True))
+                    latencies.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+                with lock:
+                    result['reads'] += len(latencies)
+                    result['read_latencies'].extend(latencies)
+
+        def writer(seed):
+            rng = random.Random(seed)
+            latencies = []
+            locked = 0
+            try:
+                while not stop.is_set():
+                    start, end = slot(rng)
+                    started = time.perf_counter()
+                    try:
+                        res = booking.book_seat(User(pk=rng.choice(user_ids)), Seat(pk=rng.choice(seat_ids)), start, end)
+                        if res.ok and rng.random() < 0.3:
+                            res.reservation.status = 'cancelled'
+                            with writes.serialized():
+                                res.reservation.save(update_fields=['status'])
+                    except OperationalError:
+                        locked += 1
+                        continue
+                    latencies.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+                with lock:
+                    result['writes'] += len(latencies)
+                    result['write_latencies'].extend(latencies)
+                    result['locked'] += locked
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+        threads += [threading.Thread(target=writer, args=(1000 + i,)) for i in range(writers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return result
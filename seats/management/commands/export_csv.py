@@ -0,0 +1,49 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from seats import exports
+from seats.models import Report, Reservation
+
+
+class Command(BaseCommand):
+    help = "把預約或檢舉匯出成 CSV (逐批讀取、逐行寫出，資料再多記憶體用量也固定)。"
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['reservations', 'reports'], help="要匯出的資料")
+        parser.add_argument('--since', default=None, help="起始日期 YYYY-MM-DD (含)")
+        parser.add_argument('--until', default=None, help="結束日期 YYYY-MM-DD (不含)")
+        parser.add_argument('--status', default=None, help="只匯出這個狀態 (例如 reserved、pending)")
+        parser.add_argument('--include-archived', action='store_true', help="預約一併匯出封存表")
+        parser.add_argument('--output', '-o', default=None, help="輸出檔案 (預設為標準輸出)")
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE, help="每次從資料庫讀取的筆數")
+
+    def handle(self, *args, **options):
+        try:
+            since = date.fromisoformat(options['since']) if options['since'] else None
+            until = date.fromisoformat(options['until']) if options['until'] else None
+        except ValueError as e:
+            raise CommandError(f"日期格式無效：{e}")
+        status = options['status']
+        kind = options['kind']
+        choices = Reservation.STATUS_CHOICES if kind == 'reservations' else Report.STATUS_CHOICES
+        if status and status not in dict(choices):
+            raise CommandError(f"狀態無效：{status} (可用：{', '.join(dict(choices))})")
+
+        filters = {'since': since, 'until': until, 'status': status, 'chunk_size': options['chunk_size']}
+        if kind == 'reservations':
+            rows = exports.reservation_rows(include_archived=options['include_archived'], **filters)
+        else:
+            rows = exports.report_rows(**filters)
+
+        if options['output']:
+            count = 0
+            with open(options['output'], 'w', encoding='utf-8', newline='') as f:
+                for line in exports.stream(rows):
+                    f.write(line)
+                    count += 1
+            # 扣掉 BOM 與標題列
+            self.stderr.write(f"exported {max(count - 2, 0)} {kind} to {options['output']}")
+        else:
+            for line in exports.stream(rows):
+                self.stdout.write(line, ending='')
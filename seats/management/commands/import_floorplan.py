@@ -0,0 +1,43 @@
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from seats import floorplan
+from seats.models import Room
+
+
+class Command(BaseCommand):
+    help = "從 CSV / JSON 平面圖整批匯入座位 (name, x, y，可選 id)，同一個交易內新增/修改，並列出差異。"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="平面圖檔案，- 表示標準輸入")
+        parser.add_argument('--format', choices=['csv', 'json'], default=None, help="檔案格式 (預設依副檔名判斷)")
+        parser.add_argument('--delete-missing', action='store_true', help="移除檔案裡沒有的座位 (預約一併刪除)")
+        parser.add_argument('--dry-run', action='store_true', help="只列出差異，不寫入")
+        parser.add_argument('--room', default=None, help="匯入到這間閱覽室 (slug，預設為主閱覽室)")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        room = None
+        if options['room']:
+            room = Room.objects.filter(slug=options['room']).first()
+            if room is None:
+                raise CommandError(f"找不到閱覽室：{options['room']}")
+        try:
+            data = sys.stdin.buffer.read() if path == '-' else Path(path).read_bytes()
+            rows = floorplan.read(data, fmt=options['format'], filename=None if path == '-' else path)
+        except OSError as e:
+            raise CommandError(f"無法讀取 {path}：{e}")
+        except floorplan.FloorPlanError as e:
+            raise CommandError(str(e))
+
+        result = floorplan.import_rows(
+            rows, delete_missing=options['delete_missing'], dry_run=options['dry_run'], room=room,
+        )
+        if not result.ok:
+            raise CommandError("平面圖有錯誤，沒有寫入任何座位：\n" + "\n".join(result.errors))
+        for line in result.report():
+            self.stdout.write(line)
+        prefix = "dry run (未寫入)" if options['dry_run'] else "imported"
+        self.stdout.write(f"{prefix} ({result.room}): {result.summary()}")
@@ -0,0 +1,95 @@
+import contextlib
+import io
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from seats import loadtest
+from seats.models import Reservation
+
+
+class Command(BaseCommand):
+    help = (
+        "尖峰時段壓力測試：在另建的測試資料庫中建立大量資料，"
+        "同時模擬使用者 登入→dashboard→res_time→make_reservation→records，輸出各步驟延遲與查詢次數。"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seats', type=int, default=300)
+        parser.add_argument('--users', type=int, default=20000)
+        parser.add_argument('--reservations', type=int, default=1000000, help="歷史預約筆數")
+        parser.add_argument('--days', type=int, default=365, help="歷史預約分布在過去幾天")
+        parser.add_argument('--flows', type=int, default=500, help="模擬幾次完整流程")
+        parser.add_argument('--concurrency', type=int, default=16, help="同時執行的使用者 (執行緒) 數")
+        parser.add_argument('--seed', type=int, default=42, help="亂數種子，固定後資料與請求順序可重現")
+        parser.add_argument('--database', default=str(settings.BASE_DIR / 'loadtest.sqlite3'),
+                            help="壓測用 SQLite 檔案 (不會動到正式資料庫)")
+        parser.add_argument('--keepdb', action='store_true', help="保留壓測資料庫，下次直接沿用已建立的資料")
+        parser.add_argument('--save-baseline', metavar='PATH', help="把結果存成 JSON baseline")
+        parser.add_argument('--compare', metavar='PATH', help="與先前存下的 baseline 比較")
+        parser.add_argument('--max-regression', type=float, default=20.0,
+                            help="p95 變慢超過幾 %% 視為退步 (搭配 --compare，退步時結束碼非 0)")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"無法讀取 baseline：{e}")
+
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = options['database']
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb'],
+        )
+        try:
+            # 壓測用獨立的程序內 cache，不會 bump 到正式環境共享 cache 裡的版本號
+            with override_settings(
+                DEBUG=False,
+                ALLOWED_HOSTS=['testserver'],
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                    'LOCATION': 'seats-loadtest'}},
+                EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+            ):
+                summary = self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        for line in loadtest.format_report(summary):
+            self.stdout.write(line)
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w', encoding='utf-8') as f:
+                json.dump(summary, f, indent=2, ensure_ascii=False)
+            self.stdout.write(f"baseline saved to {options['save_baseline']}")
+
+        if baseline is not None:
+            lines, regressions = loadtest.compare(summary, baseline, options['max_regression'])
+            self.stdout.write("")
+            for line in lines:
+                self.stdout.write(line)
+            if regressions:
+                raise CommandError("效能退步：\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("沒有超過門檻的退步。"))
+
+    def _run(self, options):
+        if Reservation.objects.exists():
+            self.stdout.write("reusing existing load-test data (--keepdb)")
+        else:
+            loadtest.seed(
+                seats=options['seats'], users=options['users'], reservations=options['reservations'],
+                days=options['days'], seed=options['seed'], log=self.stdout.write,
+            )
+        # view 裡的 DEBUG print 不混進報表
+        with contextlib.redirect_stdout(io.StringIO()):
+            recorder, elapsed = loadtest.run(
+                flows=options['flows'], concurrency=options['concurrency'], seed=options['seed'],
+            )
+        for step, errors in recorder.errors.items():
+            for error in sorted(set(errors))[:5]:
+                self.stderr.write(f"{step}: {error}")
+        return loadtest.summarize(recorder, elapsed, options['flows'], options['concurrency'])
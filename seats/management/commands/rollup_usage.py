@@ -0,0 +1,30 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from seats import rollups
+
+
+class Command(BaseCommand):
+    help = "重建座位使用量彙總表 (預設從最早一筆預約到已開放預約的最後一天)。"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', default=None, help="起始日期 YYYY-MM-DD (含)")
+        parser.add_argument('--until', default=None, help="結束日期 YYYY-MM-DD (不含)")
+        parser.add_argument('--batch-size', type=int, default=2000, help="每次從資料庫讀取的預約筆數")
+
+    def handle(self, *args, **options):
+        try:
+            since = date.fromisoformat(options['since']) if options['since'] else rollups.first_day()
+            until = date.fromisoformat(options['until']) if options['until'] else (
+                timezone.localdate() + timedelta(days=settings.BOOKING_DAYS_AHEAD + 1)
+            )
+        except ValueError as e:
+            raise CommandError(f"日期格式無效：{e}")
+        if since is None:
+            self.stdout.write("no reservations")
+            return
+        count = rollups.rebuild(since, until, batch_size=options['batch_size'], log=self.stdout.write)
+        self.stdout.write(f"rebuilt {since.isoformat()} ~ {until.isoformat()}: {count} reservations")
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seats', '0004_alter_report_options_report_reported_reservation_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['seat', 'status', 'start_time', 'end_time'], name='res_seat_status_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['user', 'status', 'start_time', 'end_time'], name='res_user_status_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['status', 'start_time', 'end_time'], name='res_status_time_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seats', '0005_reservation_overlap_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['reporter', 'submitted_at'], name='report_reporter_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['reported_user', 'submitted_at'], name='report_reported_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['user', 'start_time'], name='res_user_start_idx'),
+        ),
+    ]
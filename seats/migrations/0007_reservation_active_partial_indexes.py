@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seats', '0006_records_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='reservation',
+            name='res_seat_status_time_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='reservation',
+            name='res_user_status_time_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='reservation',
+            name='res_status_time_idx',
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(condition=models.Q(('status', 'reserved')), fields=['seat', 'start_time', 'end_time'], name='res_active_seat_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(condition=models.Q(('status', 'reserved')), fields=['user', 'start_time', 'end_time'], name='res_active_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(condition=models.Q(('status', 'reserved')), fields=['start_time', 'end_time'], name='res_active_time_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seats', '0007_reservation_active_partial_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedReservation',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('start_time', models.DateTimeField(verbose_name='開始時間')),
+                ('end_time', models.DateTimeField(verbose_name='結束時間')),
+                ('status', models.CharField(choices=[('reserved', '已預約'), ('cancelled', '已取消'), ('completed', '已完成')], max_length=10, verbose_name='狀態')),
+                ('created_at', models.DateTimeField(verbose_name='建立時間')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='封存時間')),
+                ('seat', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='seats.seat', verbose_name='預約座位')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='預約使用者')),
+            ],
+            options={
+                'verbose_name': '歷史預約',
+                'verbose_name_plural': '歷史預約',
+            },
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='reported_archived_reservation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='seats.archivedreservation', verbose_name='被檢舉的預約 (已封存)'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedreservation',
+            index=models.Index(fields=['user', 'start_time'], name='archived_res_user_start_idx'),
+        ),
+    ]
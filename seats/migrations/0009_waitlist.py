@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seats', '0008_reservation_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_time', models.DateTimeField(verbose_name='開始時間')),
+                ('end_time', models.DateTimeField(verbose_name='結束時間')),
+                ('status', models.CharField(choices=[('waiting', '候補中'), ('fulfilled', '已候補成功'), ('cancelled', '已取消')], default='waiting', max_length=10, verbose_name='狀態')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='登記時間')),
+                ('reservation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='seats.reservation', verbose_name='候補到的預約')),
+                ('seat', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='seats.seat', verbose_name='指定座位 (空白為任何座位)')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to=settings.AUTH_USER_MODEL, verbose_name='候補使用者')),
+            ],
+            options={
+                'verbose_name': '候補',
+                'verbose_name_plural': '候補',
+                'indexes': [models.Index(condition=models.Q(('status', 'waiting')), fields=['seat', 'start_time'], name='waitlist_waiting_seat_time_idx'), models.Index(condition=models.Q(('status', 'waiting')), fields=['user', 'start_time'], name='waitlist_waiting_user_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seats', '0009_waitlist'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotUsageHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(unique=True, verbose_name='時段 (整點)')),
+                ('booked_minutes', models.IntegerField(default=0, verbose_name='預約分鐘數')),
+                ('bookings', models.IntegerField(default=0, verbose_name='預約筆數')),
+                ('cancellations', models.IntegerField(default=0, verbose_name='取消筆數')),
+            ],
+            options={
+                'verbose_name': '時段使用量 (每小時)',
+                'verbose_name_plural': '時段使用量 (每小時)',
+            },
+        ),
+        migrations.CreateModel(
+            name='SeatUsageDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='日期')),
+                ('booked_minutes', models.IntegerField(default=0, verbose_name='預約分鐘數')),
+                ('bookings', models.IntegerField(default=0, verbose_name='預約筆數')),
+                ('cancellations', models.IntegerField(default=0, verbose_name='取消筆數')),
+                ('seat', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='seats.seat', verbose_name='座位')),
+            ],
+            options={
+                'verbose_name': '座位使用量 (每日)',
+                'verbose_name_plural': '座位使用量 (每日)',
+                'indexes': [models.Index(fields=['day', 'seat', 'booked_minutes', 'bookings', 'cancellations'], name='usage_daily_day_cover_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'seat'), name='usage_daily_day_seat_uniq')],
+            },
+        ),
+    ]
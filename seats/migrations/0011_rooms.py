@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# 與 seats.models.DEFAULT_ROOM_SLUG 相同；migration 不匯入目前的 models
+DEFAULT_ROOM_SLUG = 'main'
+
+
+def assign_default_room(apps, schema_editor):
+    # 建立預設閱覽室 (只有這裡會建立)，既有的座位都放進去
+    Room = apps.get_model('seats', 'Room')
+    Seat = apps.get_model('seats', 'Seat')
+    room, _ = Room.objects.get_or_create(slug=DEFAULT_ROOM_SLUG, defaults={'name': "主閱覽室"})
+    Seat.objects.filter(room__isnull=True).update(room=room)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seats', '0010_usage_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Branch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='分館名稱')),
+                ('sort_order', models.IntegerField(default=0, verbose_name='排序')),
+            ],
+            options={
+                'verbose_name': '分館',
+                'verbose_name_plural': '分館',
+                'ordering': ['sort_order', 'id'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='seat',
+            name='name',
+            field=models.CharField(max_length=20, verbose_name='座位編號'),
+        ),
+        migrations.CreateModel(
+            name='Room',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, verbose_name='閱覽室名稱')),
+                ('slug', models.SlugField(unique=True, verbose_name='網址代號')),
+                ('map_image', models.CharField(blank=True, max_length=200, verbose_name='座位圖背景 (static 路徑)')),
+                ('sort_order', models.IntegerField(default=0, verbose_name='排序')),
+                ('branch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rooms', to='seats.branch', verbose_name='分館')),
+            ],
+            options={
+                'verbose_name': '閱覽室',
+                'verbose_name_plural': '閱覽室',
+                'ordering': ['sort_order', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='seat',
+            name='room',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='seats', to='seats.room', verbose_name='閱覽室'),
+        ),
+        migrations.RunPython(assign_default_room, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='seat',
+            name='room',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='seats', to='seats.room', verbose_name='閱覽室'),
+        ),
+        migrations.AddField(
+            model_name='waitlistentry',
+            name='room',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='seats.room', verbose_name='閱覽室'),
+        ),
+        migrations.AddConstraint(
+            model_name='seat',
+            constraint=models.UniqueConstraint(fields=('room', 'name'), name='seat_room_name_uniq'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seats', '0011_rooms'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupBooking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_time', models.DateTimeField(verbose_name='開始時間')),
+                ('end_time', models.DateTimeField(verbose_name='結束時間')),
+                ('status', models.CharField(choices=[('pending', '等待成員確認'), ('booking', '預約中'), ('booked', '已預約'), ('failed', '無法預約'), ('cancelled', '已取消')], default='pending', max_length=10, verbose_name='狀態')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='發起時間')),
+                ('leader', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='led_group_bookings', to=settings.AUTH_USER_MODEL, verbose_name='發起人')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='seats.room', verbose_name='閱覽室')),
+            ],
+            options={
+                'verbose_name': '團體預約',
+                'verbose_name_plural': '團體預約',
+            },
+        ),
+        migrations.CreateModel(
+            name='GroupBookingMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(max_length=150, verbose_name='受邀帳號')),
+                ('status', models.CharField(choices=[('invited', '待確認'), ('accepted', '已同意'), ('declined', '已拒絕')], default='invited', max_length=10, verbose_name='狀態')),
+                ('responded_at', models.DateTimeField(blank=True, null=True, verbose_name='回覆時間')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='seats.groupbooking', verbose_name='團體預約')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='group_invitations', to=settings.AUTH_USER_MODEL, verbose_name='受邀使用者')),
+            ],
+            options={
+                'verbose_name': '團體預約成員',
+                'verbose_name_plural': '團體預約成員',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='groupbooking',
+            index=models.Index(fields=['leader', 'start_time'], name='group_leader_start_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='groupbookingmember',
+            constraint=models.UniqueConstraint(fields=('group', 'username'), name='group_member_username_uniq'),
+        ),
+    ]
@@ -33,11 +33,57 @@ from django.db import models
 from django.contrib.auth.models import User
 from datetime import datetime 
 
+DEFAULT_ROOM_SLUG = 'main'
+
+
+class Branch(models.Model):
+    """分館 (建築物)，可不設定。"""
+    name = models.CharField(max_length=50, unique=True, verbose_name="分館名稱")
+    sort_order = models.IntegerField(default=0, verbose_name="排序")
+
+    class Meta:
+        ordering = ['sort_order', 'id']
+        verbose_name = "分館"
+        verbose_name_plural = "分館"
+
+    def __str__(self):
+        return self.name
+
+
+class Room(models.Model):
+    """
+    閱覽室：每個座位屬於一間，各自有一張座位圖 (Seat.x / Seat.y 是該圖上的座標)。
+    座位圖頁面與可用性查詢都以閱覽室為單位 (?room=<slug>)，見 seats/layout.py。
+    """
+    branch = models.ForeignKey(Branch, on_delete=models.SET_NULL, null=True, blank=True, related_name='rooms', verbose_name="分館")
+    name = models.CharField(max_length=50, verbose_name="閱覽室名稱")
+    slug = models.SlugField(max_length=50, unique=True, verbose_name="網址代號")
+    map_image = models.CharField(max_length=200, blank=True, verbose_name="座位圖背景 (static 路徑)")
+    sort_order = models.IntegerField(default=0, verbose_name="排序")
+
+    class Meta:
+        ordering = ['sort_order', 'id']
+        verbose_name = "閱覽室"
+        verbose_name_plural = "閱覽室"
+
+    def __str__(self):
+        return f"{self.branch.name} {self.name}" if self.branch_id else self.name
+
+
 class Seat(models.Model):
-    name = models.CharField(max_length=20, unique=True, verbose_name="座位編號")
+    # (room, name) 的 unique 索引已涵蓋依閱覽室查座位，外鍵不另建索引。
+    # 沒有預設值：建立座位時一律指定閱覽室 (預設閱覽室 DEFAULT_ROOM_SLUG 只由 migration 0011 建立)
+    room = models.ForeignKey(Room, on_delete=models.PROTECT, db_index=False,
+                             related_name='seats', verbose_name="閱覽室")
+    name = models.CharField(max_length=20, verbose_name="座位編號")  # 同一間閱覽室內不可重複
     x = models.IntegerField(default=0, verbose_name="X 座標")
     y = models.IntegerField(default=0, verbose_name="Y 座標")
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'name'], name='seat_room_name_uniq'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -55,10 +101,50 @@ class Reservation(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='reserved', verbose_name="狀態")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="建立時間")
 
+    class Meta:
+        # 所有可用性/預約查詢都是 status='reserved' + 時段重疊 (start_time < 結束 AND end_time > 開始)
+        # 依查詢的等值欄位 (seat / user / 無) 各建一個複合索引，避免全表掃描。
+        # 只收 reserved 的列 (partial index)：已結束的預約由 complete_reservations 轉成 completed 後就不在索引裡
+        indexes = [
+            models.Index(fields=['seat', 'start_time', 'end_time'], condition=models.Q(status='reserved'),
+                         name='res_active_seat_time_idx'),
+            models.Index(fields=['user', 'start_time', 'end_time'], condition=models.Q(status='reserved'),
+                         name='res_active_user_time_idx'),
+            models.Index(fields=['start_time', 'end_time'], condition=models.Q(status='reserved'),
+                         name='res_active_time_idx'),
+            # 個人紀錄頁依 start_time 倒序分頁 (SQLite 索引尾端隱含 id，可當作 tiebreak)
+            models.Index(fields=['user', 'start_time'], name='res_user_start_idx'),
+        ]
+
     def __str__(self):
         username_str = self.user.username if self.user else "Unknown User"
         return f"{self.seat.name} - {username_str} ({self.start_time.strftime('%Y-%m-%d %H:%M')} ~ {self.end_time.strftime('%Y-%m-%d %H:%M')})"
 
+class ArchivedReservation(models.Model):
+    """
+    超過 RESERVATION_ARCHIVE_DAYS 的歷史預約 (見 seats/archive.py)。
+    沿用原本 Reservation 的 id，個人紀錄頁與後台把兩張表合併成同一份列表。
+    """
+    id = models.BigIntegerField(primary_key=True)  # 與 Reservation 的 BigAutoField 相同
+    seat = models.ForeignKey(Seat, on_delete=models.SET_NULL, null=True, verbose_name="預約座位")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="預約使用者")
+    start_time = models.DateTimeField(verbose_name="開始時間")
+    end_time = models.DateTimeField(verbose_name="結束時間")
+    status = models.CharField(max_length=10, choices=Reservation.STATUS_CHOICES, verbose_name="狀態")
+    created_at = models.DateTimeField(verbose_name="建立時間")
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name="封存時間")
+
+    class Meta:
+        verbose_name = "歷史預約"
+        verbose_name_plural = "歷史預約"
+        indexes = [
+            models.Index(fields=['user', 'start_time'], name='archived_res_user_start_idx'),
+        ]
+
+    def __str__(self):
+        seat_name = self.seat.name if self.seat else "已刪除座位"
+        return f"{seat_name} - {self.user.username} ({self.start_time.strftime('%Y-%m-%d %H:%M')} ~ {self.end_time.strftime('%Y-%m-%d %H:%M')}) [封存]"
+
 class Report(models.Model):
     STATUS_CHOICES = [
         ('pending', '待處理'),
@@ -79,6 +165,13 @@ class Report(models.Model):
         null=True, blank=True, 
         verbose_name="被檢舉的預約"
     )
+    # 被檢舉的預約封存後改指向封存表 (reported_reservation 會清空)
+    reported_archived_reservation = models.ForeignKey(
+        'ArchivedReservation',
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        verbose_name="被檢舉的預約 (已封存)"
+    )
     
     reported_date = models.DateField(null=True, blank=True, verbose_name="發生日期")
     reported_time = models.TimeField(null=True, blank=True, verbose_name="發生時間")
@@ -94,7 +187,149 @@ class Report(models.Model):
         reported_user_str = self.reported_user.username if self.reported_user else "N/A"
         return f"檢舉 ({self.get_status_display()}) - 座位: {seat_name}, 時間: {date_str} {time_str}, 被檢舉人: {reported_user_str}"
 
+    @property
+    def reservation_record(self):
+        """被檢舉的預約，不論是否已封存。"""
+        return self.reported_reservation or self.reported_archived_reservation
+
     class Meta:
         verbose_name = "檢舉"
         verbose_name_plural = "檢舉"
         ordering = ['-submitted_at'] # 保持排序
+        indexes = [
+            # 個人紀錄頁依 submitted_at 倒序分頁
+            models.Index(fields=['reporter', 'submitted_at'], name='report_reporter_time_idx'),
+            models.Index(fields=['reported_user', 'submitted_at'], name='report_reported_time_idx'),
+        ]
+
+class WaitlistEntry(models.Model):
+    """
+    候補 (seats/waitlist.py)：座位在某時段被預約時登記候補，有人取消就依登記順序自動預約。
+    seat 為空表示 room 裡的任何座位都可以。
+    """
+    STATUS_CHOICES = [
+        ('waiting', '候補中'),
+        ('fulfilled', '已候補成功'),
+        ('cancelled', '已取消'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='waitlist_entries', verbose_name="候補使用者")
+    seat = models.ForeignKey(Seat, on_delete=models.CASCADE, null=True, blank=True, verbose_name="指定座位 (空白為任何座位)")
+    # 候補「任何座位」時限定在哪一間閱覽室 (指定座位時就是該座位的閱覽室)
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, null=True, blank=True, verbose_name="閱覽室")
+    start_time = models.DateTimeField(verbose_name="開始時間")
+    end_time = models.DateTimeField(verbose_name="結束時間")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='waiting', verbose_name="狀態")
+    reservation = models.ForeignKey(Reservation, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="候補到的預約")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="登記時間")
+
+    class Meta:
+        verbose_name = "候補"
+        verbose_name_plural = "候補"
+        # 取消預約時找「該座位或任何座位 (seat IS NULL)」+ start_time 範圍內的候補，
+        # 兩個分支都是 (seat, start_time) 上的 B-tree 範圍查詢；只收 waiting 的列
+        indexes = [
+            models.Index(fields=['seat', 'start_time'], condition=models.Q(status='waiting'),
+                         name='waitlist_waiting_seat_time_idx'),
+            models.Index(fields=['user', 'start_time'], condition=models.Q(status='waiting'),
+                         name='waitlist_waiting_user_idx'),
+        ]
+
+    def __str__(self):
+        seat_name = self.seat.name if self.seat else "任何座位"
+        return f"候補 {seat_name} - {self.user.username} ({self.start_time.strftime('%Y-%m-%d %H:%M')} ~ {self.end_time.strftime('%H:%M')}) [{self.get_status_display()}]"
+
+class GroupBooking(models.Model):
+    """
+    團體預約 (seats/groups.py)：發起人邀請同行成員，所有成員都確認後才一起找相鄰座位預約。
+    成員沒有同意前不會替任何人建立預約。
+    """
+    STATUS_CHOICES = [
+        ('pending', '等待成員確認'),
+        ('booking', '預約中'),
+        ('booked', '已預約'),
+        ('failed', '無法預約'),
+        ('cancelled', '已取消'),
+    ]
+
+    leader = models.ForeignKey(User, on_delete=models.CASCADE, related_name='led_group_bookings', verbose_name="發起人")
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, verbose_name="閱覽室")
+    start_time = models.DateTimeField(verbose_name="開始時間")
+    end_time = models.DateTimeField(verbose_name="結束時間")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name="狀態")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="發起時間")
+
+    class Meta:
+        verbose_name = "團體預約"
+        verbose_name_plural = "團體預約"
+        indexes = [
+            models.Index(fields=['leader', 'start_time'], name='group_leader_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"團體預約 {self.leader.username} ({self.start_time.strftime('%Y-%m-%d %H:%M')} ~ {self.end_time.strftime('%H:%M')}) [{self.get_status_display()}]"
+
+
+class GroupBookingMember(models.Model):
+    """
+    團體預約的受邀成員。username 保留發起人輸入的帳號：帳號不存在時 user 為空，
+    邀請照樣列出 (一直是待確認)，發起人無法藉此得知哪些帳號存在。
+    """
+    STATUS_CHOICES = [
+        ('invited', '待確認'),
+        ('accepted', '已同意'),
+        ('declined', '已拒絕'),
+    ]
+
+    group = models.ForeignKey(GroupBooking, on_delete=models.CASCADE, related_name='members', verbose_name="團體預約")
+    username = models.CharField(max_length=150, verbose_name="受邀帳號")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True,
+                             related_name='group_invitations', verbose_name="受邀使用者")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='invited', verbose_name="狀態")
+    responded_at = models.DateTimeField(null=True, blank=True, verbose_name="回覆時間")
+
+    class Meta:
+        verbose_name = "團體預約成員"
+        verbose_name_plural = "團體預約成員"
+        constraints = [
+            models.UniqueConstraint(fields=['group', 'username'], name='group_member_username_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.username} [{self.get_status_display()}]"
+
+class SlotUsageHourly(models.Model):
+    """
+    每個時段 (整點) 所有座位合計的使用量 (seats/rollups.py)，由預約/取消事件增量更新，
+    `python manage.py rollup_usage` 可重建。統計報表只讀彙總表，不掃 Reservation。
+    """
+    hour = models.DateTimeField(unique=True, verbose_name="時段 (整點)")
+    booked_minutes = models.IntegerField(default=0, verbose_name="預約分鐘數")
+    bookings = models.IntegerField(default=0, verbose_name="預約筆數")  # 在此時段開始、未取消的預約
+    cancellations = models.IntegerField(default=0, verbose_name="取消筆數")
+
+    class Meta:
+        verbose_name = "時段使用量 (每小時)"
+        verbose_name_plural = "時段使用量 (每小時)"
+
+
+class SeatUsageDaily(models.Model):
+    """每個座位每天的使用量彙總，欄位同 SlotUsageHourly。"""
+    seat = models.ForeignKey(Seat, on_delete=models.CASCADE, db_index=False, verbose_name="座位")
+    day = models.DateField(verbose_name="日期")
+    booked_minutes = models.IntegerField(default=0, verbose_name="預約分鐘數")
+    bookings = models.IntegerField(default=0, verbose_name="預約筆數")
+    cancellations = models.IntegerField(default=0, verbose_name="取消筆數")
+
+    class Meta:
+        verbose_name = "座位使用量 (每日)"
+        verbose_name_plural = "座位使用量 (每日)"
+        # 報表只會「日期區間內依座位加總」，索引都以 day 開頭 (座位不另建索引，否則 SQLite 會為了
+        # GROUP BY 沿著座位索引掃過所有歷史資料)；涵蓋索引包含所有數值欄位，只讀索引不回表
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'seat'], name='usage_daily_day_seat_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['day', 'seat', 'booked_minutes', 'bookings', 'cancellations'],
+                         name='usage_daily_day_cover_idx'),
+        ]
@@ -0,0 +1,298 @@
+# seats/occupancy.py
+"""
+每日座位佔用點陣。
+
+每個座位每天一個整數，第 i 個 bit 代表開館後第 i 個時段已被預約
+(開館時間與時段長度由 slots.py 的時段表決定)。
+「某天 A~B 點哪些座位被佔用」只需對每個座位做一次 AND，不必再下時段重疊的 SQL。
+
+- 點陣依 (閱覽室, 日期) 分開：每間閱覽室每天第一次被查詢時用一個查詢建立
+  (seat_id IN 該閱覽室的座位，走 (seat, start_time, end_time) 索引，不會讀到其他閱覽室的預約)，
+  之後留在程序記憶體 (每間最多 MAX_DAYS 天)。
+- make_reservation / 取消預約透過 signals 在 commit 後增量更新點陣，
+  並 bump 該閱覽室該日的共享版本號；其他 worker 看到版本變了就重建，其他閱覽室不受影響。
+  座位配置改變 (座位換閱覽室等) 時 layout 的 tuple 換新，點陣也跟著重建。
+- 不在時段格線上的預約 (例如管理後台手動建立的 10:30~11:10) 另存一份清單，
+  查詢時逐筆比對，所以結果與原本的 SQL 完全一致。
+"""
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import layout, slots, versions
+from .models import Reservation
+
+MAX_DAYS = 14
+
+
+def day_window(day):
+    """回傳該日格線的 (開館, 閉館) 時間，休館日回傳 None。"""
+    day_slots = slots.get_day(day)
+    if not day_slots.is_open:
+        return None
+    return day_slots.open_dt, day_slots.close_dt
+
+
+def _local(dt):
+    return timezone.localtime(dt) if settings.USE_TZ and timezone.is_aware(dt) else dt
+
+
+def _spans(start, end):
+    """把一段預約切成每日格線內的片段：(day, 開始, 結束, bitmask 或 None)。"""
+    if start >= end:
+        return
+    day = _local(start).date()
+    last_day = _local(end - timedelta(microseconds=1)).date()
+    while day <= last_day:
+        day_slots = slots.get_day(day)
+        if not day_slots.is_open:
+            day += timedelta(days=1)
+            continue
+        open_dt, close_dt = day_slots.open_dt, day_slots.close_dt
+        s, e = max(start, open_dt), min(end, close_dt)
+        if s < e:
+            lo, lo_rem = divmod(s - open_dt, day_slots.slot)
+            hi, hi_rem = divmod(e - open_dt, day_slots.slot)
+            mask = None
+            if not lo_rem and not hi_rem:
+                mask = ((1 << hi) - 1) ^ ((1 << lo) - 1)
+            yield day, s, e, mask
+        day += timedelta(days=1)
+
+
+def _day_key(day, room_id):
+    return f'occupancy:{room_id}:{day.isoformat()}'
+
+
+def _room_id(room):
+    return room if isinstance(room, int) else room.pk
+
+
+class DayOccupancy:
+    __slots__ = ('day', 'room_id', 'seats', 'version', 'bits', 'partial')
+
+    def __init__(self, day, version, room_id=None, seats=()):
+        self.day = day
+        self.room_id = room_id
+        self.seats = seats  # 建立時 layout.get_seats(room) 的 tuple，配置變了就不能再用
+        self.version = version
+        self.bits = {}  # seat_id -> int
+        self.partial = []  # (seat_id, start, end)
+
+    def copy(self, version):
+        occ = DayOccupancy(self.day, version, self.room_id, self.seats)
+        occ.bits = dict(self.bits)
+        occ.partial = list(self.partial)
+        return occ
+
+    def add(self, seat_id, start, end):
+        for day, s, e, mask in _spans(start, end):
+            if day != self.day:
+                continue
+            if mask is None:
+                self.partial.append((seat_id, s, e))
+            else:
+                self.bits[seat_id] = self.bits.get(seat_id, 0) | mask
+
+    def clear_seat(self, seat_id):
+        self.bits.pop(seat_id, None)
+        self.partial = [p for p in self.partial if p[0] != seat_id]
+
+    def reserved_seat_ids(self, start, end):
+        day_slots = slots.get_day(self.day)
+        open_dt, slot = day_slots.open_dt, day_slots.slot
+        lo = (start - open_dt) // slot
+        hi = -((open_dt - end) // slot)  # 無條件進位
+        mask = ((1 << hi) - 1) ^ ((1 << lo) - 1)
+        taken = {seat_id for seat_id, bits in self.bits.items() if bits & mask}
+        taken.update(seat_id for seat_id, s, e in self.partial if s < end and e > start)
+        return taken
+
+
+_lock = threading.Lock()
+_days = OrderedDict()  # (room_id, day) -> DayOccupancy
+
+
+def _build_day(day, room_id, version, seats):
+    occ = DayOccupancy(day, version, room_id, seats)
+    if not seats:
+        return occ
+    open_dt, close_dt = day_window(day)
+    rows = Reservation.objects.filter(
+        seat_id__in=[seat.id for seat in seats],
+        status='reserved',
+        start_time__lt=close_dt,
+        end_time__gt=open_dt,
+    ).values_list('seat_id', 'start_time', 'end_time')
+    for seat_id, start, end in rows:
+        occ.add(seat_id, start, end)
+    return occ
+
+
+def day_version(day, room=None):
+    """
+    該閱覽室該日預約狀態的共享版本號，每次預約/取消影響到這天都會前進。
+    room 為 None 時回傳所有閱覽室版本號組成的字串 (給 ETag 用)。
+    """
+    if room is None:
+        return '.'.join(str(day_version(day, r)) for r in layout.get_rooms())
+    return versions.get_version(_day_key(day, _room_id(room)))
+
+
+def get_day(day, room):
+    room_id = _room_id(room)
+    key = (room_id, day)
+    # 先讀版本再查資料庫：建立期間若有寫入，版本已經又前進，下一次查詢就會重建
+    version = day_version(day, room_id)
+    seats = layout.get_seats(room_id)
+    with _lock:
+        occ = _days.get(key)
+        if occ is not None and occ.version == version and occ.seats is seats:
+            _days.move_to_end(key)
+            return occ
+    occ = _build_day(day, room_id, version, seats)
+    with _lock:
+        _days[key] = occ
+        _days.move_to_end(key)
+        while len(_days) > MAX_DAYS * max(len(layout.get_rooms()), 1):
+            _days.popitem(last=False)
+    return occ
+
+
+def _rooms(room):
+    return layout.get_rooms() if room is None else (room,)
+
+
+def reserved_seat_ids(start, end, room=None):
+    """
+    回傳與 [start, end) 重疊的已預約座位 id 集合；room 為 None 時包含所有閱覽室。
+    時段不落在單日開館格線內時回傳 None，由呼叫端改用 SQL 查詢。
+    """
+    if start >= end:
+        return None
+    day = _local(start).date()
+    window = day_window(day)
+    if window is None or start < window[0] or end > window[1]:
+        return None
+    taken = set()
+    for r in _rooms(room):
+        taken |= get_day(day, r).reserved_seat_ids(start, end)
+    return taken
+
+
+def occupied_now(now=None, room=None):
+    """目前正在使用中的座位 id 集合 (start_time <= now < end_time)。"""
+    now = now or timezone.now()
+    taken = reserved_seat_ids(now, now + timedelta(microseconds=1), room=room)
+    if taken is None:
+        rows = Reservation.objects.filter(
+            status='reserved',
+            start_time__lte=now,
+            end_time__gt=now,
+        )
+        if room is not None:
+            rows = rows.filter(seat_id__in=[seat.id for seat in layout.get_seats(room)])
+        taken = set(rows.values_list('seat_id', flat=True))
+    return taken
+
+
+def next_boundary(now=None):
+    """
+    now 之後佔用狀態最早可能改變的時間：下一個時段邊界，
+    或當天不在格線上的預約的開始/結束時間。閉館時段回傳下次開館時間。
+    """
+    now = now or timezone.now()
+    day = _local(now).date()
+    day_slots = slots.get_day(day)
+    if not day_slots.is_open or now >= day_slots.close_dt:
+        for offset in range(1, MAX_DAYS + 1):
+            window = day_window(day + timedelta(days=offset))
+            if window is not None:
+                return window[0]
+        return now + timedelta(days=1)
+    open_dt, slot = day_slots.open_dt, day_slots.slot
+    if now < open_dt:
+        return open_dt
+    upcoming = open_dt + ((now - open_dt) // slot + 1) * slot
+    for room in layout.get_rooms():
+        for _, s, e in get_day(day, room).partial:
+            for boundary in (s, e):
+                if now < boundary < upcoming:
+                    upcoming = boundary
+    return upcoming
+
+
+def reset():
+    """清空程序內的點陣 (測試用)。"""
+    with _lock:
+        _days.clear()
+
+
+def _apply_change(seat_id, start, end, added):
+    seat = layout.get_seat(seat_id)
+    if seat is None:
+        return  # 座位已刪除：座位配置的版本前進，各閱覽室的點陣會重建
+    room_id = seat.room_id
+    for day in {span[0] for span in _spans(start, end)}:
+        key = (room_id, day)
+        version = versions.bump_version(_day_key(day, room_id))
+        with _lock:
+            occ = _days.get(key)
+        if occ is None:
+            continue
+        if occ.version != version - 1:
+            # 其他 worker 也在這段期間改過這天，增量套用不可靠，丟掉等下次重建
+            with _lock:
+                _days.pop(key, None)
+            continue
+        # copy-on-write：正在讀舊物件的請求不受影響
+        updated = occ.copy(version)
+        if added:
+            updated.add(seat_id, start, end)
+        else:
+            # 取消/修改：重新讀取該座位當天的預約 (走 seat + status + 時段索引)
+            updated.clear_seat(seat_id)
+            fresh = _build_seat_day(seat_id, day)
+            updated.bits.update(fresh.bits)
+            updated.partial.extend(fresh.partial)
+        with _lock:
+            if _days.get(key) is occ:
+                _days[key] = updated
+
+
+def _build_seat_day(seat_id, day):
+    occ = DayOccupancy(day, None)
+    open_dt, close_dt = day_window(day)
+    rows = Reservation.objects.filter(
+        seat_id=seat_id,
+        status='reserved',
+        start_time__lt=close_dt,
+        end_time__gt=open_dt,
+    ).values_list('start_time', 'end_time')
+    for start, end in rows:
+        occ.add(seat_id, start, end)
+    return occ
+
+
+def reservation_changed(instance, created=False, previous=None):
+    """
+    Reservation 建立/修改/刪除後呼叫 (見 signals.py)。
+    新建立的 reserved 預約直接 OR 進點陣；其他變更重新讀取受影響的座位-日期。
+    """
+    changes = []
+    if created and instance.status == 'reserved':
+        changes.append((instance.seat_id, instance.start_time, instance.end_time, True))
+    else:
+        changes.append((instance.seat_id, instance.start_time, instance.end_time, False))
+        if previous is not None and previous[:3] != changes[0][:3]:
+            changes.append((*previous[:3], False))
+
+    def apply():
+        for seat_id, start, end, added in changes:
+            _apply_change(seat_id, start, end, added)
+
+    transaction.on_commit(apply)
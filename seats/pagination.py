@@ -0,0 +1,176 @@
+# seats/pagination.py
+"""
+個人紀錄頁用的 keyset (cursor) 分頁。
+
+Paginator 每頁要一次 COUNT(*) 加一次 OFFSET 查詢，紀錄越多越慢。這裡改成：
+- 上一頁/下一頁用 cursor (排序欄位值 + id) 直接從索引位置往下讀，不用 OFFSET；
+- 總數只數到 count_limit 筆 (超過就顯示「1000+」)，頁碼列表也只列出目前頁附近幾頁；
+- 直接跳到某個頁碼時才用 OFFSET，且頁碼不會超過 count_limit / per_page。
+
+cursor 格式：'<n|p>.<排序欄位的微秒時間戳>.<id>.<offset>'，offset 只用來顯示列號與頁碼。
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _encode_time(value):
+    epoch = EPOCH if value.tzinfo else EPOCH.replace(tzinfo=None)
+    return (value - epoch) // timedelta(microseconds=1)
+
+
+def _decode_time(value):
+    epoch = EPOCH if settings.USE_TZ else EPOCH.replace(tzinfo=None)
+    return epoch + timedelta(microseconds=value)
+
+
+class KeysetPage:
+    ELLIPSIS = Paginator.ELLIPSIS
+
+    def __init__(self, object_list, number, per_page, count, count_is_approximate,
+                 has_previous, has_next, previous_cursor, next_cursor):
+        self.object_list = object_list
+        self.number = number
+        self.start_index = (number - 1) * per_page + 1 if object_list else 0
+        self.count = count
+        self.count_is_approximate = count_is_approximate
+        self.has_previous = has_previous
+        self.has_next = has_next
+        self.previous_cursor = previous_cursor
+        self.next_cursor = next_cursor
+        self.page_range = []
+        if count:
+            paginator = Paginator(range(count), per_page)
+            if number <= paginator.num_pages:
+                self.page_range = list(paginator.get_elided_page_range(number, on_each_side=2, on_ends=1))
+
+    def has_other_pages(self):
+        return self.has_previous or self.has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    以 (field 遞減, id 遞減) 排序分頁，field 須為 DateTimeField；queryset 不需要先 order_by。
+    queryset 也可以是多個 queryset 組成的 list (例如線上表 + 封存表)，依相同排序合併成一份列表，
+    各 queryset 的 id 不可重複。
+    """
+
+    def __init__(self, queryset, field, per_page=10, count_limit=1000):
+        self.querysets = list(queryset) if isinstance(queryset, (list, tuple)) else [queryset]
+        self.field = field
+        self.per_page = per_page
+        self.count_limit = count_limit
+
+    def _count(self):
+        if not self.count_limit:
+            return 0, False
+        # 只數到 count_limit + 1 筆：SELECT COUNT(*) FROM (... LIMIT n)
+        count = sum(qs.order_by()[:self.count_limit + 1].count() for qs in self.querysets)
+        if count > self.count_limit:
+            return self.count_limit, True
+        return count, False
+
+    def _key(self, obj):
+        return getattr(obj, self.field), obj.pk
+
+    def _fetch(self, after, limit, ascending=False):
+        """從 after (field 值, id) 之後 (不含) 依排序方向取 limit 筆，多個 queryset 時合併。"""
+        field = self.field
+        rows = []
+        for qs in self.querysets:
+            if ascending:
+                qs = qs.order_by(field, 'pk')
+                if after:
+                    qs = qs.filter(Q(**{f'{field}__gt': after[0]}) | Q(**{field: after[0], 'pk__gt': after[1]}))
+            else:
+                qs = qs.order_by(f'-{field}', '-pk')
+                if after:
+                    qs = qs.filter(Q(**{f'{field}__lt': after[0]}) | Q(**{field: after[0], 'pk__lt': after[1]}))
+            rows.extend(qs[:limit])
+        if len(self.querysets) > 1:
+            rows.sort(key=self._key, reverse=not ascending)
+        return rows[:limit]
+
+    def _boundary(self, offset):
+        """第 offset 筆 (排序後) 的 (field 值, id)；多個 queryset 無法直接 OFFSET，只讀索引欄位來定位。"""
+        keys = []
+        for qs in self.querysets:
+            keys.extend(qs.order_by(f'-{self.field}', '-pk').values_list(self.field, 'pk')[:offset])
+        keys.sort(reverse=True)
+        return keys[offset - 1] if len(keys) >= offset else None
+
+    def _cursor(self, direction, obj, offset):
+        return f"{direction}.{_encode_time(getattr(obj, self.field))}.{obj.pk}.{offset}"
+
+    def _parse_cursor(self, cursor):
+        try:
+            direction, stamp, pk, offset = cursor.split('.')
+            if direction not in ('n', 'p'):
+                return None
+            return direction, int(stamp), int(pk), max(int(offset), 0)
+        except (AttributeError, ValueError):
+            return None
+
+    def page(self, cursor=None, number=None):
+        per_page = self.per_page
+        parsed = self._parse_cursor(cursor) if cursor else None
+
+        if parsed is not None:
+            direction, stamp, pk, offset = parsed
+            after = (_decode_time(stamp), pk)
+            if direction == 'n':
+                rows = self._fetch(after, per_page + 1)
+                has_next = len(rows) > per_page
+                rows = rows[:per_page]
+                has_previous = True
+            else:
+                rows = self._fetch(after, per_page + 1, ascending=True)
+                has_previous = len(rows) > per_page
+                rows = rows[:per_page][::-1]
+                has_next = True
+                if not has_previous:
+                    offset = 0
+        else:
+            try:
+                number = max(int(number), 1)
+            except (TypeError, ValueError):
+                number = 1
+            offset = (number - 1) * per_page
+            if self.count_limit:
+                offset = min(offset, max(self.count_limit - per_page, 0))
+            if not offset:
+                rows = self._fetch(None, per_page + 1)
+            elif len(self.querysets) == 1:
+                descending = self.querysets[0].order_by(f'-{self.field}', '-pk')
+                rows = list(descending[offset:offset + per_page + 1])
+            else:
+                boundary = self._boundary(offset)
+                rows = self._fetch(boundary, per_page + 1) if boundary else []
+            has_next = len(rows) > per_page
+            rows = rows[:per_page]
+            has_previous = offset > 0
+            if not rows and offset:
+                # 超出範圍：回到第一頁
+                return self.page()
+
+        count, approximate = self._count()
+        number = offset // per_page + 1
+        return KeysetPage(
+            rows, number, per_page, count, approximate,
+            has_previous, has_next,
+            self._cursor('p', rows[0], max(offset - per_page, 0)) if rows and has_previous else None,
+            self._cursor('n', rows[-1], offset + per_page) if rows and has_next else None,
+        )
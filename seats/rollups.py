@@ -0,0 +1,284 @@
+# seats/rollups.py
+"""
+座位使用量彙總 (給 staff 的統計報表)。
+
+「整學期每個座位、每個時段的使用率」原本只能掃過所有 Reservation (含封存表)。
+這裡維護兩張彙總表，報表與 CSV 匯出只讀它們；歷史資料再多，查詢也只讀指定期間的那幾天：
+
+- SlotUsageHourly：整點 -> 所有座位合計的預約分鐘數、預約筆數、取消筆數 (每天十幾列)
+- SeatUsageDaily：(座位, 日期) -> 同上
+
+(「座位 × 小時」的明細表一學期有幾十萬列，彙總起來不比直接掃 Reservation 快，所以不存。)
+
+一筆預約的「貢獻」只取決於 (座位, 起訖時間, 狀態)：未取消的預約把分鐘數分攤到經過的每個小時，
+並在開始的那個小時/那一天記一筆預約；取消的預約只記一筆取消。
+預約建立/取消/修改/刪除時 (signals.py) 算出新舊貢獻的差，commit 後用一條
+INSERT ... ON CONFLICT DO UPDATE 累加進兩張表。completed 與 reserved 的貢獻相同，
+所以 complete_reservations 與封存 (不送 signals) 都不影響彙總。
+
+`python manage.py rollup_usage` 逐日重建 (第一次上線、或懷疑有漏掉的事件時)。
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Min, Sum
+from django.utils import timezone
+
+from . import layout, slots, writes
+from .models import ArchivedReservation, Reservation, Seat, SeatUsageDaily, SlotUsageHourly
+
+FIELDS = ('booked_minutes', 'bookings', 'cancellations')
+HOUR = timedelta(hours=1)
+
+
+def _local(dt):
+    return timezone.localtime(dt) if settings.USE_TZ and timezone.is_aware(dt) else dt
+
+
+def _day_start(day):
+    dt = datetime.combine(day, time())
+    if settings.USE_TZ:
+        dt = timezone.make_aware(dt, timezone.get_current_timezone())
+    return dt
+
+
+def _add(table, key, values, sign=1):
+    row = table[key]
+    for i, value in enumerate(values):
+        row[i] += sign * value
+
+
+def _counts():
+    return defaultdict(lambda: [0, 0, 0])
+
+
+def contribution(seat_id, start, end, status, lo=None, hi=None):
+    """
+    一筆預約對彙總表的貢獻：({整點: [分鐘, 預約, 取消]}, {(seat_id, 日期): [...]})。
+    lo/hi (重建時用) 只計算落在 [lo, hi) 的部分。
+    """
+    hourly, daily = _counts(), _counts()
+    if seat_id is None:
+        return hourly, daily
+    if (lo is None or lo <= start) and (hi is None or start < hi):
+        local_start = _local(start)
+        counts = (0, 0, 1) if status == 'cancelled' else (0, 1, 0)
+        _add(hourly, local_start.replace(minute=0, second=0, microsecond=0), counts)
+        _add(daily, (seat_id, local_start.date()), counts)
+    if status == 'cancelled':
+        return hourly, daily
+    s = _local(max(start, lo) if lo else start)
+    e = _local(min(end, hi) if hi else end)
+    hour = s.replace(minute=0, second=0, microsecond=0)
+    while hour < e:
+        minutes = round((min(hour + HOUR, e) - max(hour, s)).total_seconds() / 60)
+        _add(hourly, hour, (minutes, 0, 0))
+        _add(daily, (seat_id, hour.date()), (minutes, 0, 0))
+        hour += HOUR
+    return hourly, daily
+
+
+def _merge(total, part, sign=1):
+    for key, values in part.items():
+        _add(total, key, values, sign)
+
+
+def delta(old, new):
+    """old/new 為 (seat_id, start, end, status) 或 None，回傳兩張表要累加的差 (已去掉全為 0 的列)。"""
+    hourly, daily = _counts(), _counts()
+    for row, sign in ((old, -1), (new, 1)):
+        if row is not None:
+            row_hourly, row_daily = contribution(*row)
+            _merge(hourly, row_hourly, sign)
+            _merge(daily, row_daily, sign)
+    return (
+        {key: values for key, values in hourly.items() if any(values)},
+        {key: values for key, values in daily.items() if any(values)},
+    )
+
+
+def _upsert(model, key_names, rows):
+    """rows: {key 或 (key, ...): [分鐘, 預約, 取消]}，key 對應 key_names，累加到 model。"""
+    if not rows:
+        return
+    opts = model._meta
+    key_fields = [opts.get_field(name) for name in key_names]
+    if connection.vendor in ('sqlite', 'postgresql'):
+        qn = connection.ops.quote_name
+        table = qn(opts.db_table)
+        key_cols = ', '.join(qn(field.column) for field in key_fields)
+        cols = [qn(name) for name in FIELDS]
+        updates = ', '.join(f"{col} = {table}.{col} + excluded.{col}" for col in cols)
+        placeholders = '(' + ', '.join(['%s'] * (len(key_fields) + len(FIELDS))) + ')'
+        sql = (
+            f"INSERT INTO {table} ({key_cols}, {', '.join(cols)}) "
+            f"VALUES {', '.join([placeholders] * len(rows))} "
+            f"ON CONFLICT ({key_cols}) DO UPDATE SET {updates}"
+        )
+        params = []
+        for key, values in rows.items():
+            key = key if isinstance(key, tuple) else (key,)
+            params.extend(field.get_db_prep_value(value, connection) for field, value in zip(key_fields, key))
+            params.extend(values)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+        return
+    for key, values in rows.items():
+        key = key if isinstance(key, tuple) else (key,)
+        obj, _ = model.objects.get_or_create(**{field.attname: value for field, value in zip(key_fields, key)})
+        model.objects.filter(pk=obj.pk).update(**{
+            name: F(name) + value for name, value in zip(FIELDS, values)
+        })
+
+
+def apply(hourly, daily):
+    # 座位刪除時預約跟著 CASCADE 刪除，也會送出事件；外鍵是延遲檢查，先去掉已不存在的座位
+    if daily:
+        seat_ids = set(Seat.objects.filter(pk__in={seat_id for seat_id, _ in daily}).values_list('pk', flat=True))
+        daily = {key: values for key, values in daily.items() if key[0] in seat_ids}
+    with writes.serialized(), transaction.atomic():
+        _upsert(SlotUsageHourly, ['hour'], hourly)
+        _upsert(SeatUsageDaily, ['seat', 'day'], daily)
+
+
+def reservation_changed(old, new):
+    """預約變更後呼叫 (signals.py)；old/new 為 (seat_id, start, end, status) 或 None。commit 後才寫入。"""
+    hourly, daily = delta(old, new)
+    if not (hourly or daily):
+        return
+
+    def run():
+        try:
+            apply(hourly, daily)
+        except Exception as e:
+            print(f"Error updating usage rollups: {e}")
+
+    transaction.on_commit(run)
+
+
+def first_day():
+    """最早一筆預約 (含封存表) 的日期，沒有預約回傳 None。"""
+    days = [
+        model.objects.aggregate(first=Min('start_time'))['first']
+        for model in (Reservation, ArchivedReservation)
+    ]
+    days = [_local(day).date() for day in days if day]
+    return min(days) if days else None
+
+
+def rebuild(since, until, batch_size=2000, log=None):
+    """
+    重建 [since, until) 這幾天 (本地日期) 的彙總，回傳讀過的預約筆數。
+    每天一個交易：讀取與寫入之間不會有其他寫入插進來，之後的事件照常增量累加。
+    """
+    total = 0
+    day = since
+    while day < until:
+        lo, hi = _day_start(day), _day_start(day + timedelta(days=1))
+        hourly, daily = _counts(), _counts()
+        count = 0
+        with writes.serialized(), transaction.atomic():
+            for model in (Reservation, ArchivedReservation):
+                rows = model.objects.filter(start_time__lt=hi, end_time__gt=lo).values_list(
+                    'seat_id', 'start_time', 'end_time', 'status',
+                )
+                for row in rows.iterator(chunk_size=batch_size):
+                    row_hourly, row_daily = contribution(*row, lo=lo, hi=hi)
+                    _merge(hourly, row_hourly)
+                    _merge(daily, row_daily)
+                    count += 1
+            SlotUsageHourly.objects.filter(hour__gte=lo, hour__lt=hi).delete()
+            SeatUsageDaily.objects.filter(day=day).delete()
+            SlotUsageHourly.objects.bulk_create([
+                SlotUsageHourly(hour=hour, **dict(zip(FIELDS, values)))
+                for hour, values in hourly.items() if any(values)
+            ], batch_size=500)
+            SeatUsageDaily.objects.bulk_create([
+                SeatUsageDaily(seat_id=seat_id, day=key, **dict(zip(FIELDS, values)))
+                for (seat_id, key), values in daily.items() if any(values)
+            ], batch_size=500)
+        if log and count:
+            log(f"{day.isoformat()}: {count} reservations")
+        total += count
+        day += timedelta(days=1)
+    return total
+
+
+def _open_minutes(since, until):
+    """[since, until) 期間單一座位的開館分鐘數：({日期: 分鐘}, {一天中的第幾點: 分鐘})。"""
+    by_day, by_hour = {}, defaultdict(int)
+    day = since
+    while day < until:
+        opening = slots.opening_minutes(day)
+        if opening is not None:
+            open_min, close_min = opening
+            by_day[day] = close_min - open_min
+            for hour in range(open_min // 60, (close_min + 59) // 60):
+                by_hour[hour] += min(close_min, hour * 60 + 60) - max(open_min, hour * 60)
+        day += timedelta(days=1)
+    return by_day, by_hour
+
+
+def _rate(used, available):
+    return round(100 * used / available, 1) if available else 0.0
+
+
+def summary(since, until):
+    """
+    [since, until) 期間的使用率統計，只讀彙總表：
+    totals、by_day (每天)、by_hour (一天中的每個整點，所有座位合計)、by_seat (每個座位)。
+    使用率 = 預約分鐘數 / 開館分鐘數。
+    """
+    seats = layout.get_seats()
+    open_by_day, open_by_hour = _open_minutes(since, until)
+    open_minutes = sum(open_by_day.values())
+
+    # 時段表每天只有十幾列，整段期間讀回來在 Python 依日期與整點分組
+    by_date, by_clock = _counts(), _counts()
+    rows = SlotUsageHourly.objects.filter(
+        hour__gte=_day_start(since), hour__lt=_day_start(until),
+    ).values_list('hour', *FIELDS)
+    tz = timezone.get_current_timezone() if settings.USE_TZ else None
+    for hour, *values in rows:
+        hour = hour.astimezone(tz) if tz else hour
+        _add(by_date, hour.date(), values)
+        _add(by_clock, hour.hour, values)
+
+    by_day = []
+    for day in sorted(by_date):
+        by_day.append({
+            'day': day,
+            **dict(zip(FIELDS, by_date[day])),
+            'utilization': _rate(by_date[day][0], open_by_day.get(day, 0) * len(seats)),
+        })
+
+    by_hour = []
+    for hour in sorted(set(open_by_hour) | set(by_clock)):
+        values = by_clock.get(hour, [0, 0, 0])
+        by_hour.append({
+            'hour': f"{hour:02}:00",
+            **dict(zip(FIELDS, values)),
+            'utilization': _rate(values[0], open_by_hour.get(hour, 0) * len(seats)),
+        })
+
+    used_by_seat = {
+        row['seat_id']: row
+        for row in SeatUsageDaily.objects.filter(day__gte=since, day__lt=until)
+        .values('seat_id').annotate(**{name: Sum(name) for name in FIELDS})
+    }
+    by_seat = []
+    for seat in seats:
+        row = used_by_seat.get(seat.id, {name: 0 for name in FIELDS})
+        by_seat.append({
+            'seat': layout.seat_label(seat),
+            **{name: row[name] for name in FIELDS},
+            'utilization': _rate(row['booked_minutes'], open_minutes),
+        })
+    by_seat.sort(key=lambda row: -row['booked_minutes'])
+
+    totals = {name: sum(row[name] for row in by_day) for name in FIELDS}
+    totals['utilization'] = _rate(totals['booked_minutes'], open_minutes * len(seats))
+    totals['cancel_rate'] = _rate(totals['cancellations'], totals['bookings'] + totals['cancellations'])
+    return {'totals': totals, 'by_day': by_day, 'by_hour': by_hour, 'by_seat': by_seat}
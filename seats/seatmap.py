@@ -0,0 +1,81 @@
+# seats/seatmap.py
+"""
+座位圖的繪製資料，給 welcome / seat_map / res_time 三個頁面與座位狀態 API 共用。
+
+原本模板對每個座位做 `{% if seat.id in reserved_seat_ids %}` (res_time 再多一層
+user_reserved_seat_ids)，而且為了分橫/直兩組把全部座位走兩遍。現在由 view 一次走完座位、
+用 set 查出狀態，產生 SeatRender 序列交給 {% seat_map %} 元件 (templatetags/seatmap.py) 輸出。
+
+座位名稱跳脫、座標這些不會變的部分依 SEAT_LAYOUT 版本、每間閱覽室各自快取
+(layout.get_seats(room) 在版本不變時回傳同一個 tuple)，每次請求只需決定狀態。
+"""
+import threading
+from collections import namedtuple
+
+from django.utils.html import escape
+
+from . import layout
+
+AVAILABLE = 'available'
+RESERVED = 'reserved'
+MINE = 'mine'  # 目前使用者自己在該時段的預約
+
+# orient：'w' 橫向座位 (名稱 P 開頭)、'h' 直向座位，決定按鈕的長寬
+SeatRender = namedtuple('SeatRender', 'id name x y state orient')
+
+# 按鈕的 (寬, 高) px，與 res_timestyle.css / welcomestyle.css 的 .seat-w / .seat-h 相同
+SEAT_SIZE = {'w': (43, 33), 'h': (33, 43)}
+
+_lock = threading.Lock()
+# room_id (None 為全部) -> (layout 的 seats tuple, [(可預約, 已預約, 自己的) 三種 SeatRender, ...], {seat_id: 靜態 HTML 片段})
+_cached = {}
+
+
+def orientation(name):
+    return 'w' if name[:1] == 'P' else 'h'
+
+
+def _static_parts(room=None):
+    room_id = room if room is None or isinstance(room, int) else room.pk
+    seats = layout.get_seats(room_id)
+    cached = _cached.get(room_id)
+    if cached is not None and cached[0] is seats:
+        return cached
+    base, html = [], {}
+    for seat in seats:
+        name = escape(seat.name)
+        orient = orientation(seat.name)
+        # 狀態只有三種，事先把三個 record 都建好，每次請求只需挑一個
+        base.append(tuple(
+            SeatRender(seat.id, seat.name, seat.x, seat.y, state, orient) for state in (AVAILABLE, RESERVED, MINE)
+        ))
+        html[seat.id] = (
+            f' style="left: {seat.x}px; top: {seat.y}px;" data-seat-id="{seat.id}" data-seat-name="{name}"',
+            name,
+        )
+    cached = (seats, base, html)
+    with _lock:
+        _cached[room_id] = cached
+    return cached
+
+
+def records(reserved_seat_ids=(), user_seat_ids=(), room=None):
+    """依座位順序回傳 room (None 為全部) 座位的 SeatRender 串列，state 為 AVAILABLE / RESERVED / MINE。"""
+    reserved = reserved_seat_ids if isinstance(reserved_seat_ids, (set, frozenset)) else set(reserved_seat_ids)
+    mine = user_seat_ids if isinstance(user_seat_ids, (set, frozenset)) else set(user_seat_ids)
+    result = []
+    for available, taken, own in _static_parts(room)[1]:
+        seat_id = available.id
+        result.append(own if seat_id in mine else taken if seat_id in reserved else available)
+    return result
+
+
+def fragments(room=None):
+    """{seat_id: (按鈕的 style/data-* 屬性 HTML, 跳脫後的名稱)}，給 {% seat_map %} 用。"""
+    return _static_parts(room)[2]
+
+
+def reset():
+    """清空程序內快取 (測試用)。"""
+    with _lock:
+        _cached.clear()
@@ -0,0 +1,77 @@
+# seats/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import layout, live, occupancy, rollups, snapshot, waitlist
+from .models import Branch, Reservation, Room, Seat
+
+
+@receiver(post_init, sender=Reservation)
+def remember_reservation_origin(sender, instance, **kwargs):
+    # 記下載入時的座位/時段，修改時才知道舊的時段也要更新 (只讀 __dict__，不觸發延遲載入)
+    values = instance.__dict__
+    instance._occupancy_origin = (values.get('seat_id'), values.get('start_time'), values.get('end_time'))
+    instance._status_origin = values.get('status')
+
+
+def _now_changed(room_ids):
+    for room_id in room_ids:
+        snapshot.invalidate(room_id)
+    live.feed.notify_changed()
+
+
+def _notify_now_changed(*changes):
+    # 只有影響到「現在」的變更才需要讓快照失效並推播；未來時段由快照的分鐘 bucket 與 feed 的計時器處理。
+    # changes 為 (seat_id, start, end)，只讓這些座位所在閱覽室的快照失效
+    now = timezone.now()
+    room_ids = set()
+    for seat_id, start, end in changes:
+        if start and end and start <= now < end:
+            seat = layout.get_seat(seat_id)
+            room_ids.add(seat.room_id if seat is not None else None)
+    if room_ids:
+        transaction.on_commit(lambda: _now_changed(room_ids))
+
+
+@receiver(post_save, sender=Reservation)
+def reservation_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_occupancy_origin', None)
+    if previous is not None and None in previous:
+        previous = None
+    occupancy.reservation_changed(instance, created=created, previous=previous)
+    _notify_now_changed((instance.seat_id, instance.start_time, instance.end_time), previous or (None, None, None))
+    # 使用量彙總：累加新舊狀態的差 (原本的狀態不明時無法算差，留給 rollup_usage 重建)
+    current = (instance.seat_id, instance.start_time, instance.end_time, instance.status)
+    if created:
+        rollups.reservation_changed(None, current)
+    elif previous is not None:
+        rollups.reservation_changed((*previous, getattr(instance, '_status_origin', None)), current)
+    # 原本是 reserved 的預約被取消或換了座位/時段：原來的時段空出來，交給候補名單
+    if previous is not None and getattr(instance, '_status_origin', None) == 'reserved':
+        if instance.status != 'reserved' or previous != (instance.seat_id, instance.start_time, instance.end_time):
+            waitlist.seat_released(*previous)
+    instance._occupancy_origin = (instance.seat_id, instance.start_time, instance.end_time)
+    instance._status_origin = instance.status
+
+
+@receiver(post_delete, sender=Reservation)
+def reservation_deleted(sender, instance, **kwargs):
+    occupancy.reservation_changed(instance)
+    _notify_now_changed((instance.seat_id, instance.start_time, instance.end_time))
+    rollups.reservation_changed((instance.seat_id, instance.start_time, instance.end_time, instance.status), None)
+    if instance.status == 'reserved':
+        waitlist.seat_released(instance.seat_id, instance.start_time, instance.end_time)
+
+
+@receiver(post_save, sender=Seat)
+@receiver(post_delete, sender=Seat)
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+@receiver(post_save, sender=Branch)
+@receiver(post_delete, sender=Branch)
+def seat_layout_changed(sender, **kwargs):
+    layout.bump()
@@ -0,0 +1,184 @@
+# seats/slots.py
+"""
+預約時段表 (slot calendar)。
+
+開館時間 (可依星期幾不同)、休館日與時段長度都在 settings 的 BOOKING_* 設定：
+
+    BOOKING_HOURS = {'default': ('08:00', '24:00'), 6: ('10:00', '18:00')}
+    BOOKING_CLOSED_DATES = ['2025-10-10']
+    BOOKING_SLOT_MINUTES = 30
+
+每一天的時段表 (DaySlots) 在程序內第一次用到時建立，之後日期/時間選單、make_reservation
+的檢查與 occupancy 的點陣格線都讀同一份。時段改成 30 分鐘只需改設定，每次請求的工作量不變。
+"""
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+DAY_MINUTES = 24 * 60
+
+
+class SlotError(ValueError):
+    """日期或時間不合法，訊息可直接顯示給使用者。"""
+
+
+def _minutes(label):
+    """'08:30' -> 510；'24:00' 表示午夜。格式不對丟出 ValueError。"""
+    hours, _, minutes = (label or '').partition(':')
+    if not (hours.isdigit() and minutes.isdigit() and len(minutes) == 2 and len(hours) <= 2):
+        raise ValueError(label)
+    value = int(hours) * 60 + int(minutes)
+    if int(minutes) >= 60 or value > DAY_MINUTES:
+        raise ValueError(label)
+    return value
+
+
+def _label(minutes):
+    return f"{minutes // 60:02}:{minutes % 60:02}"
+
+
+def _at(day, minutes):
+    dt = datetime.combine(day, time()) + timedelta(minutes=minutes)
+    if settings.USE_TZ:
+        dt = timezone.make_aware(dt, timezone.get_current_timezone())
+    return dt
+
+
+class DaySlots:
+    """某一天的時段格線。times/labels 包含閉館的那個格線點；休館日兩者皆為空。"""
+    __slots__ = ('day', 'slot', 'times', 'labels', '_index')
+
+    def __init__(self, day, slot_minutes, minutes):
+        self.day = day
+        self.slot = timedelta(minutes=slot_minutes)
+        self.times = tuple(_at(day, m) for m in minutes)
+        self.labels = tuple(_label(m) for m in minutes)
+        self._index = {label: i for i, label in enumerate(self.labels)}
+
+    @property
+    def is_open(self):
+        return len(self.times) > 1
+
+    @property
+    def open_dt(self):
+        return self.times[0] if self.is_open else None
+
+    @property
+    def close_dt(self):
+        return self.times[-1] if self.is_open else None
+
+    @property
+    def starts(self):
+        """可選的開始時間 ('HH:MM')。"""
+        return self.labels[:-1]
+
+    @property
+    def ends(self):
+        """可選的結束時間 ('HH:MM')，最後一個是閉館時間。"""
+        return self.labels[1:]
+
+    def at(self, label):
+        """'HH:MM' -> 當天的 datetime，格式不對丟出 ValueError。"""
+        i = self._index.get(label)
+        if i is not None:
+            return self.times[i]
+        return _at(self.day, _minutes(label))
+
+    def on_grid(self, label):
+        return label in self._index
+
+
+def _config():
+    return (
+        settings.BOOKING_HOURS,
+        frozenset(settings.BOOKING_CLOSED_DATES),
+        settings.BOOKING_SLOT_MINUTES,
+    )
+
+
+def opening_minutes(day):
+    """該日開館/閉館是一天中的第幾分鐘 (open, close)，休館日回傳 None。不建立 DaySlots，給統計報表逐日計算用。"""
+    hours, closed_dates, _ = _config()
+    opening = None if day.isoformat() in closed_dates else hours.get(day.weekday(), hours.get('default'))
+    if opening is None:
+        return None
+    return _minutes(opening[0]), _minutes(opening[1])
+
+
+@lru_cache(maxsize=64)
+def get_day(day):
+    """該日的 DaySlots (每個程序每天只算一次)。"""
+    slot_minutes = settings.BOOKING_SLOT_MINUTES
+    opening = opening_minutes(day)
+    if opening is None:
+        return DaySlots(day, slot_minutes, ())
+    open_min, close_min = opening
+    return DaySlots(day, slot_minutes, range(open_min, close_min + 1, slot_minutes))
+
+
+@lru_cache(maxsize=4)
+def _date_options(today):
+    days = (today + timedelta(days=i) for i in range(settings.BOOKING_DAYS_AHEAD))
+    return tuple(day.isoformat() for day in days if get_day(day).is_open)
+
+
+def date_options(today=None):
+    """日期選單：今天起 BOOKING_DAYS_AHEAD 天內的開館日 (ISO 字串)。"""
+    return _date_options(today or timezone.localdate())
+
+
+@lru_cache(maxsize=4)
+def _label_tables(today):
+    return {day: get_day(date.fromisoformat(day)).labels for day in _date_options(today)}
+
+
+def label_tables(today=None):
+    """{日期: 該日所有格線點 ('HH:MM')}，給預約頁在換日期時更新時間選單。"""
+    return _label_tables(today or timezone.localdate())
+
+
+def max_slots(day_slots=None):
+    """預約頁結束時間選單最多列幾個時段。"""
+    slot = day_slots.slot if day_slots else timedelta(minutes=settings.BOOKING_SLOT_MINUTES)
+    return max(1, timedelta(minutes=settings.BOOKING_MAX_MINUTES) // slot)
+
+
+def window(date_str, start_str, end_str=None, aligned=True):
+    """
+    解析使用者送來的日期與起訖時間，回傳 (DaySlots, start, end)。
+    end_str 為空時查詢單一時間點 [start, start + 1µs)。
+    aligned=True (預約用) 時起訖都必須落在時段格線上。不合法時丟出 SlotError。
+    """
+    try:
+        day = datetime.strptime(date_str or '', '%Y-%m-%d').date()
+        day_slots = get_day(day)
+        start = day_slots.at(start_str)
+        end = day_slots.at(end_str) if end_str else start + timedelta(microseconds=1)
+    except ValueError:
+        raise SlotError("日期或時間格式無效。")
+    if not day_slots.is_open:
+        raise SlotError("該日休館，無法預約。")
+    if start >= end:
+        raise SlotError("開始時間必須早於結束時間。")
+    if start < day_slots.open_dt or end > day_slots.close_dt:
+        raise SlotError("時間不在開放時段內。")
+    if aligned and not (day_slots.on_grid(start_str) and (not end_str or day_slots.on_grid(end_str))):
+        raise SlotError(f"預約時間必須以 {day_slots.slot.seconds // 60} 分鐘為單位。")
+    return day_slots, start, end
+
+
+def reset():
+    """清空程序內的時段表 (測試或改設定時用)。"""
+    get_day.cache_clear()
+    _date_options.cache_clear()
+    _label_tables.cache_clear()
+
+
+@receiver(setting_changed)
+def _settings_changed(setting, **kwargs):
+    if setting.startswith('BOOKING_') or setting in ('TIME_ZONE', 'USE_TZ'):
+        reset()
@@ -0,0 +1,77 @@
+# seats/snapshot.py
+"""
+「目前使用中座位」快照，給流量最大的 welcome 頁使用。
+
+快照以分鐘為單位 (bucket)，放在共享 cache 裡，每個 bucket 全部 worker 合計只計算一次
+(用 cache.add 當作計算鎖，其他 worker 短暫等待結果)；各程序再把最近一次的結果留在記憶體，
+同一分鐘內的請求只需比對版本號。快照與版本號都以閱覽室為單位：影響「現在」的預約建立/取消
+只 bump 該座位所在閱覽室 (與不分閱覽室) 的 OCCUPIED_NOW 版本，那間的快照立即失效，
+其他閱覽室的快照不受影響。
+"""
+import threading
+import time
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import occupancy, versions
+
+BUCKET_SECONDS = 60
+LOCK_SECONDS = 5
+WAIT_SECONDS = 0.5
+
+_lock = threading.Lock()
+_memo = {}  # room_id -> (bucket, version, frozenset)；room_id 為 None 表示不分閱覽室
+
+
+def _version_name(room_id):
+    return f'{versions.OCCUPIED_NOW}:{"all" if room_id is None else room_id}'
+
+
+def invalidate(room_id):
+    """room_id 這間閱覽室「現在」的佔用改變了 (signals.py)：讓這間與不分閱覽室的快照失效。"""
+    if room_id is not None:
+        versions.bump_version(_version_name(room_id))
+    versions.bump_version(_version_name(None))
+
+
+def _compute_once(key, now, room):
+    lock_key = key + ':lock'
+    if cache.add(lock_key, 1, LOCK_SECONDS):
+        seat_ids = sorted(occupancy.occupied_now(now, room))
+        cache.set(key, seat_ids, BUCKET_SECONDS * 2)
+        return seat_ids
+    # 其他 worker 正在計算同一個 bucket，等它的結果
+    deadline = time.monotonic() + WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(0.01)
+        seat_ids = cache.get(key)
+        if seat_ids is not None:
+            return seat_ids
+    return sorted(occupancy.occupied_now(now, room))
+
+
+def occupied_now(now=None, room=None):
+    """room 目前使用中的座位 id (frozenset)，最多落後一個 bucket，預約異動會立即反映。"""
+    now = now or timezone.now()
+    room_id = room.pk if room is not None else None
+    bucket = int(now.timestamp()) // BUCKET_SECONDS
+    version = versions.get_version(_version_name(room_id))
+    memo = _memo.get(room_id)
+    if memo is not None and memo[0] == bucket and memo[1] == version:
+        return memo[2]
+
+    key = f'seats:occupied-now:{"all" if room_id is None else room_id}:{bucket}:{version}'
+    seat_ids = cache.get(key)
+    if seat_ids is None:
+        seat_ids = _compute_once(key, now, room)
+    result = frozenset(seat_ids)
+    with _lock:
+        _memo[room_id] = (bucket, version, result)
+    return result
+
+
+def reset():
+    """清空程序內快照 (測試用)。"""
+    with _lock:
+        _memo.clear()
@@ -0,0 +1,180 @@
+# seats/spatial.py
+"""
+座位的空間索引 (Seat.x / Seat.y 是座位圖上的 px 座標)。
+
+座位放進均勻網格，每格邊長為 GROUP_BOOKING_ADJACENT_PX，找某一點附近的座位只需看周圍幾格。
+座標只在同一間閱覽室的座位圖內有意義，所以每間閱覽室各有一個索引。
+每個座位「依距離排序的鄰居清單」在座位配置不變時只算一次 (跟 seatmap 一樣以
+layout.get_seats(room) 回傳的 tuple 判斷是否過期)，查詢時只需配合可用座位的 set 挑選，
+1,000 個座位的樓層也能在幾毫秒內找到一組相鄰空位。
+推薦替代座位 (nearest_available) 則從指定點所在的格子一圈一圈往外找，
+湊滿 k 個、且外圈不可能更近時就停，不必掃過所有座位。
+
+    seats = spatial.find_cluster(4, available_ids, room)
+    found = spatial.nearest_available(x, y, 3, available_ids, room=room)
+"""
+import heapq
+import math
+import threading
+
+from django.conf import settings
+
+from . import layout
+
+# 鄰居清單的搜尋半徑 (以相鄰距離為單位)：最大的團體也排得進這個範圍
+NEIGHBOUR_REACH = 3
+
+_lock = threading.Lock()
+_cached = {}  # room_id (None 為全部) -> (layout 的 seats tuple, SeatIndex)
+
+
+def adjacent_distance():
+    """兩個座位中心距離在這之內就算相鄰 (px)。"""
+    return settings.GROUP_BOOKING_ADJACENT_PX
+
+
+def max_group_size():
+    return settings.GROUP_BOOKING_MAX_SIZE
+
+
+class SeatIndex:
+    """均勻網格：(格 x, 格 y) -> 該格的座位，另存每個座位依距離排序的鄰居。"""
+
+    def __init__(self, seats, cell):
+        self.seats = seats
+        self.cell = cell
+        self.cells = {}  # 存成 (x, y, id, seat)，內層迴圈不必再讀 model 屬性
+        for seat in seats:
+            self.cells.setdefault(self._key(seat.x, seat.y), []).append((seat.x, seat.y, seat.id, seat))
+        keys = self.cells.keys() or [(0, 0)]
+        # 格子的範圍，往外找時超出就停
+        self.bounds = (
+            min(gx for gx, _ in keys), min(gy for _, gy in keys),
+            max(gx for gx, _ in keys), max(gy for _, gy in keys),
+        )
+        limit = max_group_size() * 4
+        # seat_id -> [(距離, seat), ...]，不含自己
+        self.neighbours = {
+            seat.id: self.within(seat.x, seat.y, cell * NEIGHBOUR_REACH, exclude=seat.id)[:limit] for seat in seats
+        }
+
+    def _key(self, x, y):
+        return int(x // self.cell), int(y // self.cell)
+
+    def within(self, x, y, radius, exclude=None):
+        """與 (x, y) 距離不超過 radius 的座位 [(距離, seat), ...]，由近到遠 (同距離依 id)。"""
+        cx, cy = self._key(x, y)
+        reach = math.ceil(radius / self.cell)
+        limit = radius * radius
+        cells = self.cells
+        found = []
+        for gx in range(cx - reach, cx + reach + 1):
+            for gy in range(cy - reach, cy + reach + 1):
+                for sx, sy, seat_id, seat in cells.get((gx, gy), ()):
+                    dx, dy = sx - x, sy - y
+                    squared = dx * dx + dy * dy
+                    if squared <= limit and seat_id != exclude:
+                        found.append((squared, seat_id, seat))
+        found.sort()
+        return [(math.sqrt(squared), seat) for squared, _, seat in found]
+
+    def _ring(self, cx, cy, r):
+        """以 (cx, cy) 為中心、第 r 圈的格子。"""
+        if r == 0:
+            yield cx, cy
+            return
+        for gx in range(cx - r, cx + r + 1):
+            yield gx, cy - r
+            yield gx, cy + r
+        for gy in range(cy - r + 1, cy + r):
+            yield cx - r, gy
+            yield cx + r, gy
+
+    def nearest(self, x, y, k, available_ids, exclude=None):
+        """離 (x, y) 最近、id 在 available_ids 內的 k 個座位 [(距離, seat), ...]，由近到遠 (同距離依 id)。"""
+        if k < 1:
+            return []
+        if not (math.isfinite(x) and math.isfinite(y)):
+            raise ValueError("座標必須是有限的數值。")
+        cx, cy = self._key(x, y)
+        min_x, min_y, max_x, max_y = self.bounds
+        cells = self.cells
+        if not (min_x <= cx <= max_x and min_y <= cy <= max_y):
+            # 點在座位圖範圍外：一圈圈往外要先走過大量空白格子 (離得越遠越多)，直接逐一比對所有座位
+            found = []
+            for bucket in cells.values():
+                for sx, sy, seat_id, seat in bucket:
+                    if seat_id in available_ids and seat_id != exclude:
+                        dx, dy = sx - x, sy - y
+                        found.append((dx * dx + dy * dy, seat_id, seat))
+            return [(math.sqrt(squared), seat) for squared, _, seat in heapq.nsmallest(k, found)]
+        # 最多要走到涵蓋所有格子的那一圈
+        last = max(cx - min_x, max_x - cx, cy - min_y, max_y - cy, 0)
+        found = []
+        for r in range(last + 1):
+            for key in self._ring(cx, cy, r):
+                for sx, sy, seat_id, seat in cells.get(key, ()):
+                    if seat_id in available_ids and seat_id != exclude:
+                        dx, dy = sx - x, sy - y
+                        found.append((dx * dx + dy * dy, seat_id, seat))
+            if len(found) >= k:
+                # 第 r+1 圈的座位離 (x, y) 至少 r 格遠；第 k 近的已經比這更近就不必再找
+                found.sort()
+                reach = r * self.cell
+                if found[k - 1][0] <= reach * reach:
+                    break
+        found.sort()
+        return [(math.sqrt(squared), seat) for squared, _, seat in found[:k]]
+
+
+def get_index(room=None):
+    room_id = room if room is None or isinstance(room, int) else room.pk
+    seats = layout.get_seats(room_id)
+    cached = _cached.get(room_id)
+    if cached is not None and cached[0] is seats:
+        return cached[1]
+    index = SeatIndex(seats, adjacent_distance())
+    with _lock:
+        _cached[room_id] = (seats, index)
+    return index
+
+
+def find_cluster(size, available_ids, room=None):
+    """
+    從 available_ids 中找 size 個彼此相連 (每個座位至少與另一個選中的座位相鄰) 的座位，
+    以「各座位到起點的距離總和」最小者為最佳。找不到回傳空串列；結果依離起點的距離排序。
+    """
+    if size < 1:
+        return []
+    index = get_index(room)
+    link = adjacent_distance()
+    best, best_cost = [], math.inf
+    for seed in index.seats:
+        if seed.id not in available_ids:
+            continue
+        chosen, cost = [seed], 0.0
+        for distance, seat in index.neighbours[seed.id]:
+            if len(chosen) == size:
+                break
+            # 鄰居由近到遠，剩下的每一個至少這麼遠，已不可能勝過目前最佳
+            if cost + distance * (size - len(chosen)) >= best_cost:
+                break
+            if seat.id not in available_ids:
+                continue
+            if any(math.hypot(seat.x - c.x, seat.y - c.y) <= link for c in chosen):
+                chosen.append(seat)
+                cost += distance
+        if len(chosen) == size and cost < best_cost:
+            best, best_cost = chosen, cost
+    return best
+
+
+def nearest_available(x, y, k, available_ids, exclude=None, room=None):
+    """推薦替代座位：room 座位圖上離 (x, y) 最近的 k 個可用座位 [(距離, seat), ...]。"""
+    return get_index(room).nearest(x, y, k, available_ids, exclude=exclude)
+
+
+def reset():
+    """清空程序內快取 (測試用)。"""
+    with _lock:
+        _cached.clear()
@@ -0,0 +1,56 @@
+// base.js - seats/base.html 共用：側邊選單開關、toast 訊息
+(function () {
+    function showToast(text, tags, delay) {
+        const container = document.getElementById('toast-container');
+        if (!container) return;
+        tags = tags || '';
+        let toastClass = 'toast-info';
+        if (tags.includes('success')) toastClass = 'toast-success';
+        else if (tags.includes('error') || tags.includes('danger')) toastClass = 'toast-danger';
+        else if (tags.includes('warning')) toastClass = 'toast-warning';
+
+        const toast = document.createElement('div');
+        toast.className = 'custom-toast ' + toastClass;
+        toast.textContent = text;
+        container.appendChild(toast);
+        setTimeout(function () {
+            toast.classList.add('fade-out');
+            setTimeout(function () { toast.remove(); }, 500);
+        }, delay || 3000);
+    }
+    window.showToast = showToast;
+
+    document.addEventListener('DOMContentLoaded', function () {
+        const menuToggleButton = document.getElementById('menu-toggle-btn');
+        const sideMenu = document.getElementById('side-menu');
+        const closeMenuButton = document.getElementById('close-menu-btn');
+        const bodyElement = document.body;
+        if (!menuToggleButton || !sideMenu || !closeMenuButton) return;
+
+        function openMenu() {
+            sideMenu.classList.add('open');
+            bodyElement.classList.add('menu-open');
+        }
+        function closeMenu() {
+            sideMenu.classList.remove('open');
+            bodyElement.classList.remove('menu-open');
+        }
+
+        menuToggleButton.addEventListener('click', function (event) {
+            if (sideMenu.classList.contains('open')) { closeMenu(); } else { openMenu(); }
+            event.stopPropagation();
+        });
+        closeMenuButton.addEventListener('click', function (event) {
+            closeMenu();
+            event.stopPropagation();
+        });
+        // 點選單外面就收起來
+        document.addEventListener('click', function (event) {
+            const toggleContainer = document.querySelector('.choc-menu-toggle-btn-container');
+            const isClickToggle = toggleContainer && toggleContainer.contains(event.target);
+            if (!sideMenu.contains(event.target) && !isClickToggle && sideMenu.classList.contains('open')) {
+                closeMenu();
+            }
+        });
+    });
+})();
@@ -0,0 +1,37 @@
+from django import template
+from django.forms.utils import flatatt
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from .. import assets
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(name, alt='', sizes=None, **attrs):
+    """
+    <picture>：有 build_assets 產生的 AVIF/WebP 就列成 <source srcset>，瀏覽器挑支援的格式與寬度；
+    <img> 一律保留原圖當 fallback。sizes 預設為最小的縮圖寬度 (也就是實際顯示寬度)。
+
+        {% picture 'S__25559045.png' alt='Logo' style='width: 100px;' %}
+    """
+    variants = assets.available_variants(name)
+    if variants and sizes is None:
+        sizes = f"{min(assets.variant_spec(name)['widths'])}px"
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (assets.MIME_TYPES[fmt], ', '.join(f"{static(path)} {width}w" for path, width in entries), sizes)
+            for fmt, entries in variants
+        ),
+    )
+    attrs.setdefault('decoding', 'async')
+    return format_html('<picture>{}<img src="{}" alt="{}"{}></picture>', sources, static(name), alt, flatatt(attrs))
+
+
+@register.simple_tag
+def icon_static(name, size):
+    """favicon 用的小 PNG；沒產生過就回傳原圖。"""
+    path = assets.variant_name(name, size, 'png')
+    return static(path if assets.exists(path) else name)
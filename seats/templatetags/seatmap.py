@@ -0,0 +1,67 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from .. import seatmap
+
+register = template.Library()
+
+# 各頁面的按鈕外觀：state -> (class, title, 額外屬性)；title 裡的 {name} 代入座位名稱。
+# 沒列出的狀態 (例如 welcome 不區分自己的預約) 當成 RESERVED。
+VARIANTS = {
+    # welcome：即時狀態，SSE 會切換 btn-success / btn-danger
+    'live': {
+        seatmap.AVAILABLE: ('btn-success', '狀態：可預約 - {name}', ''),
+        seatmap.RESERVED: ('btn-danger', '狀態：已預約 - {name}', ' disabled'),
+    },
+    # seat_map：查詢時間點，JSON API 會切換同樣的 class
+    'point': {
+        seatmap.AVAILABLE: ('btn-success', '可預約', ''),
+        seatmap.RESERVED: ('btn-danger', '已被預約', ' disabled'),
+    },
+    # res_time：選位，可點的座位才沒有 disabled
+    'pick': {
+        seatmap.AVAILABLE: ('btn-outline-primary', '點擊選擇 {name}', ' data-bs-toggle="tooltip"'),
+        seatmap.RESERVED: ('btn-danger seat-taken', '此座位已被預約', ' disabled data-bs-toggle="tooltip"'),
+        seatmap.MINE: ('btn-warning seat-mine', '您已預約此座位', ' disabled data-bs-toggle="tooltip"'),
+    },
+}
+
+
+# (variant, room_id) -> (seatmap.fragments() 的 dict, {SeatRender: 按鈕 HTML})；座位配置一變 dict 就換新的
+_rendered = {}
+
+
+def _button(record, part, styles):
+    attrs, name = part
+    css, title, extra = styles.get(record.state, styles[seatmap.RESERVED])
+    return (
+        f'<button type="button" class="seat-button seat-{record.orient} btn {css}"{attrs}'
+        f' title="{title.format(name=name)}"{extra}>{name}</button>'
+    )
+
+
+@register.simple_tag
+def seat_map(records, variant='live', room=None):
+    """
+    輸出座位按鈕 (records 為 seatmap.records() 的結果，room 與產生 records 時相同)。
+    座位多時模板迴圈是頁面最慢的部分，這裡每個 (座位, 狀態) 的按鈕 HTML 只組一次，之後直接重用。
+
+        {% load seatmap %}{% seat_map seats 'pick' room %}
+    """
+    styles = VARIANTS[variant]
+    room_id = room.pk if room is not None else None
+    html = seatmap.fragments(room_id)
+    memo = _rendered.get((variant, room_id))
+    if memo is None or memo[0] is not html:
+        memo = _rendered[(variant, room_id)] = (html, {})
+    cache = memo[1]
+    buttons = []
+    for record in records:
+        button = cache.get(record)
+        if button is None:
+            part = html.get(record.id)
+            if part is None:  # records 建立後座位配置剛好改了
+                continue
+            button = cache[record] = _button(record, part, styles)
+        buttons.append(button)
+    return mark_safe('\n'.join(buttons))
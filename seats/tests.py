@@ -1,3 +1,1579 @@
-from django.test import TestCase
+import asyncio
+import contextlib
+import gzip
+import io
+import json
+import math
+import random
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.template import engines
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from SeatBooking import metrics
+from mail.models import OutgoingEmail
+from . import archive, assets, booking, exports, floorplan, groups, layout, lifecycle, live, loadtest, occupancy, rollups, seatmap, slots, snapshot, spatial, versions, waitlist, writes
+from .models import GroupBooking, Room, Seat, Reservation, SeatUsageDaily, SlotUsageHourly, WaitlistEntry, DEFAULT_ROOM_SLUG
+
+
+def main_room():
+    """主閱覽室：migration 0011 建立，TransactionTestCase 清空資料表後由這裡補建。座位一律指定閱覽室。"""
+    room, _ = Room.objects.get_or_create(slug=DEFAULT_ROOM_SLUG, defaults={'name': "主閱覽室"})
+    return room
+
+
+def seed_reservations(seat_count=60, user_count=300, reservation_count=20000):
+    """建立一份足夠大的資料集，讓 SQLite 的查詢規劃器會真的選擇索引。"""
+    room = main_room()
+    seats = Seat.objects.bulk_create(
+        [Seat(room=room, name=f"S{i:03}", x=(i % 20) * 40, y=(i // 20) * 40) for i in range(seat_count)]
+    )
+    users = User.objects.bulk_create([User(username=f"u{i}") for i in range(user_count)])
+    rng = random.Random(42)
+    base = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=180)
+    reservations = []
+    for _ in range(reservation_count):
+        start = base + timedelta(days=rng.randrange(187), hours=rng.randrange(8, 22))
+        reservations.append(Reservation(
+            seat=rng.choice(seats),
+            user=rng.choice(users),
+            start_time=start,
+            end_time=start + timedelta(hours=rng.randrange(1, 3)),
+            status=rng.choice(['reserved', 'reserved', 'cancelled']),
+        ))
+    Reservation.objects.bulk_create(reservations, batch_size=2000)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+    return seats, users
+
+
+class ReservationQueryPlanTests(TestCase):
+    """對各個可用性/預約 view 實際送出的 Reservation 查詢跑 EXPLAIN QUERY PLAN，
+    任何一個退化成全表掃描就失敗。"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seats, cls.users = seed_reservations()
+        cls.user = User.objects.create_user(username="planner", password="pw-12345678", email="p@example.com")
+        cls.day = (timezone.localdate() + timedelta(days=1)).isoformat()
+
+    def setUp(self):
+        cache.clear()
+        occupancy.reset()
+        snapshot.reset()
+        self.client.force_login(self.user)
+
+    def assertNoReservationScan(self, queries):
+        table = Reservation._meta.db_table
+        checked = 0
+        for query in queries:
+            sql = query['sql']
+            # INSERT ... SELECT ... WHERE NOT EXISTS (預約寫入路徑) 的子查詢也要檢查
+            if not sql.startswith(('SELECT', 'INSERT')) or 'SELECT' not in sql or f'"{table}"' not in sql:
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                plan = [row[-1] for row in cursor.fetchall()]
+            checked += 1
+            for detail in plan:
+                self.assertFalse(
+                    detail.startswith(f"SCAN {table}"),
+                    f"全表掃描 {table}:\n{sql}\n" + "\n".join(plan),
+                )
+        self.assertGreater(checked, 0, "沒有擷取到任何 Reservation 查詢")
+
+    def capture(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data or {})
+        self.assertIn(response.status_code, (200, 302))
+        return ctx.captured_queries
+
+    def test_welcome(self):
+        self.assertNoReservationScan(self.capture('get', reverse('seats:welcome')))
+
+    def test_seat_map(self):
+        queries = self.capture('get', reverse('seats:seat_map'), {'date': self.day, 'time': '10:00'})
+        self.assertNoReservationScan(queries)
+
+    def test_res_time(self):
+        queries = self.capture('get', reverse('seats:res_time'), {
+            'date': self.day, 'start_time': '10:00', 'end_time': '12:00',
+        })
+        self.assertNoReservationScan(queries)
+
+    def test_make_reservation(self):
+        queries = self.capture('post', reverse('seats:make_reservation'), {
+            'seat_id': self.seats[0].id, 'date': self.day, 'start_time': '10:00', 'end_time': '12:00',
+        })
+        self.assertNoReservationScan(queries)
+
+    def test_reminds(self):
+        queries = self.capture('post', reverse('seats:reminds'), {
+            'seat': self.seats[0].id, 'reported_date': self.day, 'reported_time': '10:30', 'reason': '離位太久',
+        })
+        self.assertNoReservationScan(queries)
+
+
+class OccupancyTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seats, cls.users = seed_reservations(seat_count=30, user_count=50, reservation_count=3000)
+        cls.day = timezone.localdate() + timedelta(days=1)
+        open_dt, _ = occupancy.day_window(cls.day)
+        # 不在整點格線上的預約
+        Reservation.objects.create(
+            seat=cls.seats[0], user=cls.users[0],
+            start_time=open_dt + timedelta(hours=2, minutes=30),
+            end_time=open_dt + timedelta(hours=3, minutes=10),
+        )
+
+    def setUp(self):
+        cache.clear()
+        occupancy.reset()
+
+    def sql_reserved(self, start, end):
+        return set(Reservation.objects.filter(
+            status='reserved', start_time__lt=end, end_time__gt=start,
+        ).values_list('seat_id', flat=True))
+
+    def test_matches_sql(self):
+        open_dt, close_dt = occupancy.day_window(self.day)
+        for day_offset in range(-3, 4):
+            shift = timedelta(days=day_offset)
+            for lo in range(16):
+                for hi in range(lo + 1, 17):
+                    start, end = open_dt + shift + timedelta(hours=lo), open_dt + shift + timedelta(hours=hi)
+                    self.assertEqual(occupancy.reserved_seat_ids(start, end), self.sql_reserved(start, end))
+            point = open_dt + shift + timedelta(hours=2, minutes=45)
+            self.assertEqual(
+                occupancy.reserved_seat_ids(point, point + timedelta(minutes=1)),
+                self.sql_reserved(point, point + timedelta(minutes=1)),
+            )
+
+    def test_outside_grid_returns_none(self):
+        open_dt, close_dt = occupancy.day_window(self.day)
+        self.assertIsNone(occupancy.reserved_seat_ids(open_dt - timedelta(hours=1), open_dt))
+        self.assertIsNone(occupancy.reserved_seat_ids(close_dt - timedelta(hours=1), close_dt + timedelta(hours=1)))
+
+    def test_incremental_create_and_cancel(self):
+        open_dt, _ = occupancy.day_window(self.day + timedelta(days=1))
+        start, end = open_dt + timedelta(hours=12), open_dt + timedelta(hours=14)
+        seat = Seat.objects.create(room=main_room(), name="NEW", x=0, y=0)
+        self.assertNotIn(seat.id, occupancy.reserved_seat_ids(start, end))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reservation = Reservation.objects.create(seat=seat, user=self.users[0], start_time=start, end_time=end)
+        with self.assertNumQueries(0):
+            self.assertIn(seat.id, occupancy.reserved_seat_ids(start, end))
+            self.assertNotIn(seat.id, occupancy.reserved_seat_ids(end, end + timedelta(hours=1)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reservation.status = 'cancelled'
+            reservation.save()
+        with self.assertNumQueries(0):
+            self.assertNotIn(seat.id, occupancy.reserved_seat_ids(start, end))
+
+    def test_other_worker_write_forces_rebuild(self):
+        open_dt, _ = occupancy.day_window(self.day)
+        start, end = open_dt + timedelta(hours=1), open_dt + timedelta(hours=2)
+        occupancy.reserved_seat_ids(start, end)
+        seat = self.seats[1]
+        self.assertNotIn(seat.id, occupancy.reserved_seat_ids(start, end))
+        # 模擬另一個 worker：寫入資料庫並 bump 版本，但本程序的點陣沒有收到增量更新
+        Reservation.objects.filter(seat=seat, start_time__lt=end, end_time__gt=start).delete()
+        Reservation.objects.bulk_create([Reservation(seat=seat, user=self.users[0], start_time=start, end_time=end)])
+        versions.bump_version(f'occupancy:{seat.room_id}:{self.day.isoformat()}')
+        self.assertIn(seat.id, occupancy.reserved_seat_ids(start, end))
+
+
+class BookingConcurrencyTests(TransactionTestCase):
+    """數百個並行預約嘗試打在少數座位上，確認沒有任何重複預約。"""
+
+    THREADS = 32
+    ATTEMPTS_PER_THREAD = 12
+
+    def setUp(self):
+        cache.clear()
+        occupancy.reset()
+        self.seats = [Seat.objects.create(room=main_room(), name=f"C{i}", x=i * 40, y=0) for i in range(4)]
+        self.users = [User.objects.create(username=f"rush{i}") for i in range(60)]
+        open_dt, _ = occupancy.day_window(timezone.localdate() + timedelta(days=1))
+        self.open_dt = open_dt
+
+    def assertNoOverlaps(self, field):
+        reserved = Reservation.objects.filter(status='reserved').order_by(field, 'start_time')
+        previous = None
+        for res in reserved.values(field, 'start_time', 'end_time'):
+            if previous and previous[field] == res[field]:
+                self.assertLessEqual(previous['end_time'], res['start_time'], f"{field} 重複預約: {previous} / {res}")
+            previous = res
+
+    def test_parallel_bookings_never_double_book(self):
+        results = []
+        errors = []
+        barrier = threading.Barrier(self.THREADS)
+
+        def worker(index):
+            rng = random.Random(index)
+            try:
+                barrier.wait()
+                for _ in range(self.ATTEMPTS_PER_THREAD):
+                    start = self.open_dt + timedelta(hours=rng.randrange(6))
+                    end = start + timedelta(hours=rng.randrange(1, 3))
+                    result = booking.book_seat(rng.choice(self.users), rng.choice(self.seats), start, end)
+                    results.append(result.status)
+            except Exception as e:  # 任何例外都算失敗
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), self.THREADS * self.ATTEMPTS_PER_THREAD)
+        self.assertEqual(results.count(booking.BOOKED), Reservation.objects.filter(status='reserved').count())
+        self.assertGreater(results.count(booking.SEAT_TAKEN), 0)
+        self.assertNoOverlaps('seat_id')
+        self.assertNoOverlaps('user_id')
+
+    def test_result_statuses(self):
+        start, end = self.open_dt, self.open_dt + timedelta(hours=2)
+        first = booking.book_seat(self.users[0], self.seats[0], start, end)
+        self.assertTrue(first.ok)
+        self.assertEqual(first.reservation.seat, self.seats[0])
+        # 手動 INSERT 的物件也要是「已存檔」狀態，再 save() 是 UPDATE 而不是新增一筆
+        self.assertFalse(first.reservation._state.adding)
+        self.assertEqual(first.reservation._state.db, 'default')
+        first.reservation.save(update_fields=['status'])
+        self.assertEqual(Reservation.objects.count(), 1)
+        self.assertEqual(booking.book_seat(self.users[1], self.seats[0], start, end).status, booking.SEAT_TAKEN)
+        self.assertEqual(booking.book_seat(self.users[0], self.seats[1], start, end).status, booking.USER_BUSY)
+        # 相鄰但不重疊的時段可以預約，且點陣同步更新
+        self.assertTrue(booking.book_seat(self.users[1], self.seats[0], end, end + timedelta(hours=1)).ok)
+        self.assertEqual(occupancy.reserved_seat_ids(start, end + timedelta(hours=1)), {self.seats[0].id})
+
+
+class AvailabilityApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="viewer", password="pw-12345678")
+        cls.seats = [Seat.objects.create(room=main_room(), name=f"A{i}", x=i * 40, y=10) for i in range(3)]
+        cls.day = timezone.localdate() + timedelta(days=1)
+
+    def setUp(self):
+        cache.clear()
+        occupancy.reset()
+        self.client.force_login(self.user)
+        self.url = reverse('seats:availability_api')
+        self.params = {'date': self.day.isoformat(), 'start_time': '10:00', 'end_time': '12:00'}
+
+    def book(self, seat, start_hour, end_hour):
+        open_dt, _ = occupancy.day_window(self.day)
+        with self.captureOnCommitCallbacks(execute=True):
+            return booking.book_seat(
+                self.user, seat,
+                open_dt + timedelta(hours=start_hour - open_dt.hour),
+                open_dt + timedelta(hours=end_hour - open_dt.hour),
+            )
+
+    def test_seat_states(self):
+        self.book(self.seats[1], 11, 13)
+        data = self.client.get(self.url, self.params).json()
+        self.assertEqual(data['date'], self.day.isoformat())
+        states = {seat['name']: seat['state'] for seat in data['seats']}
+        self.assertEqual(states, {'A0': 'available', 'A1': 'reserved', 'A2': 'available'})
+
+    def test_conditional_get(self):
+        first = self.client.get(self.url, self.params)
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        self.assertIn('no-cache', first['Cache-Control'])
+
+        with self.assertNumQueries(2):  # session + user，不查座位/預約
+            unchanged = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(unchanged.status_code, 304)
+
+        self.book(self.seats[0], 10, 11)
+        changed = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Seat.objects.create(room=main_room(), name="A3", x=200, y=10)
+        self.assertEqual(self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=changed['ETag']).status_code, 200)
+
+    def test_invalid_window(self):
+        self.assertEqual(self.client.get(self.url, {'date': 'bad', 'time': '10:00'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'date': self.day.isoformat(), 'time': '06:00'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {**self.params, 'end_time': '09:00'}).status_code, 400)
+
+
+class LiveFeedTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="watcher", password="pw-12345678")
+        cls.seat = Seat.objects.create(room=main_room(), name="L1", x=0, y=0)
+
+    def setUp(self):
+        cache.clear()
+        occupancy.reset()
+
+    def test_snapshot_then_delta(self):
+        feed = live.SeatFeed()
+        now = timezone.now()
+
+        def occupy_seat():
+            Reservation.objects.create(
+                seat=self.seat, user=self.user,
+                start_time=now - timedelta(minutes=30), end_time=now + timedelta(minutes=30),
+            )
+            occupancy.reset()  # TestCase 不會執行 on_commit，直接讓點陣重建
+
+        async def scenario():
+            stream = feed.subscribe()
+            first = await stream.__anext__()
+            await sync_to_async(occupy_seat)()
+            feed.notify_changed()
+            second = await asyncio.wait_for(stream.__anext__(), 5)
+            await stream.aclose()
+            return first, second
+
+        first, second = async_to_sync(scenario)()
+        self.assertEqual(first, ('snapshot', {'occupied': []}))
+        self.assertEqual(second, ('delta', {'occupied': [self.seat.id], 'freed': []}))
+        self.assertEqual(live.format_event(*second), f'event: delta\ndata: {{"occupied": [{self.seat.id}], "freed": []}}\n\n')
+
+    def test_only_changes_affecting_now_are_pushed(self):
+        now = timezone.now()
+        with mock.patch.object(live.feed, 'notify_changed') as notify:
+            with self.captureOnCommitCallbacks(execute=True):
+                Reservation.objects.create(
+                    seat=self.seat, user=self.user,
+                    start_time=now + timedelta(days=1), end_time=now + timedelta(days=1, hours=1),
+                )
+            notify.assert_not_called()
+            with self.captureOnCommitCallbacks(execute=True):
+                Reservation.objects.create(
+                    seat=self.seat, user=self.user,
+                    start_time=now - timedelta(minutes=5), end_time=now + timedelta(hours=1),
+                )
+            notify.assert_called_once()
+
+    def test_requires_asgi(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('seats:seat_stream')).status_code, 501)
+
+
+class SeatLayoutCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="layout", password="pw-12345678")
+        cls.seats = [Seat.objects.create(room=main_room(), name=f"P{i}", x=i * 40, y=0) for i in range(5)]
+
+    def setUp(self):
+        cache.clear()
+        occupancy.reset()
+        layout.reset()
+        self.client.force_login(self.user)
+
+    def seat_queries(self, captured):
+        table = Seat._meta.db_table
+        return [q['sql'] for q in captured if f'FROM "{table}"' in q['sql']]
+
+    def test_views_and_form_reuse_cached_layout(self):
+        self.client.get(reverse('seats:welcome'))  # 第一次載入座位配置
+        for name in ('seats:welcome', 'seats:seat_map', 'seats:res_time', 'seats:reminds'):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.seat_queries(ctx.captured_queries), [], name)
+        self.assertContains(response, '<option value="%d">P3</option>' % self.seats[3].id, html=True)
+
+    def test_seat_changes_invalidate(self):
+        self.assertEqual(len(layout.get_seats()), 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            seat = Seat.objects.create(room=main_room(), name="P9", x=400, y=0)
+        self.assertEqual(layout.get_seat(seat.id).name, "P9")
+        with self.captureOnCommitCallbacks(execute=True):
+            seat.delete()
+        self.assertIsNone(layout.get_seat(seat.id))
+        self.assertIsNone(layout.get_seat("abc"))
+
+
+class OccupiedNowSnapshotTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="lander", password="pw-12345678")
+        cls.seats = [Seat.objects.create(room=main_room(), name=f"W{i}", x=i * 40, y=0) for i in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        occupancy.reset()
+        snapshot.reset()
+
+    def test_computed_once_per_bucket(self):
+        now = timezone.now()
+        with mock.patch.object(occupancy, 'occupied_now', wraps=occupancy.occupied_now) as compute:
+            snapshot.occupied_now(now)
+            with self.assertNumQueries(0):
+                for _ in range(5):
+                    snapshot.occupied_now(now)
+            self.assertEqual(compute.call_count, 1)
+            # 另一個 worker (沒有程序內快照) 直接拿共享 cache 裡的結果
+            snapshot.reset()
+            snapshot.occupied_now(now)
+            self.assertEqual(compute.call_count, 1)
+            snapshot.occupied_now(now + timedelta(seconds=snapshot.BUCKET_SECONDS))
+            self.assertEqual(compute.call_count, 2)
+
+    def test_booking_affecting_now_invalidates(self):
+        now = timezone.now()
+        self.assertEqual(snapshot.occupied_now(now), frozenset())
+        with self.captureOnCommitCallbacks(execute=True):
+            Reservation.objects.create(
+                seat=self.seats[1], user=self.user,
+                start_time=now - timedelta(minutes=10), end_time=now + timedelta(minutes=50),
+            )
+        self.assertEqual(snapshot.occupied_now(now), {self.seats[1].id})
+
+    def test_booking_only_invalidates_its_room(self):
+        now = timezone.now()
+        main = main_room()
+        annex = Room.objects.create(name="二樓自習室", slug='annex', sort_order=1)
+        annex_seat = Seat.objects.create(room=annex, name="W0", x=0, y=0)
+        layout.reset()
+        annex_now = snapshot.occupied_now(now, annex)
+        self.assertEqual(snapshot.occupied_now(now, main), frozenset())
+        with self.captureOnCommitCallbacks(execute=True):
+            Reservation.objects.create(
+                seat=self.seats[0], user=self.user,
+                start_time=now - timedelta(minutes=10), end_time=now + timedelta(minutes=50),
+            )
+        # 另一間閱覽室的快照與版本號不變，仍是同一個物件
+        with self.assertNumQueries(0):
+            self.assertIs(snapshot.occupied_now(now, annex), annex_now)
+        self.assertEqual(snapshot.occupied_now(now, main), {self.seats[0].id})
+        self.assertEqual(snapshot.occupied_now(now), {self.seats[0].id})
+        self.assertNotIn(annex_seat.id, snapshot.occupied_now(now, main))
+
+    def test_waits_for_other_worker(self):
+        now = timezone.now()
+        bucket = int(now.timestamp()) // snapshot.BUCKET_SECONDS
+        key = f'seats:occupied-now:all:{bucket}:{versions.get_version(snapshot._version_name(None))}'
+        cache.add(key + ':lock', 1)
+        threading.Timer(0.05, cache.set, (key, [self.seats[2].id])).start()
+        with mock.patch.object(occupancy, 'occupied_now') as compute:
+            self.assertEqual(snapshot.occupied_now(now), {self.seats[2].id})
+        compute.assert_not_called()
+
+
+class RecordsPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="heavy", password="pw-12345678")
+        other = User.objects.create(username="neighbour")
+        room = main_room()
+        seats = Seat.objects.bulk_create([Seat(room=room, name=f"R{i}", x=0, y=0) for i in range(5)])
+        base = timezone.now().replace(minute=0, second=0, microsecond=0)
+        # 每兩筆同一個開始時間，確認 id tiebreak 不會漏掉或重複
+        Reservation.objects.bulk_create([
+            Reservation(seat=seats[i % 5], user=cls.user,
+                        start_time=base - timedelta(hours=i // 2), end_time=base - timedelta(hours=i // 2 - 1))
+            for i in range(45)
+        ])
+        from .models import Report
+        Report.objects.bulk_create(
+            [Report(seat=seats[i % 5], reporter=cls.user, reported_user=other, reason="吵") for i in range(23)]
+            + [Report(seat=seats[i % 5], reporter=other, reported_user=cls.user, reason="離位") for i in range(12)]
+        )
+        cls.expected = list(
+            Reservation.objects.filter(user=cls.user).order_by('-start_time', '-id').values_list('id', flat=True)
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse('seats:records')
+
+    def get(self, params=None, queries=13):
+        # session + user + 3 個列表 × (頁面資料 + 有上限的 COUNT)，預約列表另外多讀封存表 (資料 + COUNT)，再加候補與團體預約 (2)
+        with self.assertNumQueries(queries):
+            response = self.client.get(self.url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return response.context['reservations']
+
+    def test_cursor_walk_covers_everything_once(self):
+        page = self.get()
+        seen = [res.id for res in page]
+        self.assertEqual(page.start_index, 1)
+        while page.next_cursor:
+            page = self.get({'res_cursor': page.next_cursor})
+            self.assertEqual(page.start_index, len(seen) + 1)
+            seen.extend(res.id for res in page)
+        self.assertEqual(seen, self.expected)
+
+        # 往回翻也一樣
+        back = []
+        while page.previous_cursor:
+            page = self.get({'res_cursor': page.previous_cursor})
+            back[:0] = [res.id for res in page]
+        self.assertEqual(back, self.expected[:len(back)])
+        self.assertEqual(page.number, 1)
+
+    def test_page_jump_and_elided_range(self):
+        # 跳頁時先從兩張表只讀 (start_time, id) 定位到該頁開頭
+        page = self.get({'res_page': 3}, queries=15)
+        self.assertEqual([res.id for res in page], self.expected[20:30])
+        self.assertEqual(page.count, 45)
+        self.assertEqual(list(page.page_range), [1, 2, 3, 4, 5])
+        # 超出範圍的頁碼回到第一頁 (多幾次查詢)
+        response = self.client.get(self.url, {'res_page': 999})
+        self.assertEqual(response.context['reservations'].number, 1)
+
+    def test_approximate_count(self):
+        with self.settings(RECORDS_COUNT_LIMIT=20):
+            page = self.get()
+        self.assertEqual(page.count, 20)
+        self.assertTrue(page.count_is_approximate)
+        self.assertTrue(page.has_next)
+        self.assertContains(self.client.get(self.url), '共 23 筆')
+
+
+class ReservationSweeperTests(TestCase):
+
+    def setUp(self):
+        self.seat = Seat.objects.create(room=main_room(), name="W1", x=0, y=0)
+        self.user = User.objects.create(username="sleeper")
+        # 固定在下午，「今天稍早」的預約才不會跨到前一天
+        self.now = timezone.make_aware(datetime.combine(timezone.localdate(), datetime.min.time()).replace(hour=15))
+
+    def reserve(self, start_hours, end_hours, status='reserved'):
+        return Reservation.objects.create(
+            seat=self.seat, user=self.user, status=status,
+            start_time=self.now + timedelta(hours=start_hours), end_time=self.now + timedelta(hours=end_hours),
+        )
+
+    def test_only_ended_reservations_complete(self):
+        ended = [self.reserve(-24 * (i + 1) - 2, -24 * (i + 1) - 1) for i in range(7)]
+        # 今天稍早結束的還留在今天的佔用點陣裡，等到明天才轉成 completed
+        earlier_today = self.reserve(-3, -2)
+        current = self.reserve(-1, 1)
+        future = self.reserve(2, 3)
+        cancelled = self.reserve(-5, -4, status='cancelled')
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(lifecycle.sweep_completed(now=self.now, batch_size=3), 7)
+        # 3 + 3 + 1：每批一次 SELECT + 一次 UPDATE，最後一批不足 batch_size 就結束
+        self.assertEqual(sum(q['sql'].startswith('UPDATE') for q in ctx.captured_queries), 3)
+
+        statuses = dict(Reservation.objects.values_list('pk', 'status'))
+        self.assertEqual({statuses[r.pk] for r in ended}, {'completed'})
+        self.assertEqual(statuses[earlier_today.pk], 'reserved')
+        self.assertEqual(statuses[current.pk], 'reserved')
+        self.assertEqual(statuses[future.pk], 'reserved')
+        self.assertEqual(statuses[cancelled.pk], 'cancelled')
+        self.assertEqual(lifecycle.sweep_completed(now=self.now), 0)
+
+    def test_reports_still_find_completed_reservation(self):
+        reporter = User.objects.create_user(username="reporter", password="pw-12345678")
+        start = timezone.localtime(self.now) - timedelta(days=1, hours=3)
+        Reservation.objects.create(seat=self.seat, user=self.user, start_time=start, end_time=start + timedelta(hours=2))
+        lifecycle.sweep_completed()
+
+        self.client.force_login(reporter)
+        self.client.post(reverse('seats:reminds'), {
+            'seat': self.seat.id, 'reported_date': start.date().isoformat(),
+            'reported_time': (start + timedelta(minutes=30)).strftime('%H:%M'), 'reason': '佔位',
+        })
+        from .models import Report
+        self.assertEqual(Report.objects.get().reported_user, self.user)
+
+
+class ReservationArchiveTests(TestCase):
+
+    def setUp(self):
+        self.seat = Seat.objects.create(room=main_room(), name="H1", x=0, y=0)
+        self.user = User.objects.create_user(username="veteran", password="pw-12345678")
+        now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        self.old = [
+            Reservation.objects.create(
+                seat=self.seat, user=self.user, status=status,
+                start_time=now - timedelta(days=200 + i), end_time=now - timedelta(days=200 + i) + timedelta(hours=1),
+            )
+            for i, status in enumerate(['reserved', 'completed', 'cancelled'] * 5)
+        ]
+        self.recent = [
+            Reservation.objects.create(
+                seat=self.seat, user=self.user,
+                start_time=now - timedelta(days=i), end_time=now - timedelta(days=i) + timedelta(hours=1),
+            )
+            for i in range(1, 8)
+        ]
+        from .models import Report
+        self.report = Report.objects.create(
+            seat=self.seat, reporter=self.user, reported_user=self.user,
+            reported_reservation=self.old[0], reason="佔位",
+        )
+
+    def test_moves_old_rows_and_relinks_reports(self):
+        from .models import ArchivedReservation
+        self.assertEqual(archive.archive_reservations(batch_size=4), 15)
+
+        self.assertEqual(set(Reservation.objects.values_list('pk', flat=True)), {r.pk for r in self.recent})
+        archived = ArchivedReservation.objects.in_bulk()
+        self.assertEqual(set(archived), {r.pk for r in self.old})
+        self.assertEqual(archived[self.old[0].pk].status, 'completed')
+        self.assertEqual(archived[self.old[2].pk].status, 'cancelled')
+
+        self.report.refresh_from_db()
+        self.assertIsNone(self.report.reported_reservation)
+        self.assertEqual(self.report.reservation_record, archived[self.old[0].pk])
+        self.assertEqual(archive.archive_reservations(), 0)
+
+    def test_records_read_through_archive(self):
+        archive.archive_reservations()
+        expected = [r.pk for r in self.recent] + [r.pk for r in self.old]
+        self.client.force_login(self.user)
+        url = reverse('seats:records')
+
+        page = self.client.get(url).context['reservations']
+        seen = [res.pk for res in page]
+        while page.next_cursor:
+            page = self.client.get(url, {'res_cursor': page.next_cursor}).context['reservations']
+            seen.extend(res.pk for res in page)
+        self.assertEqual(seen, expected)
+
+        page = self.client.get(url, {'res_page': 2}).context['reservations']
+        self.assertEqual([res.pk for res in page], expected[10:20])
+        self.assertEqual(page.count, 22)
+        self.assertContains(self.client.get(url, {'res_page': 2}), self.seat.name)
+
+    def test_admin_reads_through_to_archive(self):
+        archive.archive_reservations()
+        self.client.force_login(User.objects.create_superuser(username="boss", password="pw-12345678"))
+        response = self.client.get(reverse('admin:seats_reservation_changelist'), {'status__exact': 'cancelled'})
+        self.assertEqual(response.context['archived_count'], 5)
+        self.assertContains(response, reverse('admin:seats_archivedreservation_changelist') + '?status__exact=cancelled')
+        response = self.client.get(reverse('admin:seats_reservation_change', args=[self.old[0].pk]))
+        self.assertRedirects(response, reverse('admin:seats_archivedreservation_change', args=[self.old[0].pk]))
+        response = self.client.get(reverse('admin:seats_reservation_change', args=[self.recent[0].pk]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_fulfilled_waitlist_entry_does_not_block_archive(self):
+        old = self.old[1]
+        entry = WaitlistEntry.objects.create(
+            user=self.user, seat=self.seat, start_time=old.start_time, end_time=old.end_time,
+            status='fulfilled', reservation=old,
+        )
+        self.assertEqual(archive.archive_reservations(), 15)
+        connection.check_constraints()  # _raw_delete 不處理 on_delete，留下的外鍵在這裡會失敗
+        entry.refresh_from_db()
+        self.assertIsNone(entry.reservation)
+        self.assertEqual(entry.status, 'fulfilled')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoadTestHarnessTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        occupancy.reset()
+        layout.reset()
+        snapshot.reset()
+
+    def test_small_run_and_baseline_compare(self):
+        loadtest.seed(seats=12, users=30, reservations=300, days=30)
+        # 測試用的 in-memory SQLite (shared cache) 遇到並行寫入 session 會直接回 "table is locked"，
+        # 不像檔案資料庫會等待，所以這裡只用一個執行緒；並行由 manage.py loadtest 在檔案資料庫上跑
+        with contextlib.redirect_stdout(io.StringIO()):
+            recorder, elapsed = loadtest.run(flows=12, concurrency=1)
+        summary = loadtest.summarize(recorder, elapsed, 12, 1)
+
+        for step in loadtest.STEPS:
+            row = summary['steps'][step]
+            self.assertEqual(row['requests'], 12, step)
+            self.assertEqual(row['errors'], 0, step)
+            self.assertGreater(row['max_queries'], 0, step)
+            self.assertLessEqual(row['p50_ms'], row['p95_ms'])
+            self.assertLessEqual(row['p95_ms'], row['p99_ms'])
+        self.assertEqual(sum(summary['outcomes'].values()), 12)
+        self.assertGreater(summary['outcomes'].get('booked', 0), 0)
+
+        self.assertEqual(loadtest.compare(summary, summary)[1], [])
+        faster = json.loads(json.dumps(summary))
+        faster['steps']['records']['p95_ms'] = summary['steps']['records']['p95_ms'] / 2
+        faster['steps']['res_time']['max_queries'] -= 1
+        regressions = loadtest.compare(summary, faster)[1]
+        self.assertEqual([line.split(':')[0] for line in regressions], ['res_time', 'records'])
+
+
+@override_settings(METRICS_ENFORCE_BUDGETS=True)
+class ViewBudgetTests(TestCase):
+    """以 settings.VIEW_BUDGETS 檢查各 view 的查詢次數，N+1 會在這裡失敗。"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seats, cls.users = seed_reservations(reservation_count=3000)
+        cls.user = User.objects.create_user(username="budget", password="pw-12345678", email="b@example.com")
+        # 讓個人紀錄頁每個列表都有滿滿一頁
+        now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        Reservation.objects.bulk_create([
+            Reservation(seat=cls.seats[i % len(cls.seats)], user=cls.user, status='completed',
+                        start_time=now - timedelta(days=i + 1), end_time=now - timedelta(days=i + 1, hours=-1))
+            for i in range(25)
+        ])
+        from .models import Report
+        Report.objects.bulk_create([
+            Report(seat=cls.seats[i], reporter=cls.user, reported_user=cls.users[i], reason="吵") for i in range(15)
+        ] + [
+            Report(seat=cls.seats[i], reporter=cls.users[i], reported_user=cls.user, reason="佔位") for i in range(15)
+        ])
+        cls.day = (timezone.localdate() + timedelta(days=1)).isoformat()
+
+    def setUp(self):
+        cache.clear()
+        occupancy.reset()
+        snapshot.reset()
+        metrics.registry.reset()
+        self.client.force_login(self.user)
+
+    def walk(self):
+        slot = {'date': self.day, 'start_time': '10:00', 'end_time': '12:00'}
+        self.client.get(reverse('seats:welcome'))
+        self.client.get(reverse('seats:dashboard'))
+        self.client.get(reverse('seats:seat_map'), {'date': self.day, 'time': '10:00'})
+        self.client.get(reverse('seats:res_time'), slot)
+        self.client.post(reverse('seats:make_reservation'), {**slot, 'seat_id': self.seats[0].id})
+        self.client.get(reverse('seats:records'))
+        self.client.get(reverse('seats:records'), {'res_page': 3, 'sub_page': 2})
+        self.client.get(reverse('seats:availability_api'), slot)
+
+    def test_views_within_budget(self):
+        self.walk()
+        records = metrics.registry.get('seats:records')
+        self.assertEqual(records.requests, 2)
+        self.assertGreater(records.queries, 0)
+        self.assertGreater(records.template_seconds, 0)
+        self.assertGreater(records.db_seconds, 0)
+        self.assertEqual(records.over_budget, 0)
+
+    def test_n_plus_one_fails(self):
+        from django.db.models.query import QuerySet
+        # 模擬有人拿掉 select_related：紀錄頁每一列各查一次座位
+        with mock.patch.object(QuerySet, 'select_related', lambda self, *fields: self):
+            with self.assertRaises(metrics.BudgetExceeded) as ctx:
+                self.client.get(reverse('seats:records'))
+        self.assertIn('seats:records', str(ctx.exception))
+
+    def test_over_budget_is_logged(self):
+        with self.settings(METRICS_ENFORCE_BUDGETS=False, VIEW_BUDGETS={'seats:dashboard': {'queries': 0}}):
+            with self.assertLogs('SeatBooking.metrics', 'WARNING') as logs:
+                self.client.get(reverse('seats:dashboard'))
+        self.assertIn('View budget exceeded: seats:dashboard', logs.output[0])
+        self.assertEqual(metrics.registry.get('seats:dashboard').over_budget, 1)
+
+    def test_metrics_endpoint(self):
+        self.walk()
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+        with self.settings(METRICS_TOKEN='scrape-me'):
+            self.client.logout()
+            response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer scrape-me'})
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('seatbooking_requests_total{view="seats:res_time",status="200"} 1', body)
+        self.assertIn('seatbooking_request_duration_seconds_count{view="seats:records"} 2', body)
+        self.assertIn('seatbooking_db_queries_total{view="seats:make_reservation"}', body)
+        self.assertIn('seatbooking_mail_outbox_queue_depth 0', body)
+        self.assertIn('seatbooking_write_queue_waiting 0', body)
+
+
+class SQLiteProfileTests(TestCase):
+
+    def test_connection_pragmas(self):
+        with connection.cursor() as cursor:
+            values = {}
+            for pragma in ('synchronous', 'busy_timeout', 'cache_size', 'temp_store'):
+                cursor.execute(f"PRAGMA {pragma}")
+                values[pragma] = cursor.fetchone()[0]
+        self.assertEqual(values, {'synchronous': 1, 'busy_timeout': 5000, 'cache_size': -65536, 'temp_store': 2})
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+    def test_write_queue_serializes_in_order(self):
+        queue = writes.WriteQueue()
+        active = []
+        order = []
+        overlaps = []
+        started = threading.Barrier(6)
+
+        def write(i):
+            started.wait()
+            time.sleep(0.002 * i)  # 依序進入佇列
+            with queue.serialized():
+                active.append(i)
+                if len(active) > 1:
+                    overlaps.append(tuple(active))
+                with queue.serialized():  # 同一執行緒巢狀進入不會卡住
+                    order.append(i)
+                time.sleep(0.01)
+                active.remove(i)
+
+        threads = [threading.Thread(target=write, args=(i,)) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(overlaps, [])
+        self.assertEqual(order, list(range(6)))
+        self.assertEqual(queue.stats()['writes'], 6)
+        self.assertEqual(queue.stats()['waiting'], 0)
+
+
+@unittest.skipIf(assets.Image is None, "需要 Pillow")
+class AssetPipelineTests(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.static = Path(tmp.name) / 'static'
+        self.static.mkdir()
+        assets.Image.new('RGB', (64, 32), 'red').save(self.static / 'logo.png')
+        (self.static / 'site.css').write_text("body { color: red; }\n" * 50)
+        settings = override_settings(
+            STATICFILES_DIRS=[self.static],
+            STATIC_ROOT=Path(tmp.name) / 'collected',
+            IMAGE_VARIANT_ROOT=self.static / 'variants',
+            IMAGE_VARIANT_FORMATS=['webp'],
+            IMAGE_VARIANTS={'logo.png': {'widths': [16, 32], 'icons': [8]}},
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        assets.reset()
+        self.addCleanup(assets.reset)
+
+    def render(self):
+        return engines.all()[0].from_string(
+            "{% load assets %}{% picture 'logo.png' alt='Logo' width=16 %}|{% icon_static 'logo.png' 8 %}"
+        ).render({})
+
+    def test_picture_falls_back_to_original_without_variants(self):
+        self.assertEqual(
+            self.render(),
+            '<picture><img src="/static/logo.png" alt="Logo" decoding="async" width="16"></picture>|/static/logo.png',
+        )
+
+    def test_build_variants_and_picture_sources(self):
+        self.assertEqual(assets.build_variants(), (3, 0))
+        self.assertEqual(assets.build_variants(), (0, 3))  # 原圖沒變就不重做
+        with assets.Image.open(self.static / 'variants' / 'logo-16.webp') as image:
+            self.assertEqual(image.size, (16, 8))
+        assets.reset()
+        html = self.render()
+        self.assertIn(
+            '<source type="image/webp" srcset="/static/variants/logo-16.webp 16w, '
+            '/static/variants/logo-32.webp 32w" sizes="16px">', html,
+        )
+        self.assertTrue(html.endswith('|/static/variants/logo-8.png'))
+
+    def test_compress_static(self):
+        root = self.static.parent / 'collected'
+        root.mkdir()
+        (root / 'site.css').write_bytes((self.static / 'site.css').read_bytes())
+        self.assertGreaterEqual(assets.compress_static(root), 1)
+        self.assertEqual(gzip.decompress((root / 'site.css.gz').read_bytes()), (root / 'site.css').read_bytes())
+        self.assertEqual(assets.compress_static(root), 0)
+
+
+class BaseTemplateTests(TestCase):
+    """共用 base.html：頁面不再內嵌 <style>，靜態區塊走片段快取。"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="chrome", password="pw-12345678")
+        self.client.force_login(self.user)
+
+    def test_pages_use_shared_stylesheet(self):
+        for name in ('dashboard', 'faq', 'rules', 'records', 'reminds'):
+            response = self.client.get(reverse(f'seats:{name}'))
+            self.assertEqual(response.status_code, 200)
+            self.assertNotContains(response, '<style')
+            self.assertContains(response, 'seats/css/base.css')
+            # 目前頁面在側邊選單中標示為 active
+            self.assertContains(response, f"menu-button active\" onclick=\"window.location.href='{reverse(f'seats:{name}')}'")
+
+    def test_faq_and_side_menu_are_fragment_cached(self):
+        from django.core.cache.utils import make_template_fragment_key
+        self.client.get(reverse('seats:faq'))
+        self.assertIsNotNone(cache.get(make_template_fragment_key('faq_content')))
+        self.assertIsNotNone(cache.get(make_template_fragment_key('side_menu', ['faq'])))
+        # 登出表單的 csrf token 不能被快取
+        self.assertContains(self.client.get(reverse('seats:faq')), 'csrfmiddlewaretoken')
+
+    def test_side_menu_uses_configured_timeout_on_every_page(self):
+        from django.core.cache.utils import make_template_fragment_key
+        # 0 秒 = 不快取；以前只有 faq / rules 有帶設定值，其他頁面一律是 3600 秒
+        with self.settings(TEMPLATE_FRAGMENT_CACHE_SECONDS=0):
+            self.client.get(reverse('seats:dashboard'))
+        self.assertIsNone(cache.get(make_template_fragment_key('side_menu', ['dashboard'])))
+        self.client.get(reverse('seats:dashboard'))
+        self.assertIsNotNone(cache.get(make_template_fragment_key('side_menu', ['dashboard'])))
+
+
+class SeatMapRenderTests(TestCase):
+    """座位圖：view 一次算好狀態，{% seat_map %} 輸出按鈕。"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="mapper", password="pw-12345678")
+        cls.other = User.objects.create_user(username="other", password="pw-12345678")
+        cls.seats = [Seat.objects.create(room=main_room(), name=f"{'P' if i % 2 else 'A'}{i}", x=i * 40, y=0) for i in range(6)]
+
+    def setUp(self):
+        cache.clear()
+        occupancy.reset()
+        layout.reset()
+        self.client.force_login(self.user)
+
+    def test_records_states(self):
+        a, b, c = self.seats[:3]
+        records = seatmap.records({a.id, b.id}, {b.id})
+        self.assertEqual([r.id for r in records], [seat.id for seat in self.seats])
+        self.assertEqual(
+            [(r.state, r.orient) for r in records[:3]],
+            [(seatmap.RESERVED, 'h'), (seatmap.MINE, 'w'), (seatmap.AVAILABLE, 'h')],
+        )
+
+    def test_component_escapes_and_follows_layout_changes(self):
+        template = engines.all()[0].from_string("{% load seatmap %}{% seat_map seats 'pick' %}")
+        seat = self.seats[0]
+        html = template.render({'seats': seatmap.records((), {seat.id})})
+        self.assertEqual(html.count('<button'), len(self.seats))
+        self.assertIn('title="您已預約此座位" disabled', html)
+        with self.captureOnCommitCallbacks(execute=True):
+            seat.name = 'A<0>'
+            seat.save()
+        html = template.render({'seats': seatmap.records()})
+        self.assertIn('data-seat-name="A&lt;0&gt;"', html)
+        self.assertNotIn('您已預約此座位', html)
+
+    def test_res_time_marks_own_and_taken_seats(self):
+        day = timezone.localdate() + timedelta(days=1)
+        start = timezone.make_aware(datetime.combine(day, datetime.min.time()).replace(hour=13))
+        for seat, user in ((self.seats[0], self.user), (self.seats[1], self.other)):
+            Reservation.objects.create(seat=seat, user=user, start_time=start, end_time=start + timedelta(hours=1))
+        occupancy.reset()
+        response = self.client.get(reverse('seats:res_time'), {
+            'date': day.isoformat(), 'start_time': '13:00', 'end_time': '14:00',
+        })
+        html = response.content.decode()
+        self.assertEqual(html.count('class="seat-button'), len(self.seats))
+        self.assertEqual(html.count('seat-mine'), 1)
+        self.assertEqual(html.count('seat-taken'), 1)
+        self.assertEqual(html.count('title="點擊選擇'), len(self.seats) - 2)
+
+
+class SlotCalendarTests(TestCase):
+    """時段表：開館時間、休館日與時段長度都由 BOOKING_* 設定決定。"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="slotter", password="pw-12345678")
+        cls.seat = Seat.objects.create(room=main_room(), name="A1", x=0, y=0)
+
+    def setUp(self):
+        cache.clear()
+        occupancy.reset()
+        slots.reset()
+        self.addCleanup(slots.reset)
+        self.client.force_login(self.user)
+        self.day = timezone.localdate() + timedelta(days=1)
+
+    def test_default_hours(self):
+        day_slots = slots.get_day(self.day)
+        self.assertEqual(day_slots.starts[0], '08:00')
+        self.assertEqual(day_slots.ends[-1], '24:00')
+        self.assertEqual(len(day_slots.starts), 16)
+        self.assertIs(slots.get_day(self.day), day_slots)  # 同一天只算一次
+        self.assertEqual(len(slots.date_options()), 7)
+
+    def test_weekday_hours_closures_and_half_hour_slots(self):
+        closed = self.day + timedelta(days=1)
+        with self.settings(
+            BOOKING_SLOT_MINUTES=30,
+            BOOKING_HOURS={'default': ('08:00', '24:00'), self.day.weekday(): ('10:00', '18:00')},
+            BOOKING_CLOSED_DATES=[closed.isoformat()],
+        ):
+            day_slots = slots.get_day(self.day)
+            self.assertEqual(day_slots.starts[:3], ('10:00', '10:30', '11:00'))
+            self.assertEqual(day_slots.ends[-1], '18:00')
+            self.assertNotIn(closed.isoformat(), slots.date_options())
+            self.assertIsNone(occupancy.day_window(closed))
+
+            with self.assertRaisesMessage(slots.SlotError, '30 分鐘'):
+                slots.window(self.day.isoformat(), '10:15', '11:00')
+            with self.assertRaisesMessage(slots.SlotError, '開放時段'):
+                slots.window(self.day.isoformat(), '09:00', '10:00')
+            with self.assertRaisesMessage(slots.SlotError, '休館'):
+                slots.window(closed.isoformat(), '10:00', '11:00')
+
+            url = reverse('seats:make_reservation')
+            data = {'seat_id': self.seat.id, 'date': self.day.isoformat(), 'start_time': '10:30', 'end_time': '11:00'}
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(url, data)
+            self.assertRedirects(response, reverse('seats:records'), fetch_redirect_response=False)
+            response = self.client.post(url, {**data, 'start_time': '11:15', 'end_time': '12:00'}, follow=True)
+            self.assertContains(response, '預約時間必須以 30 分鐘為單位')
+            self.assertEqual(Reservation.objects.count(), 1)
+
+            # 半小時的預約直接落在點陣上，不需要逐筆比對
+            _, start, end = slots.window(self.day.isoformat(), '10:30', '11:00')
+            occ = occupancy.get_day(self.day, self.seat.room_id)
+            self.assertEqual(occ.partial, [])
+            self.assertEqual(occupancy.reserved_seat_ids(start, end), {self.seat.id})
+            self.assertEqual(occupancy.reserved_seat_ids(end, end + day_slots.slot), set())
+
+
+class GroupBookingTests(TestCase):
+    """團體預約：成員全部同意後，空間索引找相鄰空位，全部成員一次預約。"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="leader", password="pw-12345678")
+        cls.amy = User.objects.create_user(username="amy", password="pw-12345678")
+        cls.bob = User.objects.create_user(username="bob", password="pw-12345678")
+        # 一排 6 個座位 (間距 45px)，第二排離很遠
+        cls.row = [Seat.objects.create(room=main_room(), name=f"A{i}", x=i * 45, y=0) for i in range(6)]
+        cls.far = Seat.objects.create(room=main_room(), name="Z1", x=2000, y=2000)
+
+    def setUp(self):
+        cache.clear()
+        occupancy.reset()
+        layout.reset()
+        spatial.reset()
+        self.client.force_login(self.user)
+        self.day = timezone.localdate() + timedelta(days=1)
+        _, self.start, self.end = slots.window(self.day.isoformat(), '10:00', '12:00')
+
+    def test_find_cluster_skips_taken_and_isolated_seats(self):
+        available = {seat.id for seat in self.row} - {self.row[1].id} | {self.far.id}
+        found = spatial.find_cluster(3, available)
+        self.assertEqual(sorted(seat.name for seat in found), ['A2', 'A3', 'A4'])
+        self.assertEqual(spatial.find_cluster(2, {self.row[0].id, self.row[2].id, self.far.id}), [])
+        self.assertEqual([s.name for s in spatial.find_cluster(1, {self.far.id})], ['Z1'])
+
+    def test_book_group_is_all_or_nothing(self):
+        booking.book_seat(self.amy, self.row[5], self.start, self.end)
+        result = booking.book_group(
+            [(self.user, self.row[4]), (self.bob, self.row[5])], self.start, self.end,
+        )
+        self.assertEqual(result.status, booking.SEAT_TAKEN)
+        self.assertEqual(result.conflicts, [self.row[5]])
+        result = booking.book_group(
+            [(self.user, self.row[0]), (self.amy, self.row[1])], self.start, self.end,
+        )
+        self.assertEqual(result.status, booking.USER_BUSY)
+        self.assertEqual(result.conflicts, [self.amy])
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def _invite(self, members):
+        data = {'date': self.day.isoformat(), 'start_time': '10:00', 'end_time': '12:00', 'members': members}
+        return self.client.post(reverse('seats:group_booking'), data, follow=True)
+
+    def _respond(self, user, accept):
+        self.client.force_login(user)
+        member = groups.pending_invitations(user).get()
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse('seats:respond_group_invitation', args=[member.id]), {'accept': '1' if accept else '0'}, follow=True,
+            )
+
+    def test_group_booking_waits_for_every_member(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.book_seat(User.objects.create_user(username="x"), self.row[2], self.start, self.end)
+        response = self._invite('amy, bob')
+        self.assertContains(response, '已送出團體預約邀請')
+        # 成員還沒同意，不會替任何人建立預約
+        self.assertEqual(Reservation.objects.filter(user__in=[self.user, self.amy, self.bob]).count(), 0)
+        self.assertContains(self._respond(self.amy, True), '等待其他成員確認')
+        self.assertEqual(Reservation.objects.filter(user__in=[self.user, self.amy, self.bob]).count(), 0)
+        self.assertContains(self._respond(self.bob, True), '團體預約成功')
+        booked = Reservation.objects.filter(start_time=self.start, user__in=[self.user, self.amy, self.bob])
+        self.assertEqual(sorted(r.seat.name for r in booked), ['A3', 'A4', 'A5'])
+        self.assertEqual(GroupBooking.objects.get().status, 'booked')
+        # 已經回覆過的邀請不能再按一次
+        self.assertFalse(groups.pending_invitations(self.bob).exists())
+
+    def test_unknown_member_gets_the_same_response(self):
+        known = self._invite('amy')
+        unknown = self._invite('nobody')
+        self.assertContains(known, '已送出團體預約邀請')
+        self.assertContains(unknown, '已送出團體預約邀請')
+        self.assertNotContains(unknown, '找不到')
+        group = GroupBooking.objects.get(members__username='nobody')
+        self.assertIsNone(group.members.get().user)
+        self.client.post(reverse('seats:cancel_group_booking', args=[group.id]))
+        group.refresh_from_db()
+        self.assertEqual(group.status, 'cancelled')
+
+    def test_decline_cancels_and_failure_does_not_name_members(self):
+        self._invite('amy, bob')
+        self._respond(self.amy, False)
+        self.assertEqual(GroupBooking.objects.get().status, 'cancelled')
+        self.assertFalse(groups.pending_invitations(self.bob).exists())
+
+        # bob 在同一時段已有預約：結果只說無法完成，不說是誰沒空
+        booking.book_seat(self.bob, self.far, self.start, self.end)
+        self.client.force_login(self.user)
+        self._invite('amy, bob')
+        self._respond(self.amy, True)
+        response = self._respond(self.bob, True)
+        self.assertContains(response, groups.FAILED_MESSAGE)
+        self.assertEqual(GroupBooking.objects.latest('id').status, 'failed')
+        self.assertEqual(Reservation.objects.filter(user__in=[self.user, self.amy]).count(), 0)
+
+
+class RecommendApiTests(TestCase):
+    """推薦替代座位：網格上一圈圈往外找，結果與逐一比對距離相同。"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="picker", password="pw-12345678")
+        cls.seats = [Seat.objects.create(room=main_room(), name=f"B{i}", x=i * 45, y=0) for i in range(5)]
+        cls.day = timezone.localdate() + timedelta(days=1)
+
+    def setUp(self):
+        cache.clear()
+        occupancy.reset()
+        layout.reset()
+        spatial.reset()
+        self.client.force_login(self.user)
+        self.url = reverse('seats:recommend_api')
+        self.params = {'date': self.day.isoformat(), 'start_time': '10:00', 'end_time': '12:00'}
+
+    def test_nearest_matches_brute_force(self):
+        rng = random.Random(7)
+        seats = [Seat(id=i, name=f"R{i}", x=rng.randrange(1200), y=rng.randrange(550)) for i in range(1, 301)]
+        index = spatial.SeatIndex(seats, 60)
+        available = {seat.id for seat in seats if rng.random() < 0.3}
+        for _ in range(20):
+            x, y = rng.randrange(-100, 1300), rng.randrange(-100, 650)
+            expected = sorted(((seat.x - x) ** 2 + (seat.y - y) ** 2, seat.id) for seat in seats if seat.id in available)
+            found = index.nearest(x, y, 5, available)
+            self.assertEqual([seat.id for _, seat in found], [seat_id for _, seat_id in expected[:5]])
+        self.assertEqual(len(index.nearest(0, 0, 500, available)), len(available))
+
+    def test_recommends_free_seats_near_taken_seat(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            _, start, end = slots.window(self.day.isoformat(), '11:00', '13:00')
+            booking.book_seat(self.user, self.seats[2], start, end)
+            booking.book_seat(User.objects.create_user(username="other"), self.seats[3], start, end)
+        data = self.client.get(self.url, {**self.params, 'seat': self.seats[2].id, 'k': 2}).json()
+        self.assertEqual(data['origin']['available'], False)
+        self.assertEqual([seat['name'] for seat in data['seats']], ['B1', 'B0'])
+        self.assertEqual(data['seats'][0]['distance'], 45.0)
+
+        data = self.client.get(self.url, {**self.params, 'x': 170, 'y': 5, 'k': 1}).json()
+        self.assertEqual([seat['name'] for seat in data['seats']], ['B4'])
+
+    def test_conditional_get_and_bad_requests(self):
+        params = {**self.params, 'seat': self.seats[0].id}
+        etag = self.client.get(self.url, params)['ETag']
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(self.url, {**params, 'k': 2}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get(self.url, self.params).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {**self.params, 'seat': 9999}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {**params, 'date': 'bad'}).status_code, 400)
+
+    def test_coordinates_missing_invalid_or_far_away(self):
+        for bad in ({}, {'x': 10}, {'y': 10}, {'x': 'abc', 'y': 0}, {'x': 'inf', 'y': 0},
+                    {'x': 0, 'y': '-inf'}, {'x': 'nan', 'y': 'nan'}, {'x': '1e400', 'y': 0}):
+            with self.subTest(bad=bad):
+                self.assertEqual(self.client.get(self.url, {**self.params, **bad}).status_code, 400)
+
+        # 離座位圖很遠的點不必走過中間所有的空白格子，直接逐一比對
+        for x, y, expected in ((200000, 0, ['B4', 'B3']), (-1e12, 5, ['B0', 'B1']), (90, -50000, ['B2', 'B1'])):
+            with self.subTest(x=x, y=y):
+                data = self.client.get(self.url, {**self.params, 'x': x, 'y': y, 'k': 2}).json()
+                self.assertEqual([seat['name'] for seat in data['seats']], expected)
+
+        index = spatial.get_index()
+        available = {seat.id for seat in self.seats}
+        self.assertEqual(len(index.nearest(10 ** 9, 10 ** 9, 10, available)), 5)
+        self.assertEqual([seat.name for _, seat in index.nearest(1e6, 0, 1, available, exclude=self.seats[4].id)], ['B3'])
+        with self.assertRaises(ValueError):
+            index.nearest(math.inf, 0, 1, available)
+
+
+class WaitlistTests(TestCase):
+    """候補：取消預約後依登記順序自動預約，通知寫進寄信佇列。"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username="owner", password="pw-12345678")
+        cls.first = User.objects.create_user(username="first", password="pw-12345678", email="first@example.com")
+        cls.second = User.objects.create_user(username="second", password="pw-12345678", email="second@example.com")
+        cls.seat = Seat.objects.create(room=main_room(), name="W1", x=0, y=0)
+        cls.other_seat = Seat.objects.create(room=main_room(), name="W2", x=45, y=0)
+        cls.day = timezone.localdate() + timedelta(days=1)
+
+    def setUp(self):
+        cache.clear()
+        occupancy.reset()
+        layout.reset()
+        _, self.start, self.end = slots.window(self.day.isoformat(), '10:00', '12:00')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.taken = booking.book_seat(self.owner, self.seat, self.start, self.end).reservation
+
+    def cancel(self):
+        self.client.force_login(self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('seats:cancel_reservation', args=[self.taken.id]))
+
+    def test_cancellation_books_first_waiter(self):
+        first, _ = waitlist.join(self.first, self.seat, self.start, self.end)
+        second, _ = waitlist.join(self.second, None, self.start, self.end)
+        self.cancel()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, 'fulfilled')
+        self.assertEqual((first.reservation.user, first.reservation.seat), (self.first, self.seat))
+        self.assertEqual(second.status, 'waiting')
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.recipient_list(), ['first@example.com'])
+        self.assertIn('W1', email.subject)
+
+    def test_busy_waiter_is_skipped(self):
+        booking.book_seat(self.first, self.other_seat, self.start, self.start + timedelta(hours=1))
+        first, _ = waitlist.join(self.first, None, self.start, self.end)
+        second, _ = waitlist.join(self.second, self.seat, self.start + timedelta(hours=1), self.end)
+        # 時段完全錯開的候補不會被查到
+        waitlist.join(self.owner, self.seat, self.end, self.end + timedelta(hours=1))
+        self.assertEqual(len(waitlist.candidates(self.seat.id, self.start, self.end)), 2)
+        self.cancel()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, 'waiting')
+        self.assertEqual(second.status, 'fulfilled')
+
+    def test_join_and_leave_views(self):
+        self.client.force_login(self.first)
+        data = {'date': self.day.isoformat(), 'start_time': '10:00', 'end_time': '12:00'}
+        response = self.client.post(reverse('seats:join_waitlist'), {**data, 'seat_id': ''}, follow=True)
+        self.assertContains(response, '目前就有空位')
+        self.assertFalse(WaitlistEntry.objects.exists())
+
+        response = self.client.post(reverse('seats:join_waitlist'), {**data, 'seat_id': self.seat.id}, follow=True)
+        self.assertContains(response, '已登記候補 座位 W1')
+        self.assertContains(response, '取消候補')
+        entry = WaitlistEntry.objects.get()
+        self.client.post(reverse('seats:join_waitlist'), {**data, 'seat_id': self.seat.id})
+        self.assertEqual(WaitlistEntry.objects.count(), 1)
+
+        self.client.post(reverse('seats:leave_waitlist', args=[entry.id]))
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, 'cancelled')
+        self.cancel()
+        self.assertFalse(Reservation.objects.filter(user=self.first).exists())
+
+
+class UsageRollupTests(TestCase):
+    """使用量彙總：增量更新的結果與重建相同，報表只讀彙總表。"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="student", password="pw-12345678")
+        cls.staff = User.objects.create_user(username="staff", password="pw-12345678", is_staff=True)
+        cls.seats = [Seat.objects.create(room=main_room(), name=f"U{i}", x=i * 45, y=0) for i in range(2)]
+        cls.day = timezone.localdate() + timedelta(days=1)
+
+    def setUp(self):
+        cache.clear()
+        occupancy.reset()
+        layout.reset()
+
+    def at(self, label):
+        return slots.get_day(self.day).at(label)
+
+    def snapshot(self):
+        # 增量扣回 0 的列會留著 (重建時才清掉)，比較時略過
+        return (
+            sorted(row for row in SlotUsageHourly.objects.values_list('hour', *rollups.FIELDS) if any(row[1:])),
+            sorted(row for row in SeatUsageDaily.objects.values_list('seat_id', 'day', *rollups.FIELDS) if any(row[2:])),
+        )
+
+    def test_incremental_matches_rebuild(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            kept = booking.book_seat(self.user, self.seats[0], self.at('10:00'), self.at('12:00')).reservation
+            cancelled = booking.book_seat(self.staff, self.seats[1], self.at('10:00'), self.at('11:00')).reservation
+        with self.captureOnCommitCallbacks(execute=True):
+            cancelled.status = 'cancelled'
+            cancelled.save()
+            # 後台手動改成不在格線上的時段、換座位
+            kept.seat, kept.start_time, kept.end_time = self.seats[1], self.at('13:30'), self.at('15:10')
+            kept.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            Reservation.objects.create(seat=self.seats[0], user=self.user, start_time=self.at('16:00'), end_time=self.at('17:00'))
+            booking.book_seat(self.user, self.seats[0], self.at('18:00'), self.at('19:00')).reservation.delete()
+
+        incremental = self.snapshot()
+        self.assertIn((self.seats[1].id, self.day, 100, 1, 1), incremental[1])
+        self.assertEqual(sum(row[1] for row in incremental[0]), 160)
+
+        SlotUsageHourly.objects.all().delete()
+        SeatUsageDaily.objects.all().delete()
+        self.assertEqual(rollups.rebuild(self.day, self.day + timedelta(days=1)), 3)
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_dashboard_and_csv_read_rollups(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.book_seat(self.user, self.seats[0], self.at('10:00'), self.at('12:00'))
+        params = {'since': self.day.isoformat(), 'until': (self.day + timedelta(days=1)).isoformat()}
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('seats:usage_dashboard'), params).status_code, 302)
+
+        self.client.force_login(self.staff)
+        layout.get_seats()
+        with self.assertNumQueries(4):  # session + user + 時段表 + 每座位彙總
+            response = self.client.get(reverse('seats:usage_dashboard'), params)
+        self.assertEqual(response.context['totals']['booked_minutes'], 120)
+        by_hour = {row['hour']: row for row in response.context['by_hour']}
+        self.assertEqual(by_hour['10:00']['utilization'], 50.0)  # 2 個座位中 1 個整點被預約
+        self.assertEqual(by_hour['12:00']['booked_minutes'], 0)
+
+        response = self.client.get(reverse('seats:usage_csv'), {**params, 'by': 'seat'})
+        lines = response.content.decode('utf-8-sig').splitlines()
+        self.assertEqual(lines[0], '座位,預約分鐘數,預約筆數,取消筆數,使用率 (%)')
+        self.assertEqual(lines[1].split(',')[:3], ['U0', '120', '1'])
+        self.assertEqual(self.client.get(reverse('seats:usage_csv'), {**params, 'by': 'x'}).status_code, 400)
+
+
+class ExportTests(TestCase):
+    """CSV 匯出：逐批串流、可依日期與狀態篩選，後台 action 與指令共用同一份格式。"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="admin", password="pw-12345678")
+        cls.user = User.objects.create_user(username="student", password="pw-12345678")
+        cls.seat = Seat.objects.create(room=main_room(), name="E1", x=0, y=0)
+        base = timezone.make_aware(datetime(2025, 9, 1, 10, 0))
+        cls.reservations = [
+            Reservation.objects.create(
+                seat=cls.seat, user=cls.user, start_time=base + timedelta(days=i), end_time=base + timedelta(days=i, hours=1),
+                status='cancelled' if i == 1 else 'reserved',
+            )
+            for i in range(3)
+        ]
+
+    def read(self, lines):
+        return [line.split(',') for line in ''.join(lines).lstrip('\ufeff').splitlines()]
+
+    def test_rows_filtered_and_streamed_in_chunks(self):
+        rows = exports.reservation_rows(since=datetime(2025, 9, 1).date(), until=datetime(2025, 9, 3).date(), chunk_size=1)
+        with self.assertNumQueries(1):
+            table = self.read(exports.stream(rows))
+        self.assertEqual(table[0], exports.RESERVATION_HEADER)
+        self.assertEqual([row[0] for row in table[1:]], [str(r.id) for r in self.reservations[:2]])
+        self.assertEqual(table[1][1:5], ['E1', 'student', '2025-09-01 10:00:00', '2025-09-01 11:00:00'])
+
+        table = self.read(exports.stream(exports.reservation_rows(status='cancelled')))
+        self.assertEqual([row[0] for row in table[1:]], [str(self.reservations[1].id)])
+
+    def test_command_writes_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'out.csv'
+            call_command('export_csv', 'reservations', '--status', 'reserved', '--output', str(path), stderr=io.StringIO())
+            table = self.read(path.read_text(encoding='utf-8'))
+        self.assertEqual(len(table), 3)
+        with self.assertRaises(CommandError):
+            call_command('export_csv', 'reports', '--status', 'nope')
+
+    def test_admin_action_streams(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('admin:seats_reservation_changelist'), {
+            'action': 'export_reservations_csv', '_selected_action': [r.pk for r in self.reservations],
+        })
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment;', response['Content-Disposition'])
+        table = self.read(b''.join(response.streaming_content).decode('utf-8'))
+        self.assertEqual(len(table), 4)
+
+
+class FloorPlanImportTests(TestCase):
+    """整批匯入平面圖：一次檢查所有列、bulk 寫入、commit 後 SEAT_LAYOUT 只前進一次。"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="admin", password="pw-12345678")
+        cls.user = User.objects.create_user(username="student", password="pw-12345678")
+        cls.seats = [Seat.objects.create(room=main_room(), name=f"A{i}", x=i * 100, y=0) for i in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        layout.reset()
+
+    def test_bulk_import_diff_and_single_bump(self):
+        rows = [{'line': 1, 'name': 'A0', 'x': 0, 'y': 0}, {'line': 2, 'name': 'A1', 'x': 100, 'y': 60},
+                {'line': 3, 'id': self.seats[2].id, 'name': 'A9', 'x': 200, 'y': 0}]
+        rows += [{'line': 4 + i, 'name': f"B{i}", 'x': (i % 20) * 50, 'y': 200 + (i // 20) * 50} for i in range(200)]
+        before = versions.get_version(versions.SEAT_LAYOUT)
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True) as callbacks:
+            result = floorplan.import_rows(rows)
+        self.assertTrue(result.ok, result.errors)
+        self.assertEqual((len(result.created), len(result.updated), len(result.unchanged)), (200, 2, 1))
+        self.assertLess(len(queries), 10)  # 與列數無關
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(versions.get_version(versions.SEAT_LAYOUT), before + 1)
+        self.assertIn("~ A2 -> A9 (200, 0)", result.report())
+        self.assertIn("~ A1 (100, 0) -> (100, 60)", result.report())
+        self.assertEqual(len(layout.get_seats()), 203)
+        self.assertEqual(layout.get_seat(self.seats[2].id).name, 'A9')
+
+        # 互換名稱
+        swapped = floorplan.import_rows([
+            {'line': 1, 'id': self.seats[0].id, 'name': 'A1', 'x': 0, 'y': 0},
+            {'line': 2, 'id': self.seats[1].id, 'name': 'A0', 'x': 100, 'y': 60},
+        ])
+        self.assertTrue(swapped.ok, swapped.errors)
+        self.assertEqual(Seat.objects.get(pk=self.seats[0].id).name, 'A1')
+
+    def test_validation_reports_all_errors_and_writes_nothing(self):
+        data = "name,x,y\nA0,0,0\nC1,10,10\nC1,500,500\nC2,abc,0\nC3,210,5\n"
+        result = floorplan.import_rows(floorplan.read(data))
+        self.assertFalse(result.ok)
+        self.assertEqual(len(result.errors), 4, result.errors)  # 重疊 ×2 (C1/A0、C3 與保留的 A2)、重複名稱、座標
+        self.assertTrue(any("重複" in e for e in result.errors))
+        self.assertEqual(Seat.objects.count(), 3)
+        with self.assertRaises(floorplan.FloorPlanError):
+            floorplan.read("seat,x\nA0,0\n")
+
+        # 還有未結束預約的座位不能移除
+        start = timezone.now() + timedelta(days=1)
+        Reservation.objects.create(seat=self.seats[2], user=self.user, start_time=start, end_time=start + timedelta(hours=1))
+        result = floorplan.import_rows([{'line': 1, 'name': 'A0', 'x': 0, 'y': 0}], delete_missing=True)
+        self.assertEqual(result.errors, ["座位 A2 還有 1 筆未結束的預約，不能移除。"])
+        result = floorplan.import_rows([{'line': 1, 'name': 'A0', 'x': 0, 'y': 0}], delete_missing=True, dry_run=True)
+        self.assertEqual(Seat.objects.count(), 3)
+
+    def test_command_and_admin_preview_then_confirm(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'plan.json'
+            path.write_text(json.dumps({'seats': [{'name': 'D1', 'x': 0, 'y': 300}]}), encoding='utf-8')
+            out = io.StringIO()
+            call_command('import_floorplan', str(path), '--dry-run', stdout=out)
+        self.assertIn("+ D1 (0, 300)", out.getvalue())
+        self.assertFalse(Seat.objects.filter(name='D1').exists())
+
+        self.client.force_login(self.admin)
+        url = reverse('admin:seats_seat_import')
+        upload = io.BytesIO("\ufeffname,x,y\nD1,0,300\n".encode('utf-8'))
+        upload.name = 'plan.csv'
+        response = self.client.post(url, {'file': upload})
+        self.assertContains(response, "+ D1 (0, 300)")
+        self.assertFalse(Seat.objects.filter(name='D1').exists())
+        response = self.client.post(url, {'data': response.context['data']})
+        self.assertRedirects(response, reverse('admin:seats_seat_changelist'))
+        self.assertTrue(Seat.objects.filter(name='D1').exists())
+
+
+class RoomTests(TestCase):
+    """多間閱覽室：座位圖、可用座位與快取依閱覽室分開，查一間不會碰到另一間。"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="roomer", password="pw-12345678")
+        cls.main = main_room()
+        cls.annex = Room.objects.create(name="二樓自習室", slug='annex', sort_order=1)
+        cls.main_seats = [Seat.objects.create(room=cls.main, name=f"A{i}", x=i * 45, y=0) for i in range(3)]
+        # 座位名稱只在閱覽室內唯一
+        cls.annex_seats = [Seat.objects.create(room=cls.annex, name=f"A{i}", x=i * 45, y=0) for i in range(3)]
+        cls.day = timezone.localdate() + timedelta(days=1)
+
+    def setUp(self):
+        cache.clear()
+        occupancy.reset()
+        layout.reset()
+        seatmap.reset()
+        spatial.reset()
+        self.client.force_login(self.user)
+        self.params = {'date': self.day.isoformat(), 'start_time': '10:00', 'end_time': '12:00'}
+
+    def test_unsaved_seat_does_not_touch_database(self):
+        # 座位的閱覽室沒有會寫入資料庫的預設值，建立暫時的 Seat (floorplan.apply) 不查詢
+        with self.assertNumQueries(0):
+            seat = Seat(pk=self.main_seats[0].pk, name="~tmp")
+        self.assertIsNone(seat.room_id)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Seat.objects.create(name="X1", x=0, y=0)
+
+    def test_booking_in_one_room_leaves_other_room_cached(self):
+        _, start, end = slots.window(self.day.isoformat(), '10:00', '12:00')
+        self.assertEqual(occupancy.reserved_seat_ids(start, end, room=self.main), set())
+        annex_occ = occupancy.get_day(self.day, self.annex)
+        annex_version = occupancy.day_version(self.day, self.annex)
+        url = reverse('seats:availability_api')
+        etag = self.client.get(url, {**self.params, 'room': 'annex'})['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.book_seat(self.user, self.main_seats[0], start, end)
+        self.assertEqual(occupancy.day_version(self.day, self.annex), annex_version)
+        self.assertIs(occupancy.get_day(self.day, self.annex), annex_occ)
+        with self.assertNumQueries(0):
+            self.assertEqual(occupancy.reserved_seat_ids(start, end, room=self.annex), set())
+            self.assertEqual(occupancy.reserved_seat_ids(start, end, room=self.main), {self.main_seats[0].id})
+            self.assertEqual(occupancy.reserved_seat_ids(start, end), {self.main_seats[0].id})
+        # 另一間閱覽室有人預約，這間的 ETag 不變
+        response = self.client.get(url, {**self.params, 'room': 'annex'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        data = self.client.get(url, self.params).json()
+        self.assertEqual({seat['room'] for seat in data['seats']}, {self.main.slug, 'annex'})
+        self.assertEqual(self.client.get(url, {**self.params, 'room': 'nope'}).status_code, 404)
+
+    def test_views_are_room_scoped(self):
+        response = self.client.get(reverse('seats:res_time'), {**self.params, 'room': 'annex'})
+        self.assertEqual(response.context['room'], self.annex)
+        self.assertEqual([seat.id for seat in response.context['seats']], [seat.id for seat in self.annex_seats])
+        self.assertContains(response, 'name="room" value="annex"')
+        # 沒指定就是第一間閱覽室
+        response = self.client.get(reverse('seats:welcome'))
+        self.assertEqual([seat.id for seat in response.context['seats']], [seat.id for seat in self.main_seats])
+
+        # 推薦只在原座位的閱覽室裡找
+        data = self.client.get(reverse('seats:recommend_api'), {**self.params, 'seat': self.annex_seats[1].id}).json()
+        self.assertEqual(data['room'], 'annex')
+        self.assertEqual({seat['id'] for seat in data['seats']}, {self.annex_seats[0].id, self.annex_seats[2].id})
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Seat.objects.create(room=self.annex, name="A0", x=500, y=0)
+
+    def test_floorplan_import_into_room(self):
+        result = floorplan.import_rows([{'line': 1, 'name': 'A0', 'x': 0, 'y': 100}], room=self.annex)
+        self.assertTrue(result.ok, result.errors)
+        self.assertEqual(len(result.updated), 1)
+        self.assertEqual(Seat.objects.get(pk=self.annex_seats[0].pk).y, 100)
+        self.assertEqual(Seat.objects.get(pk=self.main_seats[0].pk).y, 0)
+        result = floorplan.import_rows([{'line': 1, 'id': self.main_seats[1].id, 'name': 'Z', 'x': 0, 'y': 0}], room=self.annex)
+        self.assertEqual(result.errors, [f"第 1 列：二樓自習室 沒有 id {self.main_seats[1].id} 的座位。"])
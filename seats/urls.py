@@ -9,6 +9,11 @@ urlpatterns = [
     path('seat_map/', views.seat_map, name='seat_map'),        # 座位圖查詢
     path('res_time/', views.res_time, name='res_time'),        # 選擇預約時間
     path('make_reservation/', views.make_reservation, name='make_reservation'),     # 建立預約
+    path('group_booking/', views.group_booking, name='group_booking'),              # 團體預約 (邀請成員，全部同意後找相鄰座位)
+    path('group_booking/invitations/<int:member_id>/', views.respond_group_invitation, name='respond_group_invitation'),
+    path('group_booking/<int:group_id>/cancel/', views.cancel_group_booking, name='cancel_group_booking'),
+    path('waitlist/', views.join_waitlist, name='join_waitlist'),                  # 登記候補
+    path('waitlist/<int:entry_id>/cancel/', views.leave_waitlist, name='leave_waitlist'),
     path('records/', views.records, name='records'),                               # 預約記錄
     path('cancel_reservation/<int:reservation_id>/', views.cancel_reservation_by_id, name='cancel_reservation'),  
     path('reminds/', views.reminds, name='reminds'),                              # 提醒頁面/提交檢舉表單
@@ -16,5 +21,10 @@ urlpatterns = [
     path('dashboard/', views.dashboard, name='dashboard'),  # 提交針對特定預約的檢舉
     path('faq/', views.faq_view, name='faq'),
     path('rules/', views.rules_view, name='rules'),
+    path('api/availability/', views.availability_api, name='availability_api'),  # 座位狀態 JSON (支援 ETag)
+    path('api/recommend/', views.recommend_api, name='recommend_api'),  # 推薦最近的空位 (支援 ETag)
+    path('staff/usage/', views.usage_dashboard, name='usage_dashboard'),      # 座位使用統計 (staff)
+    path('staff/usage.csv', views.usage_csv, name='usage_csv'),
+    path('live/', views.seat_stream, name='seat_stream'),  # 即時座位圖推播 (SSE，需 ASGI)
 
 ]
\ No newline at end of file
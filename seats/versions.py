@@ -0,0 +1,39 @@
+# seats/versions.py
+"""
+共享版本計數器。
+
+各 worker 的程序內快取 (座位佔用點陣等) 以這裡的版本號判斷自己是否過期：
+寫入端在變更後 bump，讀取端發現版本不同就重建。計數器放在 Django cache，
+多 worker 部署時 CACHES 必須指向共享後端 (Redis / Memcached / DB cache)。
+"""
+import time
+
+from django.core.cache import cache
+
+KEY_PREFIX = 'seats:version:'
+
+SEAT_LAYOUT = 'seat-layout'  # 座位名稱/座標，Seat 新增修改刪除時前進
+OCCUPIED_NOW = 'occupied-now'  # 影響「現在」的預約異動時前進，依閱覽室分開 (見 snapshot.py)
+
+
+def _seed():
+    # 以時間當初始值：cache 被清掉或 key 被淘汰後重新起算時，不會重複用到舊的版本號
+    return time.time_ns() // 1000
+
+
+def get_version(name):
+    key = KEY_PREFIX + name
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _seed(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name):
+    key = KEY_PREFIX + name
+    try:
+        return cache.incr(key)
+    except ValueError:  # key 不存在
+        cache.add(key, _seed(), None)
+        return cache.get(key)
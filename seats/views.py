@@ -1,73 +1,100 @@
 # SeatBooking/seats/views.py
+import csv
+import math
+import re
 from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import User
 from django.contrib import messages
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.views.decorators.http import condition, require_GET, require_POST
 from datetime import date, timedelta, datetime 
-from django.core.mail import send_mail
+from mail import outbox
 from .models import Seat, Reservation, Report 
 from .forms import ReportForm 
+from . import booking, groups, layout, live, occupancy, rollups, seatmap, slots, snapshot, spatial, versions, waitlist, writes
 
 from django.conf import settings #
 
 
 
+def _selected_room(request):
+    """?room=<slug> (POST 時看表單的 room 欄位)；沒指定或找不到就用第一間閱覽室。"""
+    return layout.room_or_default(request.POST.get('room') or request.GET.get('room'))
+
+
+def _room_context(room):
+    # 閱覽室選單與座位圖背景 (templates/seats/_room_picker.html)
+    return {'room': room, 'rooms': layout.get_rooms()}
+
+
+def _room_seat_ids(room):
+    return [seat.id for seat in layout.get_seats(room)]
+
+
 @login_required
 def welcome(request): # 即時座位圖 / 預約系統主頁
     now = timezone.now()
+    room = _selected_room(request)
 
-    overlapping_reservations = Reservation.objects.filter(
-        status='reserved', # 'reserved'正在進行的預約
-        start_time__lte=now,
-        end_time__gte=now
-    ).select_related('seat')
-
-    reserved_seat_ids = [res.seat_id for res in overlapping_reservations]
-    seats = Seat.objects.all()
+    reserved_seat_ids = snapshot.occupied_now(now, room) # 這間閱覽室的分鐘快照，同一分鐘內不重算
 
     context = {
-        'seats': seats,
-        'reserved_seat_ids': reserved_seat_ids,
+        'seats': seatmap.records(reserved_seat_ids, room=room), # 狀態在這裡一次算好，模板只負責輸出
         'now': timezone.localtime(now), # 本地時間
+        **_room_context(room),
         'page_title': '即時座位圖'
     }
     return render(request, 'seats/welcome.html', context)
 
+def _slot_day(date_str, date_options):
+    """時間選單要列哪一天的時段：選到的日期，沒選或格式不對就用第一個可選的日期。"""
+    for candidate in (date_str, *date_options[:1]):
+        try:
+            return slots.get_day(date.fromisoformat(candidate))
+        except (TypeError, ValueError):
+            continue
+    return slots.get_day(timezone.localdate())
+
 @login_required
 def seat_map(request): # 查詢特定時間點的座位圖
     date_str = request.GET.get('date')
     time_str = request.GET.get('time')
+    room = _selected_room(request)
 
-    seats = Seat.objects.all()
-    reserved_seat_ids = []
+    reserved_seat_ids = set()
 
     if date_str and time_str:
         try:
-            selected_datetime_naive = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
-            if settings.USE_TZ:
-                selected_datetime = timezone.make_aware(selected_datetime_naive, timezone.get_current_timezone())
-            else:
-                selected_datetime = selected_datetime_naive
-
-            overlapping_reservations = Reservation.objects.filter(
-                status='reserved',
-                start_time__lte=selected_datetime,
-                end_time__gt=selected_datetime
-            ).select_related('seat')
-            reserved_seat_ids = [res.seat_id for res in overlapping_reservations]
-        except ValueError:
-            messages.error(request, "日期或時間格式無效。")
+            _, selected_datetime, selected_end = slots.window(date_str, time_str, aligned=False)
+            reserved_seat_ids = occupancy.reserved_seat_ids(selected_datetime, selected_end, room=room)
+            if reserved_seat_ids is None:
+                overlapping_reservations = Reservation.objects.filter(
+                    seat_id__in=_room_seat_ids(room),
+                    status='reserved',
+                    start_time__lte=selected_datetime,
+                    end_time__gt=selected_datetime
+                )
+                reserved_seat_ids = set(overlapping_reservations.values_list('seat_id', flat=True))
+        except slots.SlotError as e:
+            messages.error(request, str(e))
+            reserved_seat_ids = set()
         except Exception as e:
              print(f"Error filtering seats in seat_map: {e}")
              messages.error(request, "查詢座位時發生錯誤。")
 
-    date_options = [(date.today() + timedelta(days=i)).isoformat() for i in range(7)]
-    time_slots = [f'{h:02}:00' for h in range(8, 24)]
+    # 日期與時段選單來自時段表 (每天每個程序只算一次)
+    date_options = slots.date_options()
+    time_slots = _slot_day(date_str, date_options).starts
 
     context = {
-        'seats': seats,
-        'reserved_seat_ids': reserved_seat_ids,
+        'seats': seatmap.records(reserved_seat_ids, room=room),
+        **_room_context(room),
         'date_options': date_options,
         'time_slots': time_slots,
         'selected_date': date_str,
@@ -81,51 +108,49 @@ def res_time(request): # 選擇預約時間範圍以查看可用座位
     date_str = request.GET.get('date')
     start_str = request.GET.get('start_time')
     end_str = request.GET.get('end_time')
+    room = _selected_room(request)
 
-    seats = Seat.objects.all()
-    reserved_seat_ids = []
-    user_reserved_seat_ids = [] # 當前使用者在該時段已預約的座位
+    reserved_seat_ids = set()
+    user_reserved_seat_ids = set() # 當前使用者在該時段已預約的座位
 
-    date_options = [(date.today() + timedelta(days=i)).isoformat() for i in range(7)]
-    time_slots = [f'{h:02}:00' for h in range(8, 24)]
+    date_options = slots.date_options()
+    day_slots = _slot_day(date_str, date_options)
 
     if date_str and start_str and end_str:
         try:
-            start_dt_naive = datetime.strptime(f"{date_str} {start_str}", "%Y-%m-%d %H:%M")
-            end_dt_naive = datetime.strptime(f"{date_str} {end_str}", "%Y-%m-%d %H:%M")
-
-            if settings.USE_TZ:
-                current_tz = timezone.get_current_timezone()
-                start_dt = timezone.make_aware(start_dt_naive, current_tz)
-                end_dt = timezone.make_aware(end_dt_naive, current_tz)
-            else:
-                start_dt = start_dt_naive
-                end_dt = end_dt_naive
-
-            if start_dt >= end_dt:
-                messages.error(request, "開始時間必須早於結束時間。")
-            else:
-                overlapping_reservations = Reservation.objects.filter(
-                    status='reserved',
-                    start_time__lt=end_dt,
-                    end_time__gt=start_dt
+            _, start_dt, end_dt = slots.window(date_str, start_str, end_str)
+            overlapping_reservations = Reservation.objects.filter(
+                status='reserved',
+                start_time__lt=end_dt,
+                end_time__gt=start_dt
+            )
+            reserved_seat_ids = occupancy.reserved_seat_ids(start_dt, end_dt, room=room)
+            if reserved_seat_ids is None:
+                reserved_seat_ids = set(
+                    overlapping_reservations.filter(seat_id__in=_room_seat_ids(room)).values_list('seat_id', flat=True)
                 )
-                reserved_seat_ids = list(overlapping_reservations.values_list('seat_id', flat=True))
 
-                user_reservations_in_range = overlapping_reservations.filter(user=request.user)
-                user_reserved_seat_ids = list(user_reservations_in_range.values_list('seat_id', flat=True))
-        except ValueError:
-            messages.error(request, "日期或時間格式無效。")
+            user_reservations_in_range = overlapping_reservations.filter(user=request.user)
+            user_reserved_seat_ids = set(user_reservations_in_range.values_list('seat_id', flat=True))
+        except slots.SlotError as e:
+            messages.error(request, str(e))
         except Exception as e:
             print(f"Error filtering seats in res_time: {e}")
             messages.error(request, "查詢座位時發生錯誤。")
 
+    seat_records = seatmap.records(reserved_seat_ids, user_reserved_seat_ids, room=room)
     context = {
-        'seats': seats,
-        'reserved_seat_ids': reserved_seat_ids,
-        'user_reserved_seat_ids': user_reserved_seat_ids,
+        'seats': seat_records,
+        **_room_context(room),
+        # 候補表單只列出被別人預約的座位
+        'taken_seats': [seat for seat in seat_records if seat.state == seatmap.RESERVED],
         'date_options': date_options,
-        'time_slots': time_slots,
+        'time_slots': day_slots.starts,
+        'end_slots': day_slots.ends,
+        # 換日期時由 JS 換開始/結束時間選單 (各日開館時間可能不同)
+        'slot_tables': slots.label_tables(),
+        'max_slots': slots.max_slots(day_slots),
+        'group_max_size': spatial.max_group_size(),
         'selected_date': date_str,
         'selected_start_time': start_str,
         'selected_end_time': end_str,
@@ -140,9 +165,11 @@ def make_reservation(request): # 處理預約請求
         date_str = request.POST.get('date')
         start_str = request.POST.get('start_time')
         end_str = request.POST.get('end_time')
+        room_str = request.POST.get('room')
 
         redirect_url_base = reverse('seats:res_time')
         query_params = {}
+        if room_str: query_params['room'] = room_str
         if date_str: query_params['date'] = date_str
         if start_str: query_params['start_time'] = start_str
         if end_str: query_params['end_time'] = end_str
@@ -154,59 +181,29 @@ def make_reservation(request): # 處理預約請求
         if not seat_id:
             messages.error(request, "請先選擇座位")
             return redirect(redirect_url_with_params)
+        seat = layout.get_seat(seat_id)
+        if seat is None:
+            messages.error(request, "找不到選取的座位。")
+            return redirect(redirect_url_with_params)
         try:
-            seat = get_object_or_404(Seat, id=seat_id)
-            start_dt_naive = datetime.strptime(f"{date_str} {start_str}", '%Y-%m-%d %H:%M')
-            end_dt_naive = datetime.strptime(f"{date_str} {end_str}", '%Y-%m-%d %H:%M')
-
-            if settings.USE_TZ:
-                current_tz = timezone.get_current_timezone()
-                start_dt = timezone.make_aware(start_dt_naive, current_tz)
-                end_dt = timezone.make_aware(end_dt_naive, current_tz)
-            else:
-                start_dt = start_dt_naive
-                end_dt = end_dt_naive
-
-            if start_dt >= end_dt:
-                 messages.error(request, "開始時間必須早於結束時間。")
-                 return redirect(redirect_url_with_params)
+            # 開館時間、休館日、時段格線都由時段表檢查
+            _, start_dt, end_dt = slots.window(date_str, start_str, end_str)
             if start_dt < timezone.now():
                  messages.error(request, "無法預約過去的時間。")
                  return redirect(redirect_url_with_params)
 
-            conflict_on_seat = Reservation.objects.filter(
-                seat=seat,
-                status='reserved',
-                start_time__lt=end_dt,
-                end_time__gt=start_dt
-            ).exists()
-            if conflict_on_seat:
+            # 衝突檢查與新增在同一個原子操作內完成
+            result = booking.book_seat(request.user, seat, start_dt, end_dt)
+            if result.status == booking.SEAT_TAKEN:
                 messages.error(request, "此座位在該時段已被預約，請重新選擇。")
                 return redirect(redirect_url_with_params)
-
-            user_already_booked_in_range = Reservation.objects.filter(
-                user=request.user,
-                status='reserved',
-                start_time__lt=end_dt,
-                end_time__gt=start_dt
-            ).exists()
-            if user_already_booked_in_range:
+            if result.status == booking.USER_BUSY:
                 messages.warning(request, "您已在此時段有其他預約。每位用戶同一時間只能預約一個座位。")
                 return redirect(redirect_url_with_params)
-
-            Reservation.objects.create(
-                seat=seat,
-                user=request.user,
-                start_time=start_dt,
-                end_time=end_dt,
-                status='reserved'
-            )
             messages.success(request, f"座位 {seat.name} 預約成功！ ({date_str} {start_str}~{end_str})")
             return redirect(reverse('seats:records')) # 預約成功後跳轉到個人紀錄頁面
-        except Seat.DoesNotExist:
-             messages.error(request, "找不到選取的座位。")
-        except ValueError:
-             messages.error(request, "日期或時間格式無效。")
+        except slots.SlotError as e:
+             messages.error(request, str(e))
         except Exception as e:
             print(f"Error making reservation: {e}")
             messages.error(request, f"預約時發生錯誤：{str(e)}")
@@ -214,6 +211,368 @@ def make_reservation(request): # 處理預約請求
     return redirect(reverse('seats:res_time'))
 
 
+@login_required
+@require_POST
+def group_booking(request):
+    """
+    團體預約：邀請同行成員一起在同一間閱覽室預約相鄰座位 (seats/groups.py)。
+    成員各自在個人紀錄頁同意後才會預約；帳號是否存在、成員是否有空都不在這裡透露。
+    """
+    date_str = request.POST.get('date')
+    start_str = request.POST.get('start_time')
+    end_str = request.POST.get('end_time')
+    room = _selected_room(request)
+    from urllib.parse import urlencode
+    redirect_url = reverse('seats:res_time') + '?' + urlencode(
+        {'room': room.slug if room else '', 'date': date_str or '', 'start_time': start_str or '', 'end_time': end_str or ''}
+    )
+
+    try:
+        _, start_dt, end_dt = slots.window(date_str, start_str, end_str)
+    except slots.SlotError as e:
+        messages.error(request, str(e))
+        return redirect(redirect_url)
+    if start_dt < timezone.now():
+        messages.error(request, "無法預約過去的時間。")
+        return redirect(redirect_url)
+
+    names = re.split(r'[\s,，]+', request.POST.get('members', ''))
+    group, error = groups.invite(request.user, names, room, start_dt, end_dt)
+    if error:
+        messages.error(request, error)
+        return redirect(redirect_url)
+    messages.success(request, "已送出團體預約邀請，所有成員在個人紀錄頁確認後會自動安排相鄰座位。")
+    return redirect(reverse('seats:records'))
+
+
+@login_required
+@require_POST
+def respond_group_invitation(request, member_id):
+    """同意或拒絕團體預約邀請 (POST accept=1 為同意)。"""
+    member = groups.pending_invitations(request.user).filter(pk=member_id).first()
+    if member is None:
+        messages.warning(request, "此邀請已結束或不存在。")
+        return redirect(reverse('seats:records'))
+    accept = request.POST.get('accept') == '1'
+    group = groups.respond(member, accept)
+    if not accept:
+        messages.success(request, "已拒絕團體預約邀請。")
+    elif group.status == 'booked':
+        messages.success(request, "所有成員都已同意，團體預約成功！")
+    elif group.status == 'failed':
+        messages.error(request, groups.FAILED_MESSAGE)
+    else:
+        messages.success(request, "已同意，等待其他成員確認。")
+    return redirect(reverse('seats:records'))
+
+
+@login_required
+@require_POST
+def cancel_group_booking(request, group_id):
+    """發起人取消還在等待成員確認的團體預約。"""
+    group = groups.led_groups(request.user).filter(pk=group_id).first()
+    if group is not None and groups.cancel(group):
+        messages.success(request, "已取消團體預約。")
+    else:
+        messages.warning(request, "此團體預約已結束或不存在。")
+    return redirect(reverse('seats:records'))
+
+
+@login_required
+@require_POST
+def join_waitlist(request):
+    """登記候補：指定座位 (seat_id) 或這間閱覽室的任何座位 (seat_id 空白)，有人取消時自動預約。"""
+    date_str = request.POST.get('date')
+    start_str = request.POST.get('start_time')
+    end_str = request.POST.get('end_time')
+    room = _selected_room(request)
+    from urllib.parse import urlencode
+    redirect_url = reverse('seats:res_time') + '?' + urlencode(
+        {'room': room.slug if room else '', 'date': date_str or '', 'start_time': start_str or '', 'end_time': end_str or ''}
+    )
+
+    try:
+        _, start_dt, end_dt = slots.window(date_str, start_str, end_str)
+    except slots.SlotError as e:
+        messages.error(request, str(e))
+        return redirect(redirect_url)
+    if start_dt < timezone.now():
+        messages.error(request, "無法候補過去的時間。")
+        return redirect(redirect_url)
+    seat = None
+    if request.POST.get('seat_id'):
+        seat = layout.get_seat(request.POST['seat_id'])
+        if seat is None:
+            messages.error(request, "選擇的座位不存在。")
+            return redirect(redirect_url)
+        room = seat.room
+
+    # 現在就有空位的話直接預約即可，不必候補
+    reserved_seat_ids = occupancy.reserved_seat_ids(start_dt, end_dt, room=room)
+    free = set(_room_seat_ids(room)) - reserved_seat_ids
+    if (seat.id in free) if seat else free:
+        messages.info(request, "此時段目前就有空位，請直接選位預約。")
+        return redirect(redirect_url)
+
+    entry, error = waitlist.join(request.user, seat, start_dt, end_dt, room=room)
+    if error:
+        messages.error(request, error)
+        return redirect(redirect_url)
+    target = f"座位 {layout.seat_label(seat)}" if seat else f"{room} 的任何座位" if room else "任何座位"
+    messages.success(request, f"已登記候補 {target} ({date_str} {start_str}~{end_str})，有人取消時會自動為您預約並寄信通知。")
+    return redirect(reverse('seats:records'))
+
+
+@login_required
+@require_POST
+def leave_waitlist(request, entry_id):
+    """取消自己的候補。"""
+    updated = waitlist.active_entries(request.user).filter(pk=entry_id).update(status='cancelled')
+    if updated:
+        messages.success(request, "已取消候補。")
+    else:
+        messages.warning(request, "此候補已結束或不存在。")
+    return redirect(reverse('seats:records'))
+
+
+# --- 座位狀態 JSON API ---
+def _availability_window(request):
+    """解析 ?date=&start_time=&end_time= (或 ?date=&time= 查單一時間點)，不合法回傳 None。"""
+    start_str = request.GET.get('start_time') or request.GET.get('time')
+    try:
+        # 只提供開館時段內的查詢，版本號才能涵蓋所有會影響結果的預約
+        day_slots, start_dt, end_dt = slots.window(
+            request.GET.get('date'), start_str, request.GET.get('end_time'), aligned=False
+        )
+    except slots.SlotError:
+        return None
+    return day_slots.day, start_dt, end_dt
+
+
+def _availability_room(request):
+    """?room= 指定時只看那間閱覽室 (找不到回傳 False)，沒指定為 None (所有閱覽室)。"""
+    value = request.GET.get('room')
+    if not value:
+        return None
+    return layout.get_room(value) or False
+
+
+def _availability_etag(request, room=None):
+    window = _availability_window(request)
+    if window is None:
+        return None
+    room = _availability_room(request) if room is None else room
+    if room is False:
+        return None
+    day, start_dt, end_dt = window
+    # 只看一間閱覽室時 ETag 只含那間的版本號，其他閱覽室有人預約不會讓快取失效
+    return "{}-{}-{}-{}-{}".format(
+        room.pk if room else '',
+        occupancy.day_version(day, room),
+        versions.get_version(versions.SEAT_LAYOUT),
+        int(start_dt.timestamp()),
+        int(end_dt.timestamp()),
+    )
+
+
+@login_required
+@require_GET
+@condition(etag_func=_availability_etag)
+def availability_api(request):
+    """
+    回傳某日某時段座位的狀態 (?room=<slug> 只回傳該閱覽室，否則為所有閱覽室)。
+    ETag 由預約版本號與座位配置版本號組成，內容沒變時瀏覽器/反向代理帶 If-None-Match
+    會直接拿到 304，不必重查也不必重傳。
+    """
+    window = _availability_window(request)
+    if window is None:
+        return JsonResponse({'error': '日期或時間格式無效，或不在開放時段內。'}, status=400)
+    room = _availability_room(request)
+    if room is False:
+        return JsonResponse({'error': '找不到指定的閱覽室。'}, status=404)
+    day, start_dt, end_dt = window
+
+    reserved_seat_ids = occupancy.reserved_seat_ids(start_dt, end_dt, room=room)
+    seats = [
+        {'id': seat.id, 'name': seat.name, 'x': seat.x, 'y': seat.y, 'state': seat.state}
+        for seat in seatmap.records(reserved_seat_ids, room=room)
+    ]
+    if room is None:
+        for item in seats:
+            item['room'] = layout.get_seat(item['id']).room.slug
+    response = JsonResponse({
+        'date': day.isoformat(),
+        'room': room.slug if room else None,
+        'start': timezone.localtime(start_dt).strftime('%H:%M'),
+        'end': timezone.localtime(end_dt).strftime('%H:%M') if request.GET.get('end_time') else None,
+        'seats': seats,
+    })
+    # 每次都要回來驗證 ETag (需登入)，內容沒變就是 304
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def _recommend_origin(request):
+    """推薦的基準點：?seat=<id> (偏好的座位) 或 ?x=&y= (座位圖上的點)。回傳 (seat 或 None, x, y)，不合法回傳 None。"""
+    if request.GET.get('seat'):
+        seat = layout.get_seat(request.GET['seat'])
+        return None if seat is None else (seat, seat.x, seat.y)
+    try:
+        x, y = float(request.GET['x']), float(request.GET['y'])
+    except (KeyError, ValueError):
+        return None
+    # float() 也接受 inf / nan
+    if not (math.isfinite(x) and math.isfinite(y)):
+        return None
+    return None, x, y
+
+
+def _recommend_room(request, origin):
+    # 指定座位時就在那個座位的閱覽室裡找；x/y 則是 ?room= 座位圖上的點
+    if origin is not None and origin[0] is not None:
+        return origin[0].room
+    return layout.room_or_default(request.GET.get('room'))
+
+
+def _recommend_etag(request):
+    origin = _recommend_origin(request)
+    etag = _availability_etag(request, _recommend_room(request, origin))
+    if etag is None:
+        return None
+    # 結果只取決於該日預約與座位配置 (已在 availability 的 ETag 裡) 加上查詢參數
+    return "{}-{}-{}-{}-{}".format(
+        etag, request.GET.get('seat', ''), request.GET.get('x', ''), request.GET.get('y', ''), request.GET.get('k', ''),
+    )
+
+
+@login_required
+@require_GET
+@condition(etag_func=_recommend_etag)
+def recommend_api(request):
+    """
+    推薦替代座位：偏好的座位 (或座位圖上點的位置) 在該時段被預約時，
+    回傳離它最近、整個時段都空著的 k 個座位，讓預約頁直接列出可點選的替代方案。
+    """
+    window = _availability_window(request)
+    if window is None:
+        return JsonResponse({'error': '日期或時間格式無效，或不在開放時段內。'}, status=400)
+    origin = _recommend_origin(request)
+    if origin is None:
+        return JsonResponse({'error': '請指定座位 (seat) 或座位圖上的位置 (x, y)。'}, status=400)
+    try:
+        k = int(request.GET.get('k') or 3)
+    except ValueError:
+        return JsonResponse({'error': 'k 必須是整數。'}, status=400)
+    k = max(1, min(k, settings.SEAT_RECOMMEND_MAX))
+    day, start_dt, end_dt = window
+    seat, x, y = origin
+    room = _recommend_room(request, origin)
+
+    reserved_seat_ids = occupancy.reserved_seat_ids(start_dt, end_dt, room=room)
+    available = set(_room_seat_ids(room)) - reserved_seat_ids
+    found = spatial.nearest_available(x, y, k, available, exclude=seat.id if seat else None, room=room)
+    response = JsonResponse({
+        'date': day.isoformat(),
+        'room': room.slug if room else None,
+        'start': timezone.localtime(start_dt).strftime('%H:%M'),
+        'end': timezone.localtime(end_dt).strftime('%H:%M') if request.GET.get('end_time') else None,
+        'origin': {
+            'seat': seat.id if seat else None,
+            'available': seat.id in available if seat else None,
+            'x': x, 'y': y,
+        },
+        'seats': [
+            {'id': s.id, 'name': s.name, 'x': s.x, 'y': s.y, 'distance': round(distance, 1)}
+            for distance, s in found
+        ],
+    })
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+# --- 使用量統計 (staff) ---
+USAGE_DEFAULT_DAYS = 30
+USAGE_MAX_DAYS = 400
+USAGE_CSV_COLUMNS = {
+    'day': ('day', '日期'),
+    'hour': ('hour', '時段'),
+    'seat': ('seat', '座位'),
+}
+
+
+def _usage_period(request):
+    """?since=&until= (YYYY-MM-DD，until 不含)，預設最近 USAGE_DEFAULT_DAYS 天。不合法回傳 None。"""
+    today = timezone.localdate()
+    try:
+        until = date.fromisoformat(request.GET['until']) if request.GET.get('until') else today + timedelta(days=1)
+        since = date.fromisoformat(request.GET['since']) if request.GET.get('since') else until - timedelta(days=USAGE_DEFAULT_DAYS)
+    except ValueError:
+        return None
+    if not (since < until <= since + timedelta(days=USAGE_MAX_DAYS)):
+        return None
+    return since, until
+
+
+@staff_member_required
+@require_GET
+def usage_dashboard(request):
+    """座位使用率報表：只讀彙總表 (seats/rollups.py)，不論歷史資料多少都只查兩次。"""
+    period = _usage_period(request)
+    if period is None:
+        messages.error(request, f"日期區間無效 (最多 {USAGE_MAX_DAYS} 天)。")
+        today = timezone.localdate()
+        period = (today + timedelta(days=1 - USAGE_DEFAULT_DAYS), today + timedelta(days=1))
+    since, until = period
+    context = {
+        'page_title': '座位使用統計',
+        'since': since,
+        'until': until,
+        'last_day': until - timedelta(days=1),
+        **rollups.summary(since, until),
+    }
+    return render(request, 'seats/usage.html', context)
+
+
+@staff_member_required
+@require_GET
+def usage_csv(request):
+    """匯出使用量 CSV：?by=day|hour|seat，期間參數同 usage_dashboard。"""
+    period = _usage_period(request)
+    by = request.GET.get('by', 'day')
+    if period is None or by not in USAGE_CSV_COLUMNS:
+        return HttpResponse("日期區間或 by 參數無效。", status=400, content_type='text/plain; charset=utf-8')
+    since, until = period
+    rows = rollups.summary(since, until)[f'by_{by}']
+    key, label = USAGE_CSV_COLUMNS[by]
+
+    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="usage-by-{by}-{since}-{until}.csv"'
+    response.write('\ufeff')  # 讓 Excel 以 UTF-8 開啟
+    writer = csv.writer(response)
+    writer.writerow([label, '預約分鐘數', '預約筆數', '取消筆數', '使用率 (%)'])
+    for row in rows:
+        writer.writerow([row[key], row['booked_minutes'], row['bookings'], row['cancellations'], row['utilization']])
+    return response
+
+
+# --- 即時座位圖推播 (SSE) ---
+@login_required
+async def seat_stream(request):
+    """推送目前座位佔用狀態的快照與之後的差異，所有連線共用同一個 live.feed。"""
+    if not isinstance(request, ASGIRequest):
+        # WSGI 下每個串流會佔住一個 worker，也無法共用 event loop
+        return HttpResponse("即時推播需在 ASGI 伺服器下執行。", status=501)
+
+    async def events():
+        async for event, data in live.feed.subscribe():
+            yield live.format_event(event, data)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # 關閉 nginx 緩衝
+    return response
+
+
 # 個人預約紀錄
 @login_required
 def records(request):
@@ -243,7 +602,8 @@ def cancel_reservation_by_id(request, reservation_id):
             if reservation.status == 'reserved':
                 if reservation.start_time > timezone.now():
                     reservation.status = 'cancelled'
-                    reservation.save()
+                    with writes.serialized():  # 與預約寫入一起排隊 (seats/writes.py)
+                        reservation.save()
                     messages.success(request, f"您的預約 (座位 {reservation.seat.name}, {reservation.start_time.strftime('%Y-%m-%d %H:%M')}) 已成功取消。")
                 else:
                     messages.warning(request, "此預約已開始或已結束，無法取消。")
@@ -289,13 +649,7 @@ def submit_report(request, reservation_id):
                     f"提醒原因：{report.reason}\n\n"
                     f"如有疑問，請洽管理員。"
                 )
-                send_mail(
-                    subject,
-                    message,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [report.reported_user.email],
-                    fail_silently=True,
-                )
+                outbox.enqueue(subject, message, [report.reported_user.email], settings.DEFAULT_FROM_EMAIL)
             messages.success(request, f"針對預約 (ID: {reservation_id}) 的檢舉已成功提交。")
             return redirect(reverse('seats:records'))
         else:
@@ -358,45 +712,59 @@ def rules_view(request):
 # records換頁
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from .models import Reservation, Report # Assuming these are your models
+from .models import ArchivedReservation, Reservation, Report # Assuming these are your models
+from .pagination import KeysetPaginator
 from django.utils import timezone
 
+RECORDS_PER_PAGE = 10
+
+
 # Helper function to paginate a queryset
-def get_paginated_queryset(request, queryset, page_param='page', items_per_page=10):
-    paginator = Paginator(queryset, items_per_page)
-    page_number = request.GET.get(page_param)
-    try:
-        page_obj = paginator.page(page_number)
-    except PageNotAnInteger:
-        # If page is not an integer, deliver first page.
-        page_obj = paginator.page(1)
-    except EmptyPage:
-        # If page is out of range (e.g., 9999), deliver last page of results.
-        page_obj = paginator.page(paginator.num_pages)
-    return page_obj
+def get_paginated_queryset(request, queryset, field, prefix, items_per_page=RECORDS_PER_PAGE):
+    # ?<prefix>_cursor= 走 keyset 上一頁/下一頁，?<prefix>_page= 直接跳頁
+    paginator = KeysetPaginator(
+        queryset, field, items_per_page,
+        count_limit=getattr(settings, 'RECORDS_COUNT_LIMIT', 1000),
+    )
+    return paginator.page(
+        cursor=request.GET.get(f'{prefix}_cursor'),
+        number=request.GET.get(f'{prefix}_page'),
+    )
 
 @login_required
 def records(request):
     user = request.user
     
-    # 1. Paginate Reservations
-    all_reservations = Reservation.objects.filter(user=user).order_by('-start_time')
-    reservations = get_paginated_queryset(request, all_reservations, 'res_page', 10)
+    # 1. Paginate Reservations (seat 一起載入，模板逐列讀 res.seat.name 不再各查一次)
+    # 線上表與封存表 (seats/archive.py) 合併成同一份列表，較舊的頁面自動讀到封存的預約
+    all_reservations = [
+        Reservation.objects.filter(user=user).select_related('seat'),
+        ArchivedReservation.objects.filter(user=user).select_related('seat'),
+    ]
+    reservations = get_paginated_queryset(request, all_reservations, 'start_time', 'res')
 
     # 2. Paginate Submitted Reports by the user
-    all_submitted_reports = Report.objects.filter(reporter=user).order_by('-submitted_at')
-    submitted_reports = get_paginated_queryset(request, all_submitted_reports, 'sub_page', 10)
+    all_submitted_reports = Report.objects.filter(reporter=user).select_related('seat')
+    submitted_reports = get_paginated_queryset(request, all_submitted_reports, 'submitted_at', 'sub')
 
     # 3. Paginate Reports About User
     # Assuming Report.reported_user is a ForeignKey to User
-    all_reports_about_user = Report.objects.filter(reported_user=user).order_by('-submitted_at')
-    reports_about_user = get_paginated_queryset(request, all_reports_about_user, 'rep_page', 10)
+    all_reports_about_user = Report.objects.filter(reported_user=user).select_related('seat')
+    reports_about_user = get_paginated_queryset(request, all_reports_about_user, 'submitted_at', 'rep')
+
+    # 4. 尚未開始的候補 (每人最多 WAITLIST_MAX_PER_USER 筆，不分頁)
+    waitlist_entries = list(waitlist.active_entries(user))
 
+    # 5. 團體預約：待我確認的邀請、我發起的團體預約 (seats/groups.py，數量有上限，不分頁)
+    group_invitations = list(groups.pending_invitations(user))
+    led_group_bookings = list(groups.led_groups(user))
 
     context = {
         'page_title': '個人紀錄',
         'reservations': reservations, # Paginated object
+        'waitlist_entries': waitlist_entries,
+        'group_invitations': group_invitations,
+        'led_group_bookings': led_group_bookings,
         'submitted_reports': submitted_reports, # Paginated object
         'reports_about_user': reports_about_user, # Paginated object
         'timezone_now': timezone.now(), # Pass current timezone-aware datetime
@@ -428,7 +796,6 @@ from django.contrib import messages
 from django.urls import reverse
 from django.utils import timezone
 from datetime import date, timedelta, datetime
-from django.core.mail import send_mail
 from .models import Seat, Reservation, Report # 確保 Report, Reservation 模型已導入
 from .forms import ReportForm # 確保 ReportForm 已導入
 from django.db.models import Q # 用於複雜查詢
@@ -438,12 +805,11 @@ from django.db.models import Q # 用於複雜查詢
 # 檢舉
 @login_required
 def reminds(request):
-    seats = Seat.objects.all()
-    date_options = [(date.today() + timedelta(days=i)).isoformat() for i in range(7)]
-    time_slots = [f'{h:02}:00' for h in range(8, 24)]
+    room = _selected_room(request)
+    seats = layout.get_seats(room)
 
     if request.method == 'POST':
-        form = ReportForm(request.POST)
+        form = ReportForm(request.POST, room=room)
         if form.is_valid():
             report = form.save(commit=False)
             report.reporter = request.user # 提交檢舉的人是當前用戶
@@ -467,8 +833,7 @@ def reminds(request):
                 context = {
                     'form': form,
                     'seats': seats,
-                    'date_options': date_options,
-                    'time_slots': time_slots,
+                    **_room_context(room),
                     'page_title': '提交檢舉/提醒'
                 }
                 return render(request, 'seats/reminds.html', context)
@@ -477,7 +842,7 @@ def reminds(request):
                 seat=reported_seat,
                 start_time__lte=event_datetime,
                 end_time__gt=event_datetime, # 結束時間必須晚於事件時間點
-                status='reserved' # 確保是已預約的狀態
+                status__in=['reserved', 'completed'] # 已預約；檢舉的多半是過去的事件，可能已被標記為完成
             ).order_by('-start_time').first() # 如果有多個，取最近開始的
 
             if target_reservation:
@@ -499,26 +864,21 @@ def reminds(request):
                 message = (
                     f"您好，\n\n"
                     f"您在 {report.reported_date.strftime('%Y-%m-%d')} {report.reported_time.strftime('%H:%M')} 被其他使用者提醒。\n"
-                    f"座位編號：{report.seat.name if report.seat else '未指定'}\n"
+                    f"座位編號：{layout.seat_label(report.seat) if report.seat else '未指定'}\n"
                     f"提醒原因：{report.reason}\n\n"
                     f"此提醒由系統自動發送，如有疑問，請洽管理員。"
                 )
                 try:
-                    send_mail(
-                        subject,
-                        message,
-                        settings.DEFAULT_FROM_EMAIL,
-                        [report.reported_user.email],
-                        fail_silently=False, # 為了除錯，這裡可以暫時設為 False，出錯時會拋出異常
-                    )
+                    # 寫入寄信佇列，由 send_queued_mail 背景寄送，SMTP 慢也不會卡住這個 request
+                    outbox.enqueue(subject, message, [report.reported_user.email], settings.DEFAULT_FROM_EMAIL)
                     messages.success(request, f"您的檢舉已成功提交，並已向 {report.reported_user.username} 發送提醒郵件！")
                 except Exception as e:
-                    print(f"Error sending email: {e}")
+                    print(f"Error queueing email: {e}")
                     messages.warning(request, f"檢舉已提交，但發送提醒郵件失敗：{e}")
             else:
                 messages.success(request, "您的檢舉已成功提交，但未能發送提醒郵件（可能未找到被檢舉者或其郵箱）。")
 
-            return redirect(reverse('seats:reminds'))
+            return redirect(reverse('seats:reminds') + (f'?room={room.slug}' if room else ''))
 
         else: # 表單驗證失敗
             for field, errs in form.errors.items():
@@ -531,19 +891,17 @@ def reminds(request):
             context = {
                 'form': form,
                 'seats': seats,
-                'date_options': date_options,
-                'time_slots': time_slots,
+                **_room_context(room),
                 'page_title': '提交檢舉/提醒'
             }
             return render(request, 'seats/reminds.html', context)
     else: # GET request
-        form = ReportForm(initial={'reported_date': date.today()})
+        form = ReportForm(initial={'reported_date': date.today()}, room=room)
     
     context = {
         'form': form,
         'seats': seats,
-        'date_options': date_options,
-        'time_slots': time_slots,
+        **_room_context(room),
         'page_title': '提交檢舉/提醒'
     }
     return render(request, 'seats/reminds.html', context)
@@ -0,0 +1,116 @@
+# seats/waitlist.py
+"""
+候補名單。
+
+原本有人取消預約後，空出來的座位只能靠其他人剛好重新整理 res_time 才發現，
+大家只好一直重查。現在座位被預約時可以登記候補 (指定座位或任何座位)，
+預約被取消/刪除/改時段時 (signals.py)，在 commit 後依登記順序替候補的人自動預約：
+
+- 候補存在 WaitlistEntry，(seat, start_time) 有只收 waiting 列的索引。「任何座位」限定在登記時的閱覽室。
+  空出 [start, end) 時只查「該座位或同閱覽室的任何座位」且 start_time 落在 (start - BOOKING_MAX_MINUTES, end)
+  的候補，是兩段索引範圍查詢，不會隨候補總數變慢。
+- 預約一律經過 booking.book_seat，衝突檢查與 make_reservation 完全相同；
+  候補的人同時段已有其他預約就跳過 (USER_BUSY)，座位又被別人搶走就換下一位。
+- 成功後只把通知寫進寄信佇列 (mail.outbox)，不在取消預約的 request 裡寄信。
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from mail import outbox
+
+from . import booking, layout
+from .models import WaitlistEntry
+
+
+def max_per_user():
+    return settings.WAITLIST_MAX_PER_USER
+
+
+def active_entries(user, now=None):
+    """使用者目前仍有效 (尚未開始) 的候補。"""
+    return WaitlistEntry.objects.filter(
+        user=user, status='waiting', start_time__gt=now or timezone.now(),
+    ).select_related('seat').order_by('start_time', 'id')
+
+
+def join(user, seat, start_dt, end_dt, room=None):
+    """
+    登記候補，回傳 (entry, 錯誤訊息)；seat 為 None 表示 room 裡的任何座位。
+    同一時段已登記過就回傳原本那筆。
+    """
+    room = seat.room if seat is not None else room
+    existing = active_entries(user).filter(start_time=start_dt, end_time=end_dt, seat=seat, room=room).first()
+    if existing is not None:
+        return existing, None
+    if active_entries(user).count() >= max_per_user():
+        return None, f"候補最多同時登記 {max_per_user()} 筆。"
+    return WaitlistEntry.objects.create(user=user, seat=seat, room=room, start_time=start_dt, end_time=end_dt), None
+
+
+def candidates(seat_id, start, end, now=None, room_id=None):
+    """與空出的 [start, end) 重疊、指定該座位或 (同閱覽室的) 任何座位的候補，依登記順序排列。"""
+    now = now or timezone.now()
+    longest = timedelta(minutes=settings.BOOKING_MAX_MINUTES)
+    return WaitlistEntry.objects.filter(
+        Q(seat_id=seat_id) | Q(seat__isnull=True) & (Q(room_id=room_id) | Q(room__isnull=True)),
+        status='waiting',
+        # start_time 有上下界，走索引範圍掃描；end_time > start 再濾掉沒重疊的
+        start_time__gt=max(start - longest, now),
+        start_time__lt=end,
+        end_time__gt=start,
+    ).select_related('user').order_by('created_at', 'id')[:settings.WAITLIST_MATCH_LIMIT]
+
+
+def _notify(entry, reservation):
+    if not entry.user.email:
+        return
+    start = timezone.localtime(reservation.start_time)
+    end = timezone.localtime(reservation.end_time)
+    outbox.enqueue(
+        f"候補成功：座位 {reservation.seat.name} 已為您預約",
+        f"{entry.user.username} 您好：\n\n"
+        f"您候補的時段有人取消，系統已為您預約座位 {reservation.seat.name}，"
+        f"時間 {start:%Y-%m-%d %H:%M} ~ {end:%H:%M}。\n"
+        f"若不需要，請到個人紀錄頁取消。",
+        [entry.user.email],
+    )
+
+
+def fill(seat, start, end, now=None):
+    """座位 seat 在 [start, end) 空出來時，依序替候補的人預約，回傳成功的 WaitlistEntry 串列。"""
+    fulfilled = []
+    for entry in candidates(seat.pk, start, end, now=now, room_id=seat.room_id):
+        result = booking.book_seat(entry.user, seat, entry.start_time, entry.end_time)
+        if not result.ok:
+            continue
+        entry.status = 'fulfilled'
+        entry.reservation = result.reservation
+        entry.seat = seat
+        # 條件更新：使用者剛好同時取消了這筆候補就不覆蓋 (預約已成立，仍照常通知)
+        WaitlistEntry.objects.filter(pk=entry.pk, status='waiting').update(
+            status='fulfilled', reservation=result.reservation, seat=seat,
+        )
+        _notify(entry, result.reservation)
+        fulfilled.append(entry)
+    return fulfilled
+
+
+def seat_released(seat_id, start, end):
+    """預約取消/刪除/改時段後呼叫 (signals.py)；commit 後才配對，配對失敗不影響原本的取消。"""
+    if end <= timezone.now():
+        return
+
+    def run():
+        seat = layout.get_seat(seat_id)
+        if seat is None:
+            return
+        try:
+            fill(seat, start, end)
+        except Exception as e:
+            print(f"Error filling waitlist (seat {seat_id}, {start} ~ {end}): {e}")
+
+    transaction.on_commit(run)
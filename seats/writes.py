@@ -0,0 +1,84 @@
+# seats/writes.py
+"""
+程序內的寫入佇列。
+
+SQLite 同一時間只允許一個寫入者。同一個程序裡的多個執行緒同時搶寫鎖時，
+輸的一方只能等 busy_timeout 或拿到 "database is locked" 再重試，高峰時大家一起空轉。
+預約與取消改成先在這裡排隊 (先到先寫)，同一程序內一次只有一個寫入交易；
+讀取完全不經過這裡，WAL 模式下也不會被寫入擋住。不同 worker 程序之間仍由 SQLite 的鎖與
+busy_timeout 協調。
+
+    with writes.serialized():
+        reservation.save()
+"""
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class WriteQueue:
+    """FIFO、可重入的鎖：同一執行緒巢狀進入不會卡住自己。"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+        self._owner = None
+        self._depth = 0
+        self.waiting = 0
+        self.writes = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    @contextmanager
+    def serialized(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._owner == me:
+                self._depth += 1
+                reentrant = True
+            else:
+                reentrant = False
+                ticket = self._next_ticket
+                self._next_ticket += 1
+                self.waiting += 1
+                started = time.perf_counter()
+                while self._serving != ticket:
+                    self._cond.wait()
+                waited = time.perf_counter() - started
+                self.waiting -= 1
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+                self._owner = me
+                self._depth = 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._depth -= 1
+                if not reentrant and self._depth == 0:
+                    self._owner = None
+                    self._serving += 1
+                    self.writes += 1
+                    self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'waiting': self.waiting,
+                'writes': self.writes,
+                'wait_seconds': round(self.wait_seconds, 6),
+                'max_wait_seconds': round(self.max_wait_seconds, 6),
+            }
+
+
+queue = WriteQueue()
+
+
+def serialized(using=DEFAULT_DB_ALIAS):
+    """SQLite 才需要排隊；其他資料庫有列鎖，直接並行寫入。"""
+    if connections[using].vendor != 'sqlite':
+        return nullcontext()
+    return queue.serialized()